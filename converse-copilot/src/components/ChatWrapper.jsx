@@ -5,6 +5,7 @@ import QuestionMarkRoundedIcon from '@mui/icons-material/QuestionMarkRounded';
 import CloseRoundedIcon from '@mui/icons-material/CloseRounded';
 import CustomButton from './CustomButton';
 import TypingIndicator from './TypingIndicator';
+import { createFrameDecoder, frameText } from '../utils/frameDecoder';
 // f9ebff
 
 const ChatWrapper = () => {
@@ -22,20 +23,37 @@ const ChatWrapper = () => {
   ]);
   const messagesEndRef = useRef(null);
   const ws = useRef(null);
+  const frameDecoder = useRef(createFrameDecoder());
   useEffect(() => {
     // Connect to WebSocket backend
-    ws.current = new WebSocket('ws://127.0.0.1:8765/ws');
+    // stream=1 opts in to "partial" frames while a template is being generated;
+    // session resumes the previous conversation after a reload or reconnect;
+    // proto=2 sends edits as deltas and compress=1 deflates large frames
+    const sessionId = localStorage.getItem('copilotSessionId') || 'new';
+    ws.current = new WebSocket(
+      `ws://127.0.0.1:8765/ws?stream=1&proto=2&compress=1&heartbeat=1&session=${encodeURIComponent(sessionId)}`
+    );
+    ws.current.binaryType = 'arraybuffer';
 
     ws.current.onopen = () => console.log('✅ Connected to WebSocket server');
 
+    // Compressed frames are inflated asynchronously; chain them to keep order
+    let pendingFrames = Promise.resolve();
     ws.current.onmessage = (event) => {
-      console.log('📩 Raw message:', event.data);
+      pendingFrames = pendingFrames
+        .then(() => frameText(event.data))
+        .then(handleFrameText)
+        .catch((err) => console.error('❌ Frame decoding error:', err));
+    };
+
+    const handleFrameText = (text) => {
+      console.log('📩 Raw message:', text);
 
       let parsedMessages = [];
 
       try {
         // Handle cases like multiple JSON objects concatenated together
-        const dataStr = event.data.trim();
+        const dataStr = text.trim();
 
         // Try to split possible multiple JSON chunks
         const jsonChunks = dataStr
@@ -54,11 +72,35 @@ const ChatWrapper = () => {
         });
       } catch (err) {
         console.error('❌ Parsing error:', err);
-        parsedMessages.push({ Body: event.data, Buttons: [] });
+        parsedMessages.push({ Body: text, Buttons: [] });
       }
       console.log('🛠️ Parsed messages:', parsedMessages);
       // Iterate through all parsed messages
-      parsedMessages.forEach((data) => {
+      parsedMessages.forEach((frame) => {
+        // v2 snapshots/deltas are rebuilt into the full template here
+        const data = frameDecoder.current.decode(frame);
+        if (!data) return;
+        if (data.frame === 'session') {
+          localStorage.setItem('copilotSessionId', data.session_id);
+          // A resumed session is shown again: its earlier requests here, then
+          // the server re-sends the current template as a normal frame
+          if (data.resumed) {
+            const earlier = (data.summary || []).map((line) => ({
+              type: 'agent',
+              text: `Earlier: ${line}`,
+              buttons: [],
+            }));
+            const requests = (data.requests || []).map((text) => ({
+              type: 'user',
+              text,
+              buttons: [],
+            }));
+            setMessages((prev) => [...prev, ...earlier, ...requests]);
+          }
+          return;
+        }
+        // Keepalive from the server's session governor
+        if (data.frame === 'heartbeat') return;
         const body = data.Body || data.body || data.content || 'No body found';
         const buttonsRaw = data.Buttons || data.buttons || [];
 
@@ -88,16 +130,23 @@ const ChatWrapper = () => {
         console.log('📝 Message body:', body);
         console.log('🔘 Buttons data:', buttons);
 
-        // Construct and add bot message
-        const botMsg = { type: 'agent', text: body, buttons };
-        setMessages((prev) => [...prev, botMsg]);
+        // Construct and add bot message; partial frames update the same bubble
+        // in place until the final frame for that template replaces it
+        const isPartial = data.frame === 'partial';
+        const botMsg = { type: 'agent', text: body, buttons, streaming: isPartial };
+        setMessages((prev) => {
+          const last = prev[prev.length - 1];
+          if (last && last.streaming) return [...prev.slice(0, -1), botMsg];
+          return [...prev, botMsg];
+        });
         console.log('✅ Added bot message:', botMsg);
-        setIsAgentTyping(false);
+        if (!isPartial) setIsAgentTyping(false);
       });
     };
 
     ws.current.onerror = (err) => console.error('❌ WebSocket error:', err);
-    ws.current.onclose = () => console.log('🔌 WebSocket disconnected');
+    ws.current.onclose = (event) =>
+      console.log('🔌 WebSocket disconnected', event.code, event.reason);
 
     return () => ws.current?.close();
   }, []);
@@ -0,0 +1,68 @@
+// Decoder for the server's v2 frame protocol (/ws?proto=2):
+//   {v: 2, t: 'snap',  seq, doc, acct}          full template
+//   {v: 2, t: 'delta', seq, base, ops, acct}    JSON patch against frame `base`
+// Frames without `v` (v1 templates, "session" / "partial" frames) pass through.
+
+// Must be at least the server's FrameWriter keep_bases
+const KEEP_DOCS = 8;
+
+const unescapeToken = (token) => token.replace(/~1/g, '/').replace(/~0/g, '~');
+
+export const applyPatch = (doc, ops) => {
+  let result = structuredClone(doc);
+  ops.forEach((op) => {
+    if (op.path === '') {
+      result = structuredClone(op.value);
+      return;
+    }
+    const tokens = op.path.split('/').slice(1).map(unescapeToken);
+    const last = tokens.pop();
+    let target = result;
+    tokens.forEach((token) => {
+      target = Array.isArray(target) ? target[Number(token)] : target[token];
+    });
+    if (Array.isArray(target)) {
+      const index = Number(last);
+      if (op.op === 'add') target.splice(index, 0, structuredClone(op.value));
+      else if (op.op === 'remove') target.splice(index, 1);
+      else target[index] = structuredClone(op.value);
+    } else if (op.op === 'remove') {
+      delete target[last];
+    } else {
+      target[last] = structuredClone(op.value);
+    }
+  });
+  return result;
+};
+
+// Binary frames are zlib-compressed JSON (/ws?compress=1)
+export const frameText = async (data) => {
+  if (typeof data === 'string') return data;
+  const stream = new Blob([data])
+    .stream()
+    .pipeThrough(new DecompressionStream('deflate'));
+  return new Response(stream).text();
+};
+
+export const createFrameDecoder = () => {
+  const docs = new Map();
+
+  return {
+    // Returns the template object to render, or null if the frame can't be applied
+    decode(frame) {
+      if (frame.v !== 2) return frame;
+      let doc;
+      if (frame.t === 'snap') {
+        doc = frame.doc;
+      } else if (frame.t === 'delta' && docs.has(frame.base)) {
+        doc = applyPatch(docs.get(frame.base), frame.ops);
+      } else {
+        console.warn('⚠️ Delta frame for unknown base:', frame.base);
+        return null;
+      }
+      docs.set(frame.seq, doc);
+      while (docs.size > KEEP_DOCS) docs.delete(docs.keys().next().value);
+      return { ...doc, ...frame.acct };
+    },
+  };
+};
@@ -1,29 +1,145 @@
 from dotenv import load_dotenv, find_dotenv
 import os
 import asyncio
+import time
 import json
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import FastAPI, WebSocket
+from contextlib import asynccontextmanager
+import uuid
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from starlette.websockets import WebSocketState
+from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from prompts.whatsapp_template_prompt import template_prompt
+from prompts.whatsapp_template_prompt import SYSTEM_MESSAGE, is_first_turn_prompt, select_phase, system_message_for
 from utils.cost_calculator import calculate_cost
+from utils.fx_rates import rate_provider
+from utils.llm_client import build_dispatcher
+from utils.admission import AdmissionRejected
+from utils.model_router import build_router
+from utils.model_clients import build_backends, build_openai_pool
+from utils.llm_recorder import build_recorder
+from utils.json_stream import JSONFieldStream, extract_json_objects
+from utils.intent_engine import IntentEngine
+from utils.history_manager import ConversationHistory
+from utils.template_validator import repair_template
+from utils.response_cache import build_response_cache
+from utils.language_detector import LanguageDetector
+from utils.session_store import build_session_store
+from utils.cost_ledger import build_cost_ledger
+from utils.input_scheduler import InputScheduler
+from utils.session_governor import build_session_governor, SessionEvicted, CLOSE_TOO_BIG, CLOSE_TRY_AGAIN
+from utils.frame_protocol import FrameWriter, dumps
+from utils.batch_generator import BatchError, BatchItemError, BatchRunner, expand_briefs
+from utils.logger import setup_logging, shutdown_logging, get_logger
+from utils.edit_engine import apply_edit
+from utils.metrics import (registry, stage_timer, record_usage, TEMPLATES_SENT, ERRORS, STAGE_LATENCY, INPUT_MESSAGES,
+                           LOCAL_EDITS, PROMPT_PHASES)
 import uvicorn
 
 # Load environment variables
 load_dotenv(find_dotenv(), override=True)
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-
-# Initialize Gemini model
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    openai_api_key=OPENAI_API_KEY
-)
-
-executor = ThreadPoolExecutor(max_workers=2)
-app = FastAPI()
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+
+setup_logging()
+logger = get_logger("app")
+
+MODEL_NAME = "gpt-4o-mini"
+
+# OpenAI calls share one keep-alive connection pool, warmed at startup;
+# provider SDKs are only imported for configured providers
+openai_pool = build_openai_pool(OPENAI_API_KEY)
+backends = build_backends(MODEL_NAME, OPENAI_API_KEY, GOOGLE_API_KEY, openai_pool)
+
+router = build_router(backends)
+# Optional record/replay of LLM calls (LLM_RECORD_MODE), in front of the router
+recorder = build_recorder(router)
+dispatcher = build_dispatcher(recorder or router)
+response_cache = build_response_cache()
+session_store = build_session_store()
+cost_ledger = build_cost_ledger()
+governor = build_session_governor()
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 3000))
+WS_DEBOUNCE_SECONDS = float(os.environ.get("WS_DEBOUNCE_SECONDS", 0.1))
+WS_MAX_QUEUED_MESSAGES = int(os.environ.get("WS_MAX_QUEUED_MESSAGES", 8))
+WS_COMPRESS_MIN_BYTES = int(os.environ.get("WS_COMPRESS_MIN_BYTES", 512))
+SESSION_EVICT_SECONDS = float(os.environ.get("SESSION_EVICT_SECONDS", 300))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 4))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 500))
+intent_engine = IntentEngine(threshold=float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", 0.75)))
+language_detector = LanguageDetector(threshold=float(os.environ.get("LANGUAGE_CONFIDENCE_THRESHOLD", 0.6)))
+
+registry.gauge("copilot_llm_queue_depth", "LLM calls waiting for a dispatcher slot",
+               lambda: dispatcher.metrics()["queue_depth"])
+registry.gauge("copilot_llm_in_flight", "LLM calls currently running",
+               lambda: dispatcher.metrics()["in_flight"])
+registry.gauge("copilot_intent_llm_avoided_ratio", "Share of intent checks answered without the LLM",
+               lambda: intent_engine.stats()["llm_avoided_rate"])
+registry.gauge("copilot_response_cache_hit_ratio", "First-turn response cache hit rate",
+               lambda: response_cache.stats()["hit_rate"])
+registry.gauge("copilot_llm_backend_error_rate", "Rolling error rate per LLM backend",
+               lambda: {(("backend", name),): b.error_rate() for name, b in router.backends.items()})
+registry.gauge("copilot_llm_backend_p95_seconds", "Rolling p95 latency per LLM backend",
+               lambda: {(("backend", name),): b.latency(0.95) or 0.0 for name, b in router.backends.items()})
+registry.gauge("copilot_ws_sessions", "Live /ws sessions",
+               lambda: len(governor.sessions))
+registry.gauge("copilot_ws_session_bytes", "Approximate bytes held by live /ws sessions (last sweep)",
+               lambda: governor.total_bytes)
+registry.gauge("copilot_cost_ledger_queued", "Usage events waiting to be written to the ledger",
+               lambda: cost_ledger.stats()["queued"])
+
+
+# /ready answers 503 until the provider connections are warm
+readiness = {"ready": False, "startup_ms": None}
+
+
+async def warm_up(started: float):
+    """Opens provider connections in the background; a failed attempt still marks the app ready."""
+    await openai_pool.warm()
+    readiness["ready"] = True
+    readiness["startup_ms"] = (time.perf_counter() - started) * 1000
+    logger.info("Ready after %.0f ms", readiness["startup_ms"])
+
+
+async def evict_sessions():
+    """Drops expired sessions every SESSION_EVICT_SECONDS; most clients never come back to resume."""
+    while True:
+        await asyncio.sleep(SESSION_EVICT_SECONDS)
+        try:
+            await session_store.evict_expired()
+        except Exception as e:
+            ERRORS.inc(kind="session_evict")
+            logger.warning("Session eviction failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Connection warm-up overlaps the rest of startup
+    warm_task = asyncio.create_task(warm_up(started))
+    openai_pool.start()
+    # The refresh loop fetches a stale rate right away; until it lands, turns are
+    # priced at the last known good rate from disk rather than waiting on the network
+    rate_provider.start()
+    await session_store.evict_expired()
+    evict_task = asyncio.create_task(evict_sessions())
+    await cost_ledger.start()
+    governor.start()
+    if recorder and os.environ.get("LLM_RECORDINGS_WARM_CACHE") in ("1", "true"):
+        warmed = await warm_response_cache()
+        logger.info("Response cache warmed with %d recorded templates", warmed)
+    yield
+    warm_task.cancel()
+    evict_task.cancel()
+    await governor.stop()
+    await rate_provider.stop()
+    await cost_ledger.stop()
+    await openai_pool.stop()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,48 +152,356 @@ app.add_middleware(
 
 # ✅ Universal JSON sanitizer
 def clean_json_output(raw_text: str):
-    """Cleans and extracts valid JSON from Gemini responses, even if wrapped in ```json fences."""
+    """Extracts every JSON object from model output, even if wrapped in ```json fences or prose."""
     if not raw_text:
         return None
 
-    text = raw_text.strip()
+    objects = extract_json_objects(raw_text)
+    if not objects:
+        logger.warning("JSON cleaning failed. Raw text: %s", raw_text)
+        return None
+    return objects
+
 
-    # Remove markdown fences if present
-    if text.startswith("```"):
-        text = text.strip("`").strip()
-        if text.lower().startswith("json"):
-            text = text[4:].strip()
+async def call_llm(messages, connection_id=None, task="generate", client=None):
+    """
+    `task` ("generate", "followup", "intent") selects the model route and the
+    queue priority; `client` keys the admission quota. Raises AdmissionRejected
+    when the client is over quota or the queue is too long.
+    """
+    return await dispatcher.invoke(messages, connection_id=connection_id, task=task, client=client)
+
+
+def recorded_first_turns():
+    """(request, repaired template) for each recorded first-turn generation; reads the recordings from disk."""
+    entries = []
+    for recording in recorder.recordings():
+        messages = recording["messages"]
+        # Only recordings made with the current system prompt
+        if len(messages) != 2 or not is_first_turn_prompt(messages[0]["content"]):
+            continue
+        template = next((d for d in clean_json_output(recording["content"]) or []
+                         if isinstance(d, dict) and "name" in d), None)
+        if template is None:
+            continue
+        try:
+            template, _ = repair_template(template)
+        except ValueError:
+            continue
+        entries.append((messages[1]["content"], template))
+    return entries
+
+
+async def warm_response_cache():
+    """Seeds the first-turn response cache from recorded first-turn generations."""
+    entries = await asyncio.to_thread(recorded_first_turns)
+    for request, template in entries:
+        await response_cache.put(request, template)
+    return len(entries)
+
+
+def prompt_for_language(language, phase):
+    """System message with just the resolved language, or the full language rules when unresolved."""
+    return system_message_for(phase, with_language=language is None, language=language)
+
+
+def served_model(response):
+    """Model that actually answered (the router may have failed over), for pricing."""
+    return (getattr(response, "response_metadata", None) or {}).get("router_backend", MODEL_NAME)
 
-    # Handle multiple JSON objects if concatenated
-    try:
-        if text.count('}{') > 0:
-            parts = text.replace('}{', '}|||{').split('|||')
-            return [json.loads(p.strip()) for p in parts]
-        else:
-            return [json.loads(text)]
-    except json.JSONDecodeError as e:
-        print("⚠️ JSON cleaning failed:", e, "Raw text:", raw_text)
-        return None
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until startup has warmed the provider connections, so traffic arrives warm."""
+    body = {**readiness, "pools": {"openai": openai_pool.stats()}}
+    return JSONResponse(body, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Queue depth and concurrency of the shared LLM dispatcher, plus per-backend routing stats."""
+    stats = {**dispatcher.metrics(), "router": router.stats()}
+    if recorder:
+        stats["recorder"] = recorder.stats()
+    return stats
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Calls admitted and rejected (rate_limited / overloaded), and clients with a live token bucket."""
+    return dispatcher.admission.stats() if dispatcher.admission else {"enabled": False}
+
+
+@app.get("/intent/stats")
+async def intent_stats():
+    """How many intent checks were answered locally vs. by the LLM."""
+    return intent_engine.stats()
+
+
+@app.get("/language/stats")
+async def language_stats():
+    """How often the template language was resolved locally, by detection source."""
+    return language_detector.stats()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the first-turn response cache."""
+    return response_cache.stats()
+
+
+@app.get("/cost/stats")
+async def cost_stats():
+    """Ledger write-behind progress and today's spend per tenant."""
+    return cost_ledger.stats()
+
+
+@app.get("/ws/stats")
+async def ws_stats():
+    """Live sessions, their approximate memory footprint, evictions and refused connections."""
+    return governor.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of stage latencies, token/cost counters and queue gauges."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+class BatchBrief(BaseModel):
+    brief: str
+    id: str | None = None
+    language: str | None = None
+
+
+class BatchRequest(BaseModel):
+    briefs: list[BatchBrief | str]
+    # Language codes to generate every brief in, or "all" for the whole LANGUAGE_LIST
+    languages: list[str] | str | None = None
+
+
+def request_api_key(connection) -> str | None:
+    """
+    The caller's API key from X-API-Key or "Authorization: Bearer"; WebSockets
+    may also pass ?api_key= since browsers can't set headers on them.
+    """
+    headers = connection.headers
+    key = headers.get("x-api-key")
+    if not key and headers.get("authorization", "").lower().startswith("bearer "):
+        key = headers["authorization"][len("bearer "):].strip()
+    return key or connection.query_params.get("api_key")
 
-async def call_llm(messages):
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, llm.invoke, messages)
+
+async def generate_batch_item(job, batch_id, tenant, client=None):
+    """One single-turn generation for /batch/templates; raises to mark the item failed."""
+    exceeded = cost_ledger.budget_exceeded(tenant, 0.0)
+    if exceeded:
+        raise RuntimeError(f"{exceeded} budget exceeded")
+    cached = response_cache.get(job["prompt"])
+    if cached:
+        return {"template": cached, "tokens": {"input": 0, "output": 0, "total_cost": 0.0}, "cached": True}
+
+    # Every item shares the pre-rendered first-turn prompt as its prefix
+    language = job["language"] or language_detector.resolve(job["brief"])
+    system_message = prompt_for_language(language, "first")
+    # Batch items queue behind interactive calls and wait out the client's quota instead of failing
+    response = await dispatcher.invoke([system_message, HumanMessage(content=job["prompt"])], task="generate",
+                                       client=client, priority="batch", block=True)
+    model = served_model(response)
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    cost = calculate_cost(input_tokens, output_tokens, model=model)["total_cost"]
+    record_usage(model, "batch", input_tokens, output_tokens, cost)
+    cost_ledger.record(batch_id, tenant, "batch", model, input_tokens, output_tokens, cost)
+    tokens = {"input": input_tokens, "output": output_tokens, "total_cost": cost}
+
+    # From here on a failure has already been paid for; the summary must count it
+    data_list = clean_json_output(response.content.strip()) or []
+    template = next((d for d in data_list if isinstance(d, dict) and "name" in d), None)
+    if template is None:
+        # Usually a clarifying question: the brief was too vague for a template
+        question = next((d.get("Body") for d in data_list if isinstance(d, dict)), None)
+        raise BatchItemError(f"No template generated: {question or 'invalid JSON from model'}", tokens)
+    try:
+        template, issues = repair_template(template, language=language)
+    except ValueError as e:
+        raise BatchItemError(f"Invalid template: {e}", tokens) from e
+    if issues:
+        logger.info("Batch template repaired: %s", issues)
+    await response_cache.put(job["prompt"], template)
+    return {"template": template, "tokens": tokens, "model": model}
+
+
+@app.post("/batch/templates")
+async def batch_templates(request: BatchRequest, http_request: Request):
+    """
+    Generates one template per brief (times each requested language) with at
+    most BATCH_CONCURRENCY generations in flight. Streams NDJSON: one line per
+    item as it completes ({"id", "ok", "template" | "error", "tokens", ...}),
+    then a {"frame": "summary"} line with counts and the aggregate cost.
+    """
+    briefs = [b if isinstance(b, str) else b.model_dump() for b in request.briefs]
+    try:
+        jobs = expand_briefs(briefs, request.languages, max_items=BATCH_MAX_ITEMS)
+    except BatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    batch_id = f"batch-{uuid.uuid4().hex}"
+    client = http_request.client.host if http_request.client else None
+    tenant = cost_ledger.tenant_for(request_api_key(http_request), client)
+    logger.info("Batch %s: %d items for tenant %s", batch_id, len(jobs), tenant)
+    runner = BatchRunner(lambda job: generate_batch_item(job, batch_id, tenant, client),
+                         concurrency=BATCH_CONCURRENCY)
+
+    async def lines():
+        async for item in runner.run(jobs):
+            yield dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id})
+
+
+# Fields pushed to the client as "partial" frames while a template streams in
+STREAMED_FIELDS = ("Body", "Buttons")
+
+
+async def stream_llm(writer: FrameWriter, messages, connection_id=None, client=None):
+    """
+    Streams a generation, sending {"frame": "partial", ...} as soon as Body or
+    Buttons are complete. Returns the aggregated message, same as call_llm.
+    """
+    scanner = JSONFieldStream()
+    response = None
+    async for chunk in dispatcher.stream(messages, connection_id=connection_id, task="generate", client=client):
+        response = chunk if response is None else response + chunk
+        if not isinstance(chunk.content, str) or not chunk.content:
+            continue
+        fields = [key for key, _ in scanner.feed(chunk.content) if key in STREAMED_FIELDS]
+        if fields and "Body" in scanner.fields:
+            partial = {key: scanner.fields[key] for key in STREAMED_FIELDS if key in scanner.fields}
+            partial["frame"] = "partial"
+            await writer.send_control(partial)
+    return response
 
 
 class ConversationState:
     """Stores conversation history per WebSocket connection."""
     def __init__(self):
-        self.history = []
+        self.connection_id = uuid.uuid4().hex
+        self.history = None
         self.last_sent_body = None
         self.last_sent_buttons = None
         self.awaiting_followup = False
         self.last_category_code = None
+        self.template_meta = None
+        self.language = None
         self.total_spent=0.0
+        self.followup_task = None
+        self.session_id = None
+        self.tenant = "default"
+        self.client = None
+        self.writer = None
+
+    def cancel_followup(self):
+        if self.followup_task and not self.followup_task.done():
+            self.followup_task.cancel()
+        self.followup_task = None
+
+    def footprint(self):
+        """Approximate bytes this connection holds, for the session governor."""
+        size = self.history.footprint() if self.history else 0
+        return size + (self.writer.footprint() if self.writer else 0)
+
+    def to_dict(self):
+        return {
+            "history": self.history.to_dict(),
+            "last_sent_body": self.last_sent_body,
+            "last_sent_buttons": self.last_sent_buttons,
+            "template_meta": self.template_meta,
+            "language": self.language,
+            "total_spent": self.total_spent,
+        }
+
+    def restore(self, data):
+        self.history = ConversationHistory.from_dict(SYSTEM_MESSAGE, data["history"], budget=HISTORY_TOKEN_BUDGET)
+        self.last_sent_body = data.get("last_sent_body")
+        self.last_sent_buttons = data.get("last_sent_buttons")
+        self.template_meta = data.get("template_meta")
+        self.language = data.get("language")
+        self.total_spent = data.get("total_spent", 0.0)
+
+
+async def close_websocket(websocket: WebSocket, code: int = 1000, reason: str = None):
+    """Closes the socket unless it is already closed (by the client or the session governor)."""
+    if websocket.application_state == WebSocketState.DISCONNECTED:
+        return
+    try:
+        await websocket.close(code=code, reason=reason)
+    except RuntimeError:
+        pass
+
+
+async def replay_session(state):
+    """
+    Re-sends what a resumed session's client last saw: the recap in the session
+    frame, then the current template (or the last plain reply). The page was
+    usually reloaded, so without this the user would edit a template they can't see.
+    """
+    await state.writer.send_control({
+        "frame": "session", "session_id": state.session_id, "resumed": True, **state.history.recap()
+    })
+    doc = state.history.latest_doc
+    if doc is None and state.last_sent_body is not None:
+        doc = {"Body": state.last_sent_body, "Buttons": state.last_sent_buttons or []}
+    if doc is None:
+        return
+    await state.writer.send(doc)
+    state.last_sent_body = doc["Body"]
+    state.last_sent_buttons = doc.get("Buttons", [])
+
+
+async def save_session(state):
+    """Persist resumable sessions; a store failure must never break the socket."""
+    if not state.session_id:
+        return
+    try:
+        await session_store.put(state.session_id, state.to_dict())
+    except Exception as e:
+        ERRORS.inc(kind="session_save")
+        logger.warning("Session save failed: %s", e)
+
 
+def account(state, call, model, input_tokens, output_tokens, cost):
+    """Adds one LLM call to the session total and hands it to the ledger (no I/O here)."""
+    state.total_spent += cost
+    cost_ledger.record(state.session_id or state.connection_id, state.tenant, call, model,
+                       input_tokens, output_tokens, cost)
 
-async def detect_intent(user_input: str):
-    """Use Gemini to classify user's intent (positive, negative, neutral)."""
+
+ADMISSION_MESSAGES = {
+    "rate_limited": "⏳ You're sending requests faster than I can keep up. Please try again in {seconds}s.",
+    "overloaded": "⏳ I'm handling a lot of requests right now. Please try again in {seconds}s.",
+}
+
+
+async def send_admission_rejected(state, error: AdmissionRejected):
+    """Tells the client to retry later; `retry_after` is in whole seconds."""
+    logger.info("LLM call refused for %s: %s", state.client, error)
+    seconds = error.retry_after_seconds
+    await state.writer.send({
+        "Body": ADMISSION_MESSAGES[error.reason].format(seconds=seconds),
+        "Buttons": [],
+        "retry_after": seconds,
+    })
+
+
+BUDGET_MESSAGES = {
+    "session": "💸 This conversation has reached its spending limit. Please start a new session.",
+    "tenant": "💸 Today's spending limit for your account has been reached. Please try again tomorrow.",
+}
+
+
+async def llm_detect_intent(user_input: str, state):
+    """Use the LLM to classify user's intent (positive, negative, neutral)."""
     intent_prompt = [
         SystemMessage(content="You are an intent classifier. Output JSON only."),
         HumanMessage(content=f"""
@@ -95,195 +519,418 @@ async def detect_intent(user_input: str):
             User message: "{user_input}"
         """)
     ]
-    response = await call_llm(intent_prompt)
-    print("The intent detection: 💰💰💰 ",response);
+    response = await call_llm(intent_prompt, state.connection_id, task="intent", client=state.client)
+    logger.debug("Intent detection response: %s", response)
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    model = served_model(response)
+    cost = calculate_cost(input_tokens, output_tokens, model=model)["total_cost"]
+    record_usage(model, "intent", input_tokens, output_tokens, cost)
+    account(state, "intent", model, input_tokens, output_tokens, cost)
     try:
         cleaned = clean_json_output(response.content.strip())
         if cleaned and isinstance(cleaned, list):
             return cleaned[0].get("intent", "neutral")
     except Exception as e:
-        print("⚠️ Intent parsing error:", e)
+        ERRORS.inc(kind="intent_parse")
+        logger.warning("Intent parsing error: %s", e)
     return "neutral"
 
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    print("✅ Client connected")
+async def detect_intent(user_input: str, state):
+    """Classify locally; only ambiguous replies go to llm_detect_intent."""
+    with stage_timer("intent"):
+        return await intent_engine.detect(
+            user_input, lambda text: llm_detect_intent(text, state)
+        )
+
+
+async def send_followup(websocket: WebSocket, state, data):
+    """Generates and pushes the follow-up suggestion for a freshly sent template."""
+    follow_up_prompt = [
+        SystemMessage(content="""You are a WhatsApp template AI assistant. Only output valid JSON.
+                      
+                      IMPORTANT RULE:
+                      - The template supports limit number of buttons.
+                      - Allowed button limits(hard and strict rules):
+                        - Maximum total buttons = 10.
+                        - Maximum URL buttons = 2.
+                        - Maximum PHONE_NUMBER buttons = 1.
+                        - Maximum COPY_CODE buttons = 1.
+                        - Remaining buttons (up to total 10) must be QUICK_REPLY.
+                      - Never suggest adding more buttons if the user has already reached these limits.
+                      - If user at anytime prompts to add more buttons than the above-prescribed limits, generate templates with maximum allowed buttons only as per the above rules.For example, if user asks to add 3 URL buttons, generate template with only 2 URL buttons and ignore the rest.Similarly, if user asks to add 2 PHONE_NUMBER buttons, generate template with only 1 PHONE_NUMBER button and ignore the rest.COPY_CODE button limit is 1 as well.
+                      - After generating template with maximum allowed buttons, inform user regarding the prescribed button limits and continue with your suggestion in the same JSON.
+                      
+                      """),
+        HumanMessage(content=f"""
+            I just generated this template:
+            {json.dumps(data)}
 
-    state = ConversationState()
+           
 
-    # Initialize system message
-    from constants.language_constants import LANGUAGE_LIST
-    messages = template_prompt.format_messages(user_message="",
-                                               LANGUAGE_LIST=LANGUAGE_LIST)
-    state.history.append(messages[0])  # SystemMessage
+            When the number of buttons to be added by the user and also the type of buttons exceeds the allowed limits,after generating the template with maximum buttons as per the precribed limit above,inform user about the prescribed button limits and never suggest adding more buttons in the same JSON body of suggestion which you are going to send.
 
+
+            Suggest one friendly follow-up question or suggestion to improve this template (Body or buttons).
+            
+            If the Buttons array is empty, suggest user to add CTA or quick reply buttons.
+            Don't start with ```json or any markdown. It's very important.
+            Output JSON only in this schema:
+            {{
+                
+                "Body": "<suggestion/question text>",
+                "Buttons": []
+            }}
+        """)
+    ]
+    if cost_ledger.budget_exceeded(state.tenant, state.total_spent):
+        return
     try:
-        while True:
-            user_input = await websocket.receive_text()
-            user_input = user_input.strip()
-
-            # 🧠 Check if this message is a response to a suggestion
-            if state.last_sent_body and "consider adding a call-to-action button" in state.last_sent_body.lower():
-                user_intent = await detect_intent(user_input)
-
-                if user_intent == "positive":
-                    print("✅ User accepted suggestion – adding buttons automatically.")
-                    modified_template = {
-                        "Body": state.last_sent_body,
-                        "Buttons": [
-                            {"type": "Call to Action", "text": "Shop Now", "url": "www.google.com"},
-                            {"type": "Quick Reply", "text": "Tell me more", "url": ""}
-                        ]
-                    }
-                    await websocket.send_text(json.dumps(modified_template))
-                    state.last_sent_buttons = modified_template["Buttons"]
-                    continue
-
-                elif user_intent == "negative":
-                    print("❌ User declined suggestion.")
-                    await websocket.send_text(json.dumps({
-                        "Body": "No problem! Let me know if you'd like to modify the template later.",
-                        "Buttons": []
-                    }))
-                    continue
-
-            # Add user input to history
+        with stage_timer("followup"):
+            followup_response = await call_llm(follow_up_prompt, state.connection_id, task="followup",
+                                               client=state.client)
+    except AdmissionRejected as e:
+        # A suggestion isn't worth a retry; the next template gets its own
+        logger.info("Follow-up skipped: %s", e)
+        return
+    except Exception as e:
+        ERRORS.inc(kind="followup_llm")
+        logger.warning("Follow-up generation failed: %s", e)
+        return
+    raw_followup = followup_response.content.strip()
+    logger.debug("Follow-up response: %s", followup_response)
+    model = served_model(followup_response)
+    input_tokens = output_tokens = 0
+    cost_details = calculate_cost(0, 0)
+    if hasattr(followup_response, "usage_metadata") and followup_response.usage_metadata:
+        usage = followup_response.usage_metadata
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+
+        cost_details=calculate_cost(input_tokens,output_tokens,model=model)
+        logger.info("Usage (follow-up, %s): input=%d output=%d cost=%s", model, input_tokens, output_tokens, cost_details)
+    record_usage(model, "followup", input_tokens, output_tokens, cost_details["total_cost"])
+    # Paid for whether or not the reply parses
+    account(state, "followup", model, input_tokens, output_tokens, cost_details["total_cost"])
+    try:
+        followup_data = clean_json_output(raw_followup)
+        if not followup_data:
+            raise ValueError("Invalid follow-up JSON")
+        followup_json, _ = repair_template(followup_data[0])
+        followup_json["tokens"] = {
+            "input": input_tokens,
+            "output": output_tokens,
+            "total_cost":cost_details["total_cost"]
+        }
+        followup_json["total_spent"]=state.total_spent
+        with stage_timer("send"):
+            await state.writer.send(followup_json)
+        TEMPLATES_SENT.inc(kind="followup")
+        state.last_sent_body = followup_json["Body"]
+        state.last_sent_buttons = []
+        await save_session(state)
+
+    except Exception as e:
+        ERRORS.inc(kind="followup_parse")
+        logger.warning("Follow-up parse error: %s. Raw follow-up: %s", e, raw_followup)
+
+
+async def deliver_templates(websocket: WebSocket, state, data_list, tokens, followup=True):
+    """
+    Repairs, sends and records each parsed template, starting the follow-up for
+    new templates (unless `followup` is False). Returns the repaired templates without accounting fields.
+    The turn's cost must already be accounted; every template carries the same total.
+    """
+    templates = []
+    for data in data_list:
+        # Validate schema and repair locally instead of asking the model again
+        # An unknown languageCode falls back to the template's current language, not English
+        language = (state.history.latest_doc or {}).get("languageCode") or state.language
+        with stage_timer("parse"):
+            data, issues = repair_template(data, state.template_meta, language)
+        if issues:
+            logger.info("Template repaired: %s", issues)
+        if "name" in data:
+            state.template_meta = {"name": data["name"], "categoryCode": data["categoryCode"]}
+        templates.append(dict(data))
+        data["total_spent"]=state.total_spent
+        data["tokens"]=tokens
+        # Check if this is a follow-up suggestion (no buttons)
+        is_followup = (len(data["Buttons"]) == 0) and (state.last_sent_body is not None)
+
+        # If not a follow-up, start the follow-up suggestion right away in the
+        # background; it is pushed when ready and cancelled by the next message
+        if not is_followup and followup:
+            state.cancel_followup()
+            state.followup_task = asyncio.create_task(send_followup(websocket, state, dict(data)))
+
+        # Send only if Body or Buttons changed
+        if (data["Body"] != state.last_sent_body) or (data.get("Buttons", []) != state.last_sent_buttons):
+            with stage_timer("send"):
+                await state.writer.send(data)
+            TEMPLATES_SENT.inc(kind="template")
+            state.last_sent_body = data["Body"]
+            state.last_sent_buttons = data.get("Buttons", [])
+
+        # Append AI response to history
+        state.history.append_template(data)
+    return templates
+
+
+async def handle_turn(websocket: WebSocket, state, scheduler, batch, stream_mode):
+    """
+    One turn for a burst of messages: all of them go to the model as a single
+    request, the last one decides a CTA reply. If the generation is superseded,
+    the user message stays in history so the next turn still sees it.
+    """
+    user_input = "\n".join(batch)
+
+    # 🧠 Check if this message is a response to a suggestion
+    if state.last_sent_body and "consider adding a call-to-action button" in state.last_sent_body.lower():
+        try:
+            user_intent = await detect_intent(batch[-1], state)
+        except AdmissionRejected as e:
+            await send_admission_rejected(state, e)
+            return
+
+        if user_intent == "positive":
+            logger.info("User accepted suggestion, adding buttons automatically")
+            modified_template = {
+                "Body": state.last_sent_body,
+                "Buttons": [
+                    {"type": "Call to Action", "text": "Shop Now", "url": "www.google.com"},
+                    {"type": "Quick Reply", "text": "Tell me more", "url": ""}
+                ]
+            }
+            await state.writer.send(modified_template)
+            state.last_sent_buttons = modified_template["Buttons"]
+            return
+
+        elif user_intent == "negative":
+            logger.info("User declined suggestion")
+            await state.writer.send({
+                "Body": "No problem! Let me know if you'd like to modify the template later.",
+                "Buttons": []
+            })
+            return
+
+    # First turn: near-identical requests are served from the response cache
+    first_turn = not state.history.turns
+    if first_turn:
+        with stage_timer("cache_lookup"):
+            cached = response_cache.get(user_input)
+        if cached:
+            logger.info("Response cache hit")
             state.history.append(HumanMessage(content=user_input))
+            tokens = {"input": 0, "output": 0, "total_cost": 0.0, "cached": True}
+            await deliver_templates(websocket, state, [cached], tokens)
+            return
+
+    # Simple edits of the current template (URL, button text, remove / add a
+    # button) are applied locally; creative changes still go to the model
+    edit = apply_edit(user_input, state.history.latest_doc) if state.history.latest_doc else None
+    if edit:
+        kind, data, command = edit
+        LOCAL_EDITS.inc(command=command)
+        logger.info("Template edit applied locally: %s", command)
+        state.history.append(HumanMessage(content=user_input))
+        tokens = {"input": 0, "output": 0, "total_cost": 0.0, "local_edit": True}
+        if kind == "template":
+            await deliver_templates(websocket, state, [data], tokens, followup=False)
+        else:
+            state.history.append(AIMessage(content=json.dumps(data, ensure_ascii=False)))
+            await state.writer.send(data)
+        return
+
+    # Spend limits are plain counter checks; the ledger itself is written in the background
+    exceeded = cost_ledger.budget_exceeded(state.tenant, state.total_spent)
+    if exceeded:
+        await state.writer.send({"Body": BUDGET_MESSAGES[exceeded], "Buttons": []})
+        return
+
+    # Add user input to history
+    state.history.append(HumanMessage(content=user_input))
+
+    turn_start = time.perf_counter()
+
+    # Until the first template exists every section is sent; later turns only get
+    # the sections their phase needs. The language is resolved locally for the
+    # first template and whenever the user asks for one; only if that fails does
+    # the model get the whole LANGUAGE_LIST.
+    # "first" until a named template has been delivered; a clarifying question doesn't count
+    phase = select_phase(state.template_meta is None, state.last_sent_body, batch[-1])
+    detection = language_detector.detect(user_input)
+    if phase == "first" or detection.source == "mention":
+        confident = detection.confidence >= language_detector.threshold
+        if confident:
+            state.language = detection.code
+        system_message = prompt_for_language(detection.code if confident else None, phase)
+    else:
+        system_message = system_message_for(phase)
+    PROMPT_PHASES.inc(phase=phase)
+    messages = state.history.messages(system_message)
+
+    # Call AI for new template generation; a newer message cancels it while it runs
+    scheduler.superseded_by_input(True)
+    try:
+        with stage_timer("llm"):
+            if stream_mode:
+                response = await stream_llm(state.writer, messages, state.connection_id, state.client)
+            else:
+                response = await call_llm(messages, state.connection_id, client=state.client)
+    except AdmissionRejected as e:
+        # Never sent to the model; a retry must not see the message twice
+        state.history.discard_last()
+        await send_admission_rejected(state, e)
+        return
+    finally:
+        scheduler.superseded_by_input(False)
+    raw_output = response.content.strip()
+    logger.debug("AI raw output: %s", raw_output)
+    model = served_model(response)
+
+    # --- TOKEN USAGE PRINTING (MAIN) ---
+    input_tokens = output_tokens = 0
+    cost_details = calculate_cost(0, 0)
+    if hasattr(response, "usage_metadata") and response.usage_metadata:
+        usage = response.usage_metadata
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+
+        cost_details=calculate_cost(input_tokens,output_tokens,model=model)
+        logger.info("Usage (main, %s): input=%d output=%d cost=%s", model, input_tokens, output_tokens, cost_details)
+    record_usage(model, "generate", input_tokens, output_tokens, cost_details["total_cost"])
+    # Once per turn, however many templates the response contains
+    account(state, "generate", model, input_tokens, output_tokens, cost_details["total_cost"])
 
-            # Call AI for new template generation
-            response = await call_llm(state.history)
-            raw_output = response.content.strip()
-            print("AI Raw Output:", raw_output)
-            print("Response is: ", response)
-            # --- START ADDING TOKEN INFORMATION HERE (Location 1) ---
-            
-            # --- TOKEN USAGE PRINTING (MAIN) ---
-            if hasattr(response, "usage_metadata") and response.usage_metadata:
-                usage = response.usage_metadata
-                input_tokens = usage.get("input_tokens", 0)
-                output_tokens = usage.get("output_tokens", 0)
+    try:
+        with stage_timer("parse"):
+            data_list = clean_json_output(raw_output)
+        if not data_list:
+            raise ValueError("Invalid JSON from model")
+
+        tokens = {
+            "input": input_tokens,
+            "output": output_tokens,
+            "total_cost":cost_details["total_cost"],
+            "history_saved": state.history.last_turn_stats()["saved_tokens"]
+        }
+        templates = await deliver_templates(websocket, state, data_list, tokens)
+
+        if first_turn:
+            for template in templates:
+                if "name" in template:
+                    await response_cache.put(user_input, template)
+                    break
+        STAGE_LATENCY.observe(time.perf_counter() - turn_start, stage="turn")
 
-                print(f"💰 Usage (Main): Input={input_tokens}, Output={output_tokens}")
-                cost_details=calculate_cost(input_tokens,output_tokens)
-                print(f"💰 Cost (Main) ₹: {cost_details}")
+    except Exception as e:
+        ERRORS.inc(kind="parse")
+        logger.warning("JSON parsing error: %s", e)
+        await state.writer.send({
+            "Body": "⚠️ I couldn’t process that message correctly. Please try again.",
+            "Buttons": []
+        })
 
-            
-            # print("Raw cleaned response:", cleaned)
 
-            try:
-                data_list = clean_json_output(raw_output)
-                if not data_list:
-                    raise ValueError("Invalid JSON from model")
-                
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    if not governor.admit():
+        logger.warning("Session limit reached, refusing connection")
+        await websocket.close(code=CLOSE_TRY_AGAIN, reason="server busy")
+        return
+    logger.info("Client connected")
+
+    # Partial frames are opt-in (/ws?stream=1) so older clients see only full templates
+    stream_mode = websocket.query_params.get("stream") in ("1", "true")
+    state = ConversationState()
 
-                # Get tokens if available
-                tokens = {
-                    "input": input_tokens if 'input_tokens' in locals() else 0,
-                    "output": output_tokens if 'output_tokens' in locals() else 0,
-                    "total_cost":cost_details["total_cost"]
-                }
-
-                for data in data_list:
-                    # Validate schema
-                    if  "Body" not in data or "Buttons" not in data:
-                        raise ValueError("JSON missing 'categoryCode', 'Body' or 'Buttons' keys")
-                    state.total_spent+=cost_details["total_cost"]
-                    data["total_spent"]=state.total_spent
-                    data["tokens"]=tokens
-                    # Check if this is a follow-up suggestion (no buttons)
-                    is_followup = (len(data["Buttons"]) == 0) and (state.last_sent_body is not None)
-
-                    # Send only if Body or Buttons changed
-                    if (data["Body"] != state.last_sent_body) or (data.get("Buttons", []) != state.last_sent_buttons):
-                        await websocket.send_text(json.dumps(data))
-                        state.last_sent_body = data["Body"]
-                        state.last_sent_buttons = data.get("Buttons", [])
-                        # state.last_category_code = data["categoryCode"]
-
-                    # Append AI response to history
-                    state.history.append(AIMessage(content=json.dumps(data)))
-
-                    # If not a follow-up, generate dynamic follow-up suggestion
-                    if not is_followup:
-                        follow_up_prompt = [
-                            SystemMessage(content="""You are a WhatsApp template AI assistant. Only output valid JSON.
-                                          
-                                          IMPORTANT RULE:
-                                          - The template supports limit number of buttons.
-                                          - Allowed button limits(hard and strict rules):
-                                            - Maximum total buttons = 10.
-                                            - Maximum URL buttons = 2.
-                                            - Maximum PHONE_NUMBER buttons = 1.
-                                            - Maximum COPY_CODE buttons = 1.
-                                            - Remaining buttons (up to total 10) must be QUICK_REPLY.
-                                          - Never suggest adding more buttons if the user has already reached these limits.
-                                          - If user at anytime prompts to add more buttons than the above-prescribed limits, generate templates with maximum allowed buttons only as per the above rules.For example, if user asks to add 3 URL buttons, generate template with only 2 URL buttons and ignore the rest.Similarly, if user asks to add 2 PHONE_NUMBER buttons, generate template with only 1 PHONE_NUMBER button and ignore the rest.COPY_CODE button limit is 1 as well.
-                                          - After generating template with maximum allowed buttons, inform user regarding the prescribed button limits and continue with your suggestion in the same JSON.
-                                          
-                                          """),
-                            HumanMessage(content=f"""
-                                I just generated this template:
-                                {json.dumps(data)}
-
-                               
-
-                                When the number of buttons to be added by the user and also the type of buttons exceeds the allowed limits,after generating the template with maximum buttons as per the precribed limit above,inform user about the prescribed button limits and never suggest adding more buttons in the same JSON body of suggestion which you are going to send.
-
-
-                                Suggest one friendly follow-up question or suggestion to improve this template (Body or buttons).
-                                
-                                If the Buttons array is empty, suggest user to add CTA or quick reply buttons.
-                                Don't start with ```json or any markdown. It's very important.
-                                Output JSON only in this schema:
-                                {{
-                                    
-                                    "Body": "<suggestion/question text>",
-                                    "Buttons": []
-                                }}
-                            """)
-                        ]
-                        followup_response = await call_llm(follow_up_prompt)
-                        raw_followup = followup_response.content.strip()
-                        print("The followup_response is: " ,followup_response );
-                        if hasattr(followup_response, "usage_metadata") and followup_response.usage_metadata:
-                            usage = followup_response.usage_metadata
-                            input_tokens = usage.get("input_tokens", 0)
-                            output_tokens = usage.get("output_tokens", 0)
-
-                            print(f"💰 Usage (Follow-up): Input={input_tokens}, Output={output_tokens}")
-                            cost_details=calculate_cost(input_tokens,output_tokens)
-                            print(f"💰 Cost (Follow-up) ₹: {cost_details}")
-                        try:
-                            followup_data = clean_json_output(raw_followup)
-                            if not followup_data:
-                                raise ValueError("Invalid follow-up JSON")
-                            followup_json = followup_data[0]
-                            followup_json["tokens"] = {
-                                "input": input_tokens if 'input_tokens' in locals() else 0,
-                                "output": output_tokens if 'output_tokens' in locals() else 0,
-                                "total_cost":cost_details["total_cost"]
-                            }
-                            state.total_spent+=cost_details["total_cost"]
-                            followup_json["total_spent"]=state.total_spent
-                            await websocket.send_text(json.dumps(followup_json))
-                            state.last_sent_body = followup_json["Body"]
-                            state.last_sent_buttons = []
-
-                        except Exception as e:
-                            print("⚠️ Follow-up Parse Error:", e, "Raw follow-up:", raw_followup)
-
-            except Exception as e:
-                print("⚠️ JSON parsing error:", e)
-                await websocket.send_text(json.dumps({
-                    "Body": "⚠️ I couldn’t process that message correctly. Please try again.",
-                    "Buttons": []
-                }))
+    # Snapshot/delta frames (/ws?proto=2) and zlib-compressed binary frames
+    # (compress=1) are opt-in; the default is the original full-JSON frames
+    state.writer = FrameWriter(
+        websocket,
+        version=2 if websocket.query_params.get("proto") == "2" else 1,
+        compress=websocket.query_params.get("compress") in ("1", "true"),
+        compress_min_bytes=WS_COMPRESS_MIN_BYTES,
+    )
+
+    # System message is pre-rendered once and shared across connections
+    state.history = ConversationHistory(SYSTEM_MESSAGE, budget=HISTORY_TOKEN_BUDGET)
+
+    # Resumable sessions are opt-in (/ws?session=<id> or session=new) and announced
+    # with a {"frame": "session"} message so older clients are unaffected
+    requested_session = websocket.query_params.get("session")
+    if requested_session is not None:
+        saved = None
+        if requested_session not in ("", "new"):
+            saved = await session_store.get(requested_session)
+        if saved:
+            state.restore(saved)
+            state.session_id = requested_session
+            logger.info("Session resumed: %s", requested_session)
+            await replay_session(state)
+        else:
+            state.session_id = uuid.uuid4().hex
+            await state.writer.send_control({"frame": "session", "session_id": state.session_id, "resumed": False})
+
+    # LLM calls are admitted against a token-bucket quota per client IP
+    state.client = websocket.client.host if websocket.client else None
+    # Per-tenant budgets are keyed on the caller's API key (or address), never a client-chosen label
+    state.tenant = cost_ledger.tenant_for(request_api_key(websocket), state.client)
+
+    # Messages are read as they arrive: bursts are coalesced into one turn and a
+    # newer message cancels the generation (and follow-up) it makes obsolete
+    def on_input(_):
+        state.cancel_followup()
+        governor.touch(state.connection_id)
+
+    scheduler = InputScheduler(
+        websocket.receive_text,
+        debounce=WS_DEBOUNCE_SECONDS,
+        max_queue=WS_MAX_QUEUED_MESSAGES,
+        on_input=on_input,
+    )
+    scheduler.start()
+
+    # The governor evicts idle or oversized sessions; heartbeat frames are
+    # opt-in (/ws?heartbeat=1) since older clients would render them
+    async def evict(code, reason):
+        scheduler.close(SessionEvicted(reason))
+        await close_websocket(websocket, code, reason)
+
+    heartbeat = None
+    if websocket.query_params.get("heartbeat") in ("1", "true"):
+        async def heartbeat():
+            await state.writer.send_control({"frame": "heartbeat"})
+    governor.register(state.connection_id, state.footprint, evict, heartbeat)
+
+    try:
+        while True:
+            if state.history.turns:
+                await save_session(state)
+            batch = [text.strip() for text in await scheduler.next_batch()]
+            if not all(governor.message_allowed(text) for text in batch):
+                logger.info("Message over WS_MAX_MESSAGE_CHARS, closing")
+                await close_websocket(websocket, CLOSE_TOO_BIG, "message too big")
+                break
+            if len(batch) > 1:
+                INPUT_MESSAGES.inc(len(batch) - 1, outcome="coalesced")
+            if not await scheduler.run_turn(handle_turn(websocket, state, scheduler, batch, stream_mode)):
+                INPUT_MESSAGES.inc(outcome="superseded")
+                logger.info("Turn superseded by a newer message")
+            governor.touch(state.connection_id)
 
     except Exception as e:
-        print("❌ Connection closed:", e)
-        await websocket.close()
+        logger.info("Connection closed: %s", e)
+        await close_websocket(websocket)
+    finally:
+        governor.unregister(state.connection_id)
+        await scheduler.stop()
+        state.cancel_followup()
+        await save_session(state)
+        dispatcher.release_connection(state.connection_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""
+Cold start and first-request latency of a fresh app process.
+
+A local fake OpenAI-compatible server stands in for the provider: every new
+connection costs `--handshake` seconds (TCP + TLS to a remote region) and
+every completion `--latency` seconds. Each run is a fresh interpreter:
+
+    cold    no connection warm-up (LLM_WARM_CONNECTIONS=0)
+    warm    provider connections warmed at startup (the default)
+    gemini  import only, with GOOGLE_API_KEY set, so langchain_google_genai loads
+
+Reports the median import time, time until /ready answers 200 and the
+latency of the first and second /ws turns after it:
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --runs 5 --handshake 0.3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.fake_llm import DEFAULT_FAKE_RESPONSE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUESTS = ("diwali sale template for a clothing store", "holi offer template for a bakery")
+
+
+class FakeProvider(BaseHTTPRequestHandler):
+    """Chat completions and /models, with keep-alive and a per-connection setup cost."""
+    protocol_version = "HTTP/1.1"
+    handshake = 0.15
+    latency = 0.05
+
+    def setup(self):
+        time.sleep(self.handshake)
+        super().setup()
+
+    def do_GET(self):
+        self._reply({"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "bench"}]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        self._reply({
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": DEFAULT_FAKE_RESPONSE}}],
+            "usage": {"prompt_tokens": 1500, "completion_tokens": 200, "total_tokens": 1700},
+        })
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Follow-up calls are cancelled when a socket closes mid-request
+        pass
+
+
+def turn(client, text):
+    """Seconds from sending a first message to receiving its template."""
+    with client.websocket_connect("/ws") as ws:
+        start = time.perf_counter()
+        ws.send_text(text)
+        while "name" not in json.loads(ws.receive_text()):
+            pass
+        return time.perf_counter() - start
+
+
+def child(import_only):
+    start = time.perf_counter()
+    import app as server
+    result = {"import": time.perf_counter() - start}
+    if not import_only:
+        from fastapi.testclient import TestClient
+        with TestClient(server.app) as client:
+            while client.get("/ready").status_code != 200:
+                time.sleep(0.002)
+            result["ready"] = time.perf_counter() - start
+            result["first"], result["second"] = (turn(client, text) for text in REQUESTS)
+    print(json.dumps(result))
+
+
+def run(scenario, base_url, workdir):
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": base_url,
+        "GOOGLE_API_KEY": "benchmark" if scenario == "gemini" else "",
+        "FX_RATE_SOURCE": "local",
+        "COST_LEDGER_PATH": "",
+        "LOG_LEVEL": "WARNING",
+        "LLM_WARM_CONNECTIONS": "0" if scenario == "cold" else os.environ.get("LLM_WARM_CONNECTIONS", "2"),
+    }
+    command = [sys.executable, "-m", "benchmarks.bench_cold_start", "--child"]
+    if scenario == "gemini":
+        command.append("--import-only")
+    output = subprocess.run(command, env=env, cwd=workdir, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    FakeProvider.handshake, FakeProvider.latency = args.handshake, args.latency
+    provider = QuietServer(("127.0.0.1", 0), FakeProvider)
+    threading.Thread(target=provider.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{provider.server_address[1]}/v1"
+
+    print(f"handshake {args.handshake * 1000:.0f} ms, completion {args.latency * 1000:.0f} ms, "
+          f"median of {args.runs} fresh processes")
+    print(f"{'scenario':>8} {'import ms':>10} {'ready ms':>9} {'1st turn ms':>12} {'2nd turn ms':>12}")
+    # The app writes its FX cache to the working directory; keep the tree clean
+    with tempfile.TemporaryDirectory() as workdir:
+        for scenario in ("cold", "warm", "gemini"):
+            results = [run(scenario, base_url, workdir) for _ in range(args.runs)]
+            row = [f"{statistics.median(r[key] for r in results) * 1000:.0f}" if key in results[0] else "-"
+                   for key in ("import", "ready", "first", "second")]
+            print(f"{scenario:>8} {row[0]:>10} {row[1]:>9} {row[2]:>12} {row[3]:>12}")
+    provider.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per scenario")
+    parser.add_argument("--handshake", type=float, default=0.15, help="fake connection setup cost, seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake completion latency, seconds")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--import-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.import_only)
+    else:
+        main(args)
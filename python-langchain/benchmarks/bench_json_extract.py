@@ -0,0 +1,107 @@
+"""
+Correctness fuzz + throughput for model-output JSON extraction.
+
+Runs the recorded model outputs in benchmarks/data/recorded_outputs.jsonl
+through the previous `clean_json_output` implementation and
+`extract_json_objects`, then fuzzes the streaming JSONFieldStream by feeding
+the same outputs in random chunk sizes with random prose around them.
+Throughput is reported for all three:
+
+    python -m benchmarks.bench_json_extract
+"""
+
+import json
+import os
+import random
+import time
+
+from utils.json_stream import JSONFieldStream, extract_json_objects
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "recorded_outputs.jsonl")
+FUZZ_ROUNDS = 200
+THROUGHPUT_ROUNDS = 2000
+NOISE = ["", "Here you go:\n", "Sure! ", "\n\n", "Note: the template follows.\n", "Hope this helps!"]
+
+
+def legacy_clean_json_output(raw_text: str):
+    """The previous implementation, kept here for comparison only."""
+    if not raw_text:
+        return None
+    text = raw_text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        if text.lower().startswith("json"):
+            text = text[4:].strip()
+    try:
+        if text.count('}{') > 0:
+            parts = text.replace('}{', '}|||{').split('|||')
+            return [json.loads(p.strip()) for p in parts]
+        else:
+            return [json.loads(text)]
+    except json.JSONDecodeError:
+        return None
+
+
+def load_samples():
+    with open(DATA_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stream_extract(text, rng):
+    scanner = JSONFieldStream()
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 24)
+        scanner.feed(text[i:i + size])
+        i += size
+    return scanner.objects
+
+
+def check_correctness(samples):
+    for name, extract in (("legacy", legacy_clean_json_output), ("extract", extract_json_objects)):
+        ok = sum(1 for s in samples if extract(s["raw"]) == s["expected"])
+        print(f"{name:>8}: {ok}/{len(samples)} recorded outputs parsed correctly")
+        failed = [s["id"] for s in samples if extract(s["raw"]) != s["expected"]]
+        if failed:
+            print(f"{'':>10}failed: {', '.join(failed)}")
+
+
+def fuzz(samples):
+    rng = random.Random(0)
+    failures = 0
+    for _ in range(FUZZ_ROUNDS):
+        sample = rng.choice(samples)
+        raw = rng.choice(NOISE) + sample["raw"] + rng.choice(NOISE)
+        if stream_extract(raw, rng) != sample["expected"]:
+            failures += 1
+    print(f"   fuzz: {FUZZ_ROUNDS - failures}/{FUZZ_ROUNDS} random chunkings matched")
+    return failures
+
+
+def stream_16(text):
+    scanner = JSONFieldStream()
+    for i in range(0, len(text), 16):
+        scanner.feed(text[i:i + 16])
+    return scanner.objects
+
+
+def throughput(samples):
+    raws = [s["raw"] for s in samples]
+    total_bytes = sum(len(r.encode("utf-8")) for r in raws) * THROUGHPUT_ROUNDS
+    for name, extract in (("legacy", legacy_clean_json_output), ("extract", extract_json_objects),
+                          ("stream", stream_16)):
+        start = time.perf_counter()
+        for _ in range(THROUGHPUT_ROUNDS):
+            for raw in raws:
+                extract(raw)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {total_bytes / elapsed / 1_000_000:.1f} MB/s, "
+              f"{elapsed / (THROUGHPUT_ROUNDS * len(raws)) * 1_000_000:.1f} µs/output")
+
+
+if __name__ == "__main__":
+    samples = load_samples()
+    check_correctness(samples)
+    failures = fuzz(samples)
+    throughput(samples)
+    raise SystemExit(1 if failures else 0)
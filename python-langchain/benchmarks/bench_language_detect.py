@@ -0,0 +1,71 @@
+"""
+Accuracy and speed of the local language detector on a multilingual sample set.
+
+benchmarks/data/language_samples.jsonl holds requests with the expected
+LANGUAGE_LIST code: explicit "in <language>" requests, text written in the
+language itself, plain English requests, and two ambiguous groups where
+"expected" is null because the model should decide: requests that merely
+name a language ("chinese new year sale" is usually English, "hindi diwali
+template" usually isn't) and romanized Hindi. A detection counts as correct
+when it is confident and right, or not confident where the model should
+decide. Confident but wrong detections are the costly case, since the model
+is then told the wrong language; they are listed. Also reports the system prompt tokens saved by
+sending one resolved language instead of the whole LANGUAGE_LIST:
+
+    python -m benchmarks.bench_language_detect
+"""
+
+import json
+import os
+import time
+from collections import Counter
+
+from prompts.whatsapp_template_prompt import SYSTEM_MESSAGE, system_message_for
+from utils.language_detector import LanguageDetector
+from utils.token_counter import estimate_tokens
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "language_samples.jsonl")
+SPEED_ROUNDS = 200
+
+
+def load_samples():
+    with open(DATA_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    samples = load_samples()
+    detector = LanguageDetector()
+    correct, wrong, deferred = 0, [], 0
+    by_source = Counter()
+    for sample in samples:
+        detection = detector.detect(sample["text"])
+        confident = detection.confidence >= detector.threshold
+        by_source[detection.source] += 1
+        if not confident:
+            deferred += 1
+        if (confident and detection.code == sample["expected"]) or (not confident and sample["expected"] is None):
+            correct += 1
+        elif confident:
+            wrong.append((sample["text"], sample["expected"], detection))
+
+    start = time.perf_counter()
+    for _ in range(SPEED_ROUNDS):
+        for sample in samples:
+            detector.detect(sample["text"])
+    per_call_us = (time.perf_counter() - start) / (SPEED_ROUNDS * len(samples)) * 1_000_000
+
+    print(f"samples {len(samples)}  correct {correct} ({correct / len(samples):.0%})  "
+          f"confidently wrong {len(wrong)}  left to the model {deferred}")
+    print(f"detections by source: {dict(by_source)}")
+    print(f"speed: {per_call_us:.1f} µs per detection")
+    for text, expected, detection in wrong:
+        print(f"  wrong: {text!r} expected {expected}, got {detection.code} ({detection.source}, {detection.confidence})")
+
+    full = estimate_tokens(SYSTEM_MESSAGE.content)
+    resolved = estimate_tokens(system_message_for("first", language="hi").content)
+    print(f"first-turn system prompt tokens (est.): {full} with LANGUAGE_LIST -> {resolved} with one language")
+
+
+if __name__ == "__main__":
+    main()
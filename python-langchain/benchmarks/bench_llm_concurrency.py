@@ -0,0 +1,62 @@
+"""
+Throughput of the LLM call path vs. number of concurrent sessions.
+
+Compares the old 2-worker ThreadPoolExecutor path with LLMDispatcher using a
+FakeChatModel, so no network is needed:
+
+    python -m benchmarks.bench_llm_concurrency
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.fake_llm import FakeChatModel
+from utils.llm_client import LLMDispatcher
+
+LATENCY = 0.05
+CALLS_PER_SESSION = 10
+
+
+async def run_executor(sessions: int):
+    llm = FakeChatModel(latency=LATENCY)
+    executor = ThreadPoolExecutor(max_workers=2)
+    loop = asyncio.get_running_loop()
+
+    async def session():
+        for _ in range(CALLS_PER_SESSION):
+            await loop.run_in_executor(executor, llm.invoke, [])
+
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    executor.shutdown()
+
+
+async def run_dispatcher(sessions: int, max_concurrency: int = 64):
+    dispatcher = LLMDispatcher(FakeChatModel(latency=LATENCY), max_concurrency=max_concurrency)
+
+    async def session(conn_id):
+        for _ in range(CALLS_PER_SESSION):
+            await dispatcher.invoke([], connection_id=conn_id)
+
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return dispatcher.metrics()
+
+
+async def main():
+    print(f"{'sessions':>8} {'executor calls/s':>17} {'async calls/s':>14} {'max queue':>10}")
+    for sessions in (1, 2, 4, 8, 16, 32):
+        total = sessions * CALLS_PER_SESSION
+
+        start = time.perf_counter()
+        await run_executor(sessions)
+        executor_rate = total / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        metrics = await run_dispatcher(sessions)
+        async_rate = total / (time.perf_counter() - start)
+
+        print(f"{sessions:>8} {executor_rate:>17.1f} {async_rate:>14.1f} {metrics['max_queue_depth']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
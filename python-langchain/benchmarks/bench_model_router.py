@@ -0,0 +1,79 @@
+"""
+Routing policy of ModelRouter against fake backends, fully offline.
+
+Scenarios:
+  tail      primary has a 5% 1s latency tail; hedging off vs. on
+  errors    primary fails 40% of calls; failover and circuit breaking
+  tasks     a generate/followup/intent mix lands on the routed models
+
+    python -m benchmarks.bench_model_router
+"""
+
+import asyncio
+import logging
+import time
+
+from utils.fake_llm import FakeChatModel
+from utils.model_router import ModelRouter
+
+CALLS = 400
+CONCURRENCY = 20
+ROUTES = {"generate": ["primary", "secondary"], "followup": ["cheap", "primary"], "intent": ["cheap", "primary"]}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def drive(router, tasks=("generate",)):
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await router.ainvoke([], task=tasks[i % len(tasks)])
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(CALLS)))
+    return latencies, failures
+
+
+def backends(primary_kwargs):
+    return {
+        "primary": FakeChatModel(latency=0.05, seed=1, **primary_kwargs),
+        "secondary": FakeChatModel(latency=0.08, seed=2),
+        "cheap": FakeChatModel(latency=0.03, seed=3),
+    }
+
+
+def report(label, router, latencies, failures):
+    served = {name: b.total for name, b in router.backends.items()}
+    print(f"{label:<22} p50 {percentile(latencies, 0.5) * 1000:>7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:>7.1f} ms"
+          f"  failed {failures:>3}  hedges {router.hedges:>3}  failovers {router.failovers:>3}  calls {served}")
+
+
+async def main():
+    logging.getLogger("copilot").setLevel(logging.ERROR)
+    for hedge in (False, True):
+        router = ModelRouter(backends({"tail_rate": 0.05, "tail_latency": 1.0}), routes=ROUTES, hedge=hedge,
+                             hedge_after=0.2)
+        report(f"tail, hedge={hedge}", router, *await drive(router))
+
+    for hedge in (False, True):
+        router = ModelRouter(backends({"error_rate": 0.4}), routes=ROUTES, hedge=hedge, cooldown=0.5)
+        latencies, failures = await drive(router)
+        report(f"errors, hedge={hedge}", router, latencies, failures)
+
+    router = ModelRouter(backends({}), routes=ROUTES)
+    report("task mix", router, *await drive(router, tasks=("generate", "followup", "intent")))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+Startup and per-connection cost of building the system prompt.
+
+Compares the old path (render template_prompt with the repr'd LANGUAGE_LIST on
+every connection) with the pre-rendered, shared SYSTEM_MESSAGE, and reports the
+system prompt size of each conversation phase:
+
+    python -m benchmarks.bench_prompt_setup
+"""
+
+import time
+
+start = time.perf_counter()
+from prompts.whatsapp_template_prompt import SYSTEM_MESSAGE, template_prompt, phase_token_report  # noqa: E402
+import_ms = (time.perf_counter() - start) * 1000
+
+from constants.language_constants import LANGUAGE_LIST  # noqa: E402
+from utils.history_manager import ConversationHistory  # noqa: E402
+from utils.token_counter import estimate_tokens  # noqa: E402
+
+CONNECTIONS = 2000
+
+
+def old_setup():
+    messages = template_prompt.format_messages(user_message="", LANGUAGE_LIST=LANGUAGE_LIST)
+    return ConversationHistory(messages[0])
+
+
+def new_setup():
+    return ConversationHistory(SYSTEM_MESSAGE)
+
+
+def per_connection_us(setup):
+    start = time.perf_counter()
+    for _ in range(CONNECTIONS):
+        setup()
+    return (time.perf_counter() - start) / CONNECTIONS * 1_000_000
+
+
+if __name__ == "__main__":
+    old_prompt = template_prompt.format_messages(user_message="", LANGUAGE_LIST=LANGUAGE_LIST)[0].content
+    print(f"prompt module import (incl. pre-render): {import_ms:.1f} ms")
+    print(f"connection setup, per-connection render:  {per_connection_us(old_setup):.1f} µs")
+    print(f"connection setup, shared SYSTEM_MESSAGE:  {per_connection_us(new_setup):.1f} µs")
+    print(f"system prompt tokens (est.): {estimate_tokens(old_prompt)} -> {estimate_tokens(SYSTEM_MESSAGE.content)}")
+    print("system prompt tokens per phase (est.): no language / one resolved language / full LANGUAGE_LIST")
+    full = estimate_tokens(SYSTEM_MESSAGE.content)
+    for phase, report in phase_token_report(estimate_tokens).items():
+        print(f"  {phase:<9} {report['tokens']:>5}  {report['resolved_language']:>5}  {report['with_language']:>5}"
+              f"  ({report['resolved_language'] / full:>4.0%} of full with one language)")
@@ -0,0 +1,239 @@
+"""
+Load test for the /ws endpoint with a deterministic fake LLM and FX source.
+
+Each simulated client runs a scripted conversation against the real FastAPI
+app, driven in-process over ASGI (no sockets, no OpenAI, no Frankfurter):
+
+    1. request a template      -> template frame, then the follow-up suggestion
+    2. accept the CTA ("yes")  -> buttons added via detect_intent
+    3. ask for an edit         -> updated template, then the follow-up
+
+Reports turn throughput, p50/p95/p99 turn latency, event-loop lag and
+traced memory per open session, then the app's own per-stage latencies:
+
+    python -m benchmarks.bench_ws_load
+    python -m benchmarks.bench_ws_load --sessions 50 500 --latency 0.2 --stream
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+# The fake LLM needs no provider connections
+os.environ.setdefault("LLM_WARM_CONNECTIONS", "0")
+
+import app as server  # noqa: E402
+from utils.fake_llm import FakeChatModel, DEFAULT_FAKE_RESPONSE  # noqa: E402
+from utils.fx_rates import rate_provider  # noqa: E402
+from utils.metrics import latency_summary  # noqa: E402
+
+FOLLOWUP_RESPONSE = json.dumps({
+    "Body": "Looks great! Consider adding a call-to-action button like 'Shop Now' to drive sales?",
+    "Buttons": [],
+})
+INTENT_RESPONSE = json.dumps({"intent": "positive"})
+EDITED_RESPONSE = json.loads(DEFAULT_FAKE_RESPONSE)
+EDITED_RESPONSE["Body"] = "🎉 Diwali Flash Sale! Up to 50% off until {{1}}."
+EDITED_RESPONSE = json.dumps(EDITED_RESPONSE)
+
+# CTA replies cycle through phrasings the local intent engine does and doesn't know
+CTA_REPLIES = ("yes please", "sure, go ahead", "hmm alright then add them")
+
+
+def scripted_response(messages):
+    """Picks the fake completion from the prompt, like the real model would."""
+    prompt = messages[-1].content if messages else ""
+    if "intent classifier" in messages[0].content:
+        # The edit request arrives while the CTA suggestion is still pending
+        return json.dumps({"intent": "neutral"}) if "shorter" in prompt else INTENT_RESPONSE
+    if "Suggest one friendly follow-up" in prompt:
+        return FOLLOWUP_RESPONSE
+    if "shorter" in prompt:
+        return EDITED_RESPONSE
+    return DEFAULT_FAKE_RESPONSE
+
+
+class FakeRateSource:
+    """FX source with a fixed rate and a configurable (blocking) lookup delay."""
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, rate: float = 88.0):
+        self.latency = latency
+        self.rate = rate
+
+    def fetch(self) -> float:
+        time.sleep(self.latency)
+        return self.rate
+
+
+class ASGIWebSocket:
+    """Minimal in-memory WebSocket client speaking ASGI directly to the app."""
+
+    def __init__(self, asgi_app, path="/ws", query="", client="127.0.0.1"):
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [],
+            "client": (client, 0),
+            "server": ("bench", 80),
+            "subprotocols": [],
+            "state": {},
+        }
+        self.app = asgi_app
+        self._inbox = asyncio.Queue()
+        self._outbox = asyncio.Queue()
+        self._task = None
+
+    async def connect(self):
+        await self._inbox.put({"type": "websocket.connect"})
+        self._task = asyncio.create_task(self.app(self.scope, self._inbox.get, self._outbox.put))
+        message = await self._outbox.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"connection rejected: {message}")
+
+    async def send(self, text: str):
+        await self._inbox.put({"type": "websocket.receive", "text": text})
+
+    async def receive(self) -> dict:
+        """Next full frame, skipping partial/session frames."""
+        while True:
+            message = await self._outbox.get()
+            if message["type"] == "websocket.close":
+                raise ConnectionError("server closed the socket")
+            frame = json.loads(message["text"])
+            if frame.get("frame") not in ("partial", "session"):
+                return frame
+
+    async def close(self):
+        await self._inbox.put({"type": "websocket.disconnect", "code": 1000})
+        if self._task:
+            await self._task
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def monitor_loop_lag(samples, interval=0.005):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run_session(index, query, latencies, opened, release):
+    # One address per simulated user, so each gets its own admission quota
+    ws = ASGIWebSocket(server.app, query=query, client=f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}")
+    await ws.connect()
+    try:
+        start = time.perf_counter()
+        await ws.send(f"Create a diwali sale template for store {index}")
+        await ws.receive()
+        latencies.append(time.perf_counter() - start)
+        await ws.receive()  # follow-up suggestion
+
+        start = time.perf_counter()
+        await ws.send(CTA_REPLIES[index % len(CTA_REPLIES)])
+        await ws.receive()
+        latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await ws.send("make the body shorter")
+        await ws.receive()
+        latencies.append(time.perf_counter() - start)
+        await ws.receive()  # follow-up suggestion
+
+        opened.append(ws)
+        await release.wait()
+    finally:
+        await ws.close()
+
+
+async def run_level(sessions, query, trace_memory=False):
+    latencies, lag, opened = [], [], []
+    release = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag))
+
+    if trace_memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(run_session(i, query, latencies, opened, release)) for i in range(sessions)]
+    while len(opened) < sessions:
+        failed = [t for t in tasks if t.done() and t.exception()]
+        if failed:
+            raise failed[0].exception()
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    memory = None
+    if trace_memory:
+        memory = (tracemalloc.get_traced_memory()[0] - baseline) / sessions
+        tracemalloc.stop()
+
+    release.set()
+    await asyncio.gather(*tasks)
+    monitor.cancel()
+    return {
+        "turns_per_s": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "lag_p99": percentile(lag, 0.99),
+        "lag_max": max(lag, default=0.0),
+        "memory": memory,
+    }
+
+
+async def main(args):
+    server.dispatcher.llm = FakeChatModel(
+        responses=scripted_response, latency=args.latency,
+        input_tokens=args.input_tokens, output_tokens=args.output_tokens,
+    )
+    rate_provider.source = FakeRateSource(args.fx_latency)
+    rate_provider.cache_file = None
+    logging.getLogger("copilot").setLevel(logging.WARNING)
+    query = "stream=1" if args.stream else ""
+
+    print(f"LLM latency {args.latency * 1000:.0f} ms, stream={args.stream}, "
+          f"dispatcher max_concurrency={server.dispatcher.metrics()['max_concurrency']}")
+    print(f"{'sessions':>8} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'lag p99 ms':>11} {'lag max ms':>11} {'KiB/session':>12}")
+    async with server.app.router.lifespan_context(server.app):
+        for sessions in args.sessions:
+            result = await run_level(sessions, query)
+            # Memory is traced in a separate pass; tracemalloc would skew the timings
+            result["memory"] = (await run_level(sessions, query, trace_memory=True))["memory"]
+            print(f"{sessions:>8} {result['turns_per_s']:>9.1f} {result['p50'] * 1000:>8.1f} "
+                  f"{result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+                  f"{result['lag_p99'] * 1000:>11.2f} {result['lag_max'] * 1000:>11.2f} "
+                  f"{result['memory'] / 1024:>12.1f}")
+    # Histogram bucket bounds over every level, as /metrics would report them
+    print(f"{'stage':>16} {'p50 ms':>8} {'p99 ms':>8}")
+    for stage, quantiles in sorted(latency_summary().items()):
+        print(f"{stage:>16} {quantiles['p50'] * 1000:>8.0f} {quantiles['p99'] * 1000:>8.0f}")
+    print("intent:", server.intent_engine.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 200, 500])
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per call, seconds")
+    parser.add_argument("--input-tokens", type=int, default=1500)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--fx-latency", type=float, default=0.0, help="fake FX lookup latency, seconds")
+    parser.add_argument("--stream", action="store_true", help="connect with /ws?stream=1")
+    asyncio.run(main(parser.parse_args()))
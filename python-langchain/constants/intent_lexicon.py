@@ -0,0 +1,78 @@
+# Short yes/no style replies per language (codes as in LANGUAGE_LIST).
+# Regional variants (en_GB, pt_BR, zh_CN, ...) share their base language entry.
+# Entries are matched after normalization (NFKC, casefold, punctuation stripped).
+
+INTENT_LEXICON = {
+    "af": {"positive": ["ja", "goed", "reg so", "seker"], "negative": ["nee", "nie nou nie", "later"]},
+    "sq": {"positive": ["po", "mirë", "sigurisht", "dakord"], "negative": ["jo", "jo tani", "më vonë"]},
+    "ar": {"positive": ["نعم", "أجل", "حسنا", "موافق", "تمام"], "negative": ["لا", "ليس الآن", "لاحقا"]},
+    "az": {"positive": ["bəli", "hə", "yaxşı", "razıyam"], "negative": ["xeyr", "yox", "sonra"]},
+    "bn": {"positive": ["হ্যাঁ", "ঠিক আছে", "অবশ্যই", "হা"], "negative": ["না", "এখন না", "পরে"]},
+    "bg": {"positive": ["да", "добре", "разбира се"], "negative": ["не", "не сега", "по-късно"]},
+    "ca": {"positive": ["sí", "d'acord", "és clar", "vale"], "negative": ["no", "ara no", "més tard"]},
+    "zh": {"positive": ["是", "是的", "好", "好的", "可以", "行", "对"], "negative": ["不", "不要", "不用", "不是", "以后再说"]},
+    "hr": {"positive": ["da", "može", "naravno", "u redu"], "negative": ["ne", "ne sada", "kasnije"]},
+    "cs": {"positive": ["ano", "jo", "dobře", "jasně", "určitě"], "negative": ["ne", "teď ne", "později"]},
+    "da": {"positive": ["ja", "okay", "selvfølgelig", "fint"], "negative": ["nej", "ikke nu", "senere"]},
+    "nl": {"positive": ["ja", "oké", "prima", "zeker", "goed"], "negative": ["nee", "niet nu", "later"]},
+    "en": {
+        "positive": ["yes", "y", "yeah", "yep", "yup", "ok", "okay", "k", "sure", "do it", "go ahead",
+                     "alright", "all right", "fine", "sounds good", "please do", "absolutely", "of course",
+                     "yes please", "add it", "add them", "👍"],
+        "negative": ["no", "n", "nope", "nah", "not now", "skip", "maybe later", "later", "no thanks",
+                     "no thank you", "don't", "do not", "never mind", "nevermind", "👎"],
+    },
+    "et": {"positive": ["jah", "jaa", "olgu", "muidugi"], "negative": ["ei", "mitte praegu", "hiljem"]},
+    "fil": {"positive": ["oo", "opo", "sige", "sige po"], "negative": ["hindi", "hindi po", "ayoko", "mamaya na"]},
+    "fi": {"positive": ["kyllä", "joo", "okei", "selvä", "toki"], "negative": ["ei", "ei nyt", "myöhemmin"]},
+    "fr": {"positive": ["oui", "d'accord", "ok d'accord", "bien sûr", "vas-y", "ouais"], "negative": ["non", "pas maintenant", "plus tard", "non merci"]},
+    "de": {"positive": ["ja", "jawohl", "klar", "gerne", "in ordnung", "passt"], "negative": ["nein", "nicht jetzt", "später", "nein danke"]},
+    "el": {"positive": ["ναι", "εντάξει", "βεβαίως", "σύμφωνοι"], "negative": ["όχι", "όχι τώρα", "αργότερα"]},
+    "gu": {"positive": ["હા", "હાં", "બરાબર", "ચોક્કસ"], "negative": ["ના", "હમણાં નહીં", "પછી"]},
+    "ha": {"positive": ["eh", "yauwa", "to shikenan"], "negative": ["a'a", "ba yanzu ba", "daga baya"]},
+    "he": {"positive": ["כן", "בסדר", "בטח", "אוקיי"], "negative": ["לא", "לא עכשיו", "אחר כך"]},
+    "hi": {"positive": ["हाँ", "हां", "हा", "ठीक है", "जी", "जी हाँ", "बिल्कुल", "haan", "han", "ha", "theek hai", "thik hai", "ji"],
+           "negative": ["नहीं", "ना", "अभी नहीं", "बाद में", "nahi", "nahin", "na", "abhi nahi", "baad mein"]},
+    "hu": {"positive": ["igen", "rendben", "persze", "oké"], "negative": ["nem", "most nem", "később"]},
+    "id": {"positive": ["ya", "iya", "oke", "baik", "boleh", "tentu"], "negative": ["tidak", "nggak", "enggak", "jangan", "nanti saja"]},
+    "ga": {"positive": ["tá", "is ea", "ceart go leor"], "negative": ["níl", "ní hea", "ní anois"]},
+    "it": {"positive": ["sì", "si", "va bene", "certo", "d'accordo", "ok va bene"], "negative": ["no", "non ora", "più tardi", "no grazie"]},
+    "ja": {"positive": ["はい", "うん", "いいよ", "いいです", "お願いします", "了解"], "negative": ["いいえ", "いや", "結構です", "後で", "いらない"]},
+    "kn": {"positive": ["ಹೌದು", "ಸರಿ", "ಖಂಡಿತ"], "negative": ["ಇಲ್ಲ", "ಬೇಡ", "ನಂತರ"]},
+    "kk": {"positive": ["иә", "жарайды", "әрине"], "negative": ["жоқ", "қазір емес", "кейін"]},
+    "ko": {"positive": ["네", "예", "응", "좋아요", "그래요", "알겠어요"], "negative": ["아니요", "아니", "싫어요", "나중에"]},
+    "lo": {"positive": ["ແມ່ນ", "ໂອເຄ", "ໄດ້"], "negative": ["ບໍ່", "ບໍ່ແມ່ນ", "ພາຍຫຼັງ"]},
+    "lv": {"positive": ["jā", "labi", "protams"], "negative": ["nē", "ne tagad", "vēlāk"]},
+    "lt": {"positive": ["taip", "gerai", "žinoma"], "negative": ["ne", "ne dabar", "vėliau"]},
+    "mk": {"positive": ["да", "може", "секако", "во ред"], "negative": ["не", "не сега", "подоцна"]},
+    "ms": {"positive": ["ya", "boleh", "baiklah", "okey"], "negative": ["tidak", "tak", "bukan sekarang", "nanti"]},
+    "ml": {"positive": ["അതെ", "ശരി", "തീർച്ചയായും"], "negative": ["ഇല്ല", "വേണ്ട", "പിന്നീട്"]},
+    "mr": {"positive": ["हो", "होय", "ठीक आहे", "नक्की"], "negative": ["नाही", "आता नाही", "नंतर"]},
+    "nb": {"positive": ["ja", "greit", "selvfølgelig", "ok greit"], "negative": ["nei", "ikke nå", "senere"]},
+    "fa": {"positive": ["بله", "آره", "باشه", "حتما"], "negative": ["نه", "خیر", "الان نه", "بعدا"]},
+    "pl": {"positive": ["tak", "dobrze", "jasne", "oczywiście", "pewnie"], "negative": ["nie", "nie teraz", "później"]},
+    "pt": {"positive": ["sim", "claro", "pode ser", "beleza", "tá bom", "ok pode"], "negative": ["não", "nao", "agora não", "depois", "mais tarde"]},
+    "pa": {"positive": ["ਹਾਂ", "ਠੀਕ ਹੈ", "ਜੀ"], "negative": ["ਨਹੀਂ", "ਨਾ", "ਬਾਅਦ ਵਿੱਚ"]},
+    "ro": {"positive": ["da", "bine", "sigur", "desigur"], "negative": ["nu", "nu acum", "mai târziu"]},
+    "ru": {"positive": ["да", "ага", "хорошо", "конечно", "давай", "ладно"], "negative": ["нет", "не сейчас", "позже", "не надо"]},
+    "sr": {"positive": ["да", "da", "може", "može", "наравно", "naravno"], "negative": ["не", "ne", "не сада", "ne sada", "касније", "kasnije"]},
+    "sk": {"positive": ["áno", "hej", "dobre", "jasné"], "negative": ["nie", "teraz nie", "neskôr"]},
+    "sl": {"positive": ["da", "ja", "v redu", "seveda"], "negative": ["ne", "ne zdaj", "kasneje"]},
+    "es": {"positive": ["sí", "si", "vale", "claro", "de acuerdo", "dale", "por supuesto"], "negative": ["no", "ahora no", "más tarde", "luego", "no gracias"]},
+    "sw": {"positive": ["ndiyo", "sawa", "hakika"], "negative": ["hapana", "si sasa", "baadaye"]},
+    "sv": {"positive": ["ja", "okej", "absolut", "gärna", "visst"], "negative": ["nej", "inte nu", "senare"]},
+    "ta": {"positive": ["ஆம்", "சரி", "நிச்சயமாக"], "negative": ["இல்லை", "வேண்டாம்", "பிறகு"]},
+    "te": {"positive": ["అవును", "సరే", "తప్పకుండా"], "negative": ["కాదు", "వద్దు", "తర్వాత"]},
+    "th": {"positive": ["ใช่", "ครับ", "ค่ะ", "ได้", "โอเค", "ตกลง"], "negative": ["ไม่", "ไม่ใช่", "ไม่เอา", "ทีหลัง"]},
+    "tr": {"positive": ["evet", "tamam", "olur", "tabii", "peki"], "negative": ["hayır", "şimdi değil", "sonra", "istemiyorum"]},
+    "uk": {"positive": ["так", "добре", "звичайно", "гаразд"], "negative": ["ні", "не зараз", "пізніше"]},
+    "ur": {"positive": ["ہاں", "جی", "ٹھیک ہے", "ضرور"], "negative": ["نہیں", "ابھی نہیں", "بعد میں"]},
+    "uz": {"positive": ["ha", "xo'p", "mayli", "albatta"], "negative": ["yo'q", "hozir emas", "keyin"]},
+    "vi": {"positive": ["có", "vâng", "dạ", "được", "ừ", "đồng ý"], "negative": ["không", "không phải", "để sau"]},
+    "zu": {"positive": ["yebo", "kulungile"], "negative": ["cha", "hhayi", "hhayi manje", "kamuva"]},
+}
+
+# Words that flip a positive reply ("not ok", "don't add") when they precede it
+NEGATION_WORDS = {
+    "not", "don't", "dont", "no", "never", "nicht", "pas", "non", "nahi", "nahin", "नहीं", "не", "nie", "ne", "ni",
+}
@@ -1,3 +1,16 @@
 # Prices are in USD per million token
 INPUT_COST_GPT_4O_MINI=0.15
-OUPUT_COST_GPT_4O_MINI=0.60
\ No newline at end of file
+OUPUT_COST_GPT_4O_MINI=0.60
+
+# (input, output) USD per million tokens for every model the router can pick
+MODEL_PRICES = {
+    "gpt-4o-mini": (INPUT_COST_GPT_4O_MINI, OUPUT_COST_GPT_4O_MINI),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+}
+
+# USD → INR conversion
+DEFAULT_USD_INR_RATE=88.0
+FX_RATE_TTL_SECONDS=6*60*60
+FX_RATE_RETRY_SECONDS=60
+FX_RATE_CACHE_FILE=".fx_rate_cache.json"
@@ -0,0 +1,11 @@
+# WhatsApp template limits (mirrors the rules stated in prompts/whatsapp_template_prompt.py)
+MAX_BUTTONS = 10
+BUTTON_TYPE_LIMITS = {
+    "URL": 2,
+    "PHONE_NUMBER": 1,
+    "COPY_CODE": 1,
+}
+BUTTON_TYPES = ("URL", "PHONE_NUMBER", "COPY_CODE", "QUICK_REPLY")
+CATEGORY_CODES = ("MARKETING", "UTILITY")
+MARKETING_HEADER_TYPES = ("IMAGE", "VIDEO", "DOCUMENT")
+DEFAULT_LANGUAGE_CODE = "en"
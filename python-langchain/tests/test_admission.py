@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.llm_client import LLMDispatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLLM:
+    calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        return "ok"
+
+
+def test_rejects_over_quota_then_recovers_after_refill():
+    clock = FakeClock()
+    # 60 tokens per second sustained, 100 at once
+    admission = AdmissionController(tokens_per_minute=3600, burst=100, max_wait=0, clock=clock)
+    admission.check("10.0.0.1", 80)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.check("10.0.0.1", 80)
+    assert rejected.value.reason == "rate_limited"
+    assert rejected.value.retry_after == pytest.approx(1.0)
+    assert rejected.value.retry_after_seconds == 1
+    # Another client has its own bucket
+    admission.check("10.0.0.2", 80)
+
+    clock.now += 1.0
+    admission.check("10.0.0.1", 80)
+    assert (admission.admitted, admission.rejected["rate_limited"]) == (3, 1)
+
+
+def test_overload_is_rejected_before_charging_the_bucket():
+    admission = AdmissionController(tokens_per_minute=3600, burst=100, max_wait=5, clock=FakeClock())
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.check("10.0.0.1", 80, estimated_wait=7)
+    assert (rejected.value.reason, rejected.value.retry_after) == ("overloaded", 2)
+    admission.check("10.0.0.1", 100)
+
+
+def test_blocked_batch_call_is_admitted_after_refill(monkeypatch):
+    clock = FakeClock()
+    admission = AdmissionController(tokens_per_minute=3600, burst=100, max_wait=0, clock=clock)
+    llm = CountingLLM()
+    dispatcher = LLMDispatcher(llm, admission=admission)
+    real_sleep, slept = asyncio.sleep, []
+
+    async def fake_sleep(delay):
+        # The wait for the refill passes on the fake clock
+        slept.append(delay)
+        clock.now += delay
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    class Message:
+        content = "x" * 300  # about 80 tokens with framing
+
+    async def scenario():
+        await dispatcher.invoke([Message()], client="batch-client", priority="batch", block=True)
+        with pytest.raises(AdmissionRejected):
+            await dispatcher.invoke([Message()], client="batch-client", priority="generate")
+        await dispatcher.invoke([Message()], client="batch-client", priority="batch", block=True)
+
+    asyncio.run(scenario())
+    assert llm.calls == 2
+    assert len(slept) == 1 and slept[0] > 0
+    assert admission.rejected["rate_limited"] == 2
@@ -0,0 +1,173 @@
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["FX_RATE_SOURCE"] = "local"
+os.environ["COST_LEDGER_PATH"] = ""
+os.environ["LLM_WARM_CONNECTIONS"] = "0"
+# Every test connects as "testclient"; a shared token bucket would reject later turns
+os.environ["ADMISSION_TOKENS_PER_MINUTE"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as server  # noqa: E402
+from prompts.whatsapp_template_prompt import PROMPT_SECTIONS  # noqa: E402
+from utils.fake_llm import DEFAULT_FAKE_RESPONSE, FakeChatModel  # noqa: E402
+from utils.fx_rates import rate_provider  # noqa: E402
+
+QUESTION = {"Body": "Which website should the button open?", "Buttons": []}
+FOLLOWUP = {"Body": "Want to add a quick reply too?", "Buttons": []}
+
+
+@pytest.fixture(scope="module")
+def client():
+    rate_provider.cache_file = None
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def receive_until(ws, predicate):
+    while True:
+        frame = json.loads(ws.receive_text())
+        if predicate(frame):
+            return frame
+
+
+def test_question_first_reply_keeps_first_phase_and_skips_local_edits(client):
+    calls = []
+
+    def respond(messages):
+        prompt = messages[-1].content
+        if "Suggest one friendly follow-up" in prompt:
+            return json.dumps(FOLLOWUP)
+        calls.append(messages)
+        return json.dumps(QUESTION) if len(calls) == 1 else DEFAULT_FAKE_RESPONSE
+
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(responses=respond, latency=0.01)
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text("create a template with a link button")
+        receive_until(ws, lambda f: f.get("Body") == QUESTION["Body"])
+
+        # Must reach the model: there is no template yet to edit locally
+        ws.send_text("add a quick reply button saying Not now")
+        template = receive_until(ws, lambda f: "name" in f)
+
+    assert template["name"] == json.loads(DEFAULT_FAKE_RESPONSE)["name"]
+    assert len(calls) == 2
+    # The real first generation still gets the naming rules of the "first" phase
+    assert PROMPT_SECTIONS["naming"].split("\n")[0] in calls[1][0].content
+
+
+def test_nameless_choice_reply_keeps_first_phase(client):
+    choices = {"Body": "Which festival is the sale for?",
+               "Buttons": [{"type": "QUICK_REPLY", "text": "Diwali", "url": ""}]}
+    calls = []
+
+    def respond(messages):
+        if "Suggest one friendly follow-up" in messages[-1].content:
+            return json.dumps(FOLLOWUP)
+        calls.append(messages)
+        return json.dumps(choices) if len(calls) == 1 else DEFAULT_FAKE_RESPONSE
+
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(responses=respond, latency=0.01)
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text("create a festive sale template")
+        receive_until(ws, lambda f: f.get("Body") == choices["Body"])
+        ws.send_text("diwali, with 20% off everything")
+        receive_until(ws, lambda f: "name" in f)
+
+    assert len(calls) == 2
+    assert PROMPT_SECTIONS["naming"].split("\n")[0] in calls[1][0].content
+
+
+def conversation_state():
+    state = server.ConversationState()
+    state.history = server.ConversationHistory(server.SYSTEM_MESSAGE)
+    return state
+
+
+def test_followup_is_accounted_even_when_unparsable(client):
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(responses=["not json at all"], latency=0)
+    state = conversation_state()
+    client.portal.call(server.send_followup, None, state, json.loads(DEFAULT_FAKE_RESPONSE))
+    assert state.total_spent > 0
+    assert state.last_sent_body is None
+
+
+def test_intent_fallback_is_accounted(client):
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(responses=['{"intent": "positive"}'], latency=0)
+    state = conversation_state()
+    intent = client.portal.call(server.llm_detect_intent, "hmm alright then", state)
+    assert intent == "positive"
+    assert state.total_spent > 0
+
+
+def test_reload_shows_the_resumed_template_before_a_new_request(client):
+    holi = {**json.loads(DEFAULT_FAKE_RESPONSE), "Body": "🎨 Holi offer: 20% off all cakes till {{1}}."}
+    calls = []
+
+    def respond(messages):
+        if "Suggest one friendly follow-up" in messages[-1].content:
+            return json.dumps(FOLLOWUP)
+        calls.append(messages)
+        return DEFAULT_FAKE_RESPONSE if len(calls) == 1 else json.dumps(holi)
+
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(responses=respond, latency=0.01)
+    with client.websocket_connect("/ws?session=new") as ws:
+        session_id = receive_until(ws, lambda f: f.get("frame") == "session")["session_id"]
+        ws.send_text("diwali sale template for a clothing store")
+        first = receive_until(ws, lambda f: "name" in f)
+        receive_until(ws, lambda f: f.get("Body") == FOLLOWUP["Body"])
+
+    # A page reload reconnects with the saved id
+    with client.websocket_connect(f"/ws?session={session_id}") as ws:
+        session = receive_until(ws, lambda f: f.get("frame") == "session")
+        assert session["resumed"] is True
+        assert session["requests"] == ["diwali sale template for a clothing store"]
+        # The template being edited is shown again before anything is asked
+        shown = receive_until(ws, lambda f: "Body" in f)
+        assert shown == {k: v for k, v in first.items() if k not in ("tokens", "total_spent")}
+
+        ws.send_text("make it a holi offer for a bakery instead")
+        template = receive_until(ws, lambda f: "name" in f)
+
+    assert template["Body"] == holi["Body"]
+    assert any(m.content == "diwali sale template for a clothing store" for m in calls[1])
+
+
+def test_tenant_label_in_the_query_does_not_escape_the_budget(client):
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(latency=0)
+    budget, spent = server.cost_ledger.tenant_budget, dict(server.cost_ledger.tenant_spent)
+    server.cost_ledger.tenant_budget = 1.0
+    server.cost_ledger.tenant_spent["client:testclient"] = 2.0
+    try:
+        with client.websocket_connect("/ws?tenant=brand-new") as ws:
+            # Not cached by earlier tests; a cache hit is free and skips the budget check
+            ws.send_text("monsoon clearance template for a shoe store")
+            reply = receive_until(ws, lambda f: "Body" in f)
+    finally:
+        server.cost_ledger.tenant_budget = budget
+        server.cost_ledger.tenant_spent = spent
+    assert reply["Body"] == server.BUDGET_MESSAGES["tenant"]
+
+
+def test_unknown_language_code_keeps_the_templates_language(client):
+    hindi = {**json.loads(DEFAULT_FAKE_RESPONSE), "languageCode": "hi", "Body": "🎉 दिवाली सेल! {{1}} तक।"}
+    edited = {**hindi, "languageCode": "NA", "Body": "🎉 दिवाली मेगा सेल! {{1}} तक।"}
+    calls = []
+
+    def respond(messages):
+        if "Suggest one friendly follow-up" in messages[-1].content:
+            return json.dumps(FOLLOWUP)
+        calls.append(messages)
+        return json.dumps(hindi if len(calls) == 1 else edited)
+
+    server.router.backends[server.MODEL_NAME].llm = FakeChatModel(responses=respond, latency=0.01)
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text("दिवाली सेल के लिए टेम्पलेट बनाओ")
+        receive_until(ws, lambda f: "name" in f)
+        ws.send_text("make the sale sound bigger")
+        template = receive_until(ws, lambda f: f.get("Body") == edited["Body"])
+
+    assert template["languageCode"] == "hi"
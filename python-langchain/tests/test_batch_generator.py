@@ -0,0 +1,35 @@
+import asyncio
+
+from utils.batch_generator import BatchItemError, BatchRunner
+
+TOKENS = {"input": 100, "output": 20, "total_cost": 0.5}
+
+
+def run(generate, jobs):
+    async def collect():
+        return [item async for item in BatchRunner(generate, concurrency=2).run(jobs)]
+    return asyncio.run(collect())
+
+
+def job(job_id, prompt):
+    return {"id": job_id, "prompt": prompt, "brief": prompt, "language": None}
+
+
+def test_paid_failures_count_in_the_summary():
+    async def generate(job):
+        if job["prompt"] == "vague":
+            raise BatchItemError("No template generated: which product?", dict(TOKENS))
+        if job["prompt"] == "budget":
+            raise RuntimeError("tenant budget exceeded")
+        return {"template": {"name": "ok"}, "tokens": dict(TOKENS)}
+
+    items = run(generate, [job("1", "diwali"), job("2", "vague"), job("3", "budget"), job("4", "vague")])
+    summary = items[-1]
+    by_id = {item["id"]: item for item in items[:-1]}
+
+    assert by_id["2"]["tokens"] == TOKENS
+    assert "tokens" not in by_id["3"]
+    # The duplicate prompt shares item 2's single call and isn't counted twice
+    assert "tokens" not in by_id["4"]
+    assert (summary["succeeded"], summary["failed"]) == (1, 3)
+    assert summary["tokens"] == {"input": 200, "output": 40, "total_cost": 1.0}
@@ -0,0 +1,17 @@
+from utils.cost_ledger import CostLedger, parse_tenant_keys
+
+
+def test_tenant_comes_from_a_configured_key_or_the_client_address():
+    ledger = CostLedger(tenant_keys=parse_tenant_keys("k1=acme, k2=globex,broken,=x"))
+    assert ledger.tenant_keys == {"k1": "acme", "k2": "globex"}
+    assert ledger.tenant_for("k1", "10.0.0.1") == "acme"
+    # An unknown key is not a tenant of its own, or every new key would get a fresh budget
+    assert ledger.tenant_for("made-up", "10.0.0.1") == "client:10.0.0.1"
+    assert ledger.tenant_for(None, None) == "default"
+
+
+def test_tenant_budget_holds_across_keys_of_the_same_client():
+    ledger = CostLedger(tenant_budget=1.0)
+    ledger.record("s1", ledger.tenant_for("first", "10.0.0.1"), "generate", "m", 1, 1, 1.5)
+    assert ledger.budget_exceeded(ledger.tenant_for("second", "10.0.0.1"), 0.0) == "tenant"
+    assert ledger.budget_exceeded(ledger.tenant_for(None, "10.0.0.2"), 0.0) is None
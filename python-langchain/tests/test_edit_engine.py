@@ -0,0 +1,25 @@
+from utils.edit_engine import apply_edit
+
+TEMPLATE = {
+    "name": "diwali_sale", "categoryCode": "MARKETING", "languageCode": "en",
+    "Body": "Diwali sale! Get 50% off on all clothes until {{1}}. Shop now and save big.",
+    "Buttons": [{"type": "URL", "text": "Shop Now", "url": "https://example.com", "urlType": "static"}],
+}
+
+
+def test_language_code_fix_within_the_same_language_is_local():
+    kind, data, command = apply_edit("set the language code to en_US", TEMPLATE)
+    assert (kind, command) == ("template", "language_code")
+    assert data["languageCode"] == "en_US"
+    assert data["Body"] == TEMPLATE["Body"]
+
+
+def test_mislabelled_body_is_relabelled_locally():
+    hindi = {**TEMPLATE, "Body": "दिवाली सेल! {{1}} तक सभी कपड़ों पर 50% की छूट। अभी खरीदें।"}
+    kind, data, _ = apply_edit("change the language code to hi", hindi)
+    assert kind == "template" and data["languageCode"] == "hi"
+
+
+def test_real_language_change_goes_to_the_model():
+    assert apply_edit("change the language code to hi", TEMPLATE) is None
+    assert apply_edit("change it to Hindi", TEMPLATE) is None
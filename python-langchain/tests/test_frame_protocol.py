@@ -0,0 +1,42 @@
+import json
+
+from utils.fake_llm import DEFAULT_FAKE_RESPONSE
+from utils.frame_protocol import FrameWriter, loads
+from utils.json_patch import apply_patch, json_diff
+
+TEMPLATE = json.loads(DEFAULT_FAKE_RESPONSE)
+
+
+def edits():
+    """A template, a follow-up in between, then edits as a session would send them."""
+    followup = {"Body": "Shall I add a 'Call Now' button?", "Buttons": []}
+    renamed = {**TEMPLATE, "name": "diwali_mega_sale", "tokens": {"input": 1500}}
+    buttons = {**renamed, "Buttons": TEMPLATE["Buttons"] + [{"type": "PHONE_NUMBER", "text": "Call Now"}]}
+    shorter = {**buttons, "Buttons": buttons["Buttons"][:1], "header": {"type": "TEXT", "body": "a/b ~ c"}}
+    return [TEMPLATE, followup, renamed, buttons, shorter]
+
+
+def test_apply_patch_inverts_json_diff():
+    docs = edits()
+    for old, new in zip(docs, docs[1:]):
+        assert apply_patch(old, json_diff(old, new)) == new
+    assert apply_patch(TEMPLATE, [{"op": "replace", "path": "", "value": []}]) == []
+
+
+def test_deltas_decode_to_the_sent_documents():
+    writer = FrameWriter(None, version=2, keep_bases=2)
+    bases, kinds, delta_bases = {}, [], []
+    for data in edits():
+        frame = loads(writer.encode(data))
+        if frame["t"] == "delta":
+            doc = apply_patch(bases[frame["base"]], frame["ops"])
+            delta_bases.append(frame["base"])
+        else:
+            doc = frame["doc"]
+        bases[frame["seq"]] = doc
+        kinds.append(frame["t"])
+        assert doc == {k: v for k, v in data.items() if k != "tokens"}
+        assert frame["acct"] == ({"tokens": data["tokens"]} if "tokens" in data else {})
+    # The edit after the follow-up diffs against the template, not the follow-up
+    assert kinds == ["snap", "snap", "delta", "delta", "delta"]
+    assert delta_bases[0] == 1
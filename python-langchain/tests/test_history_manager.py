@@ -0,0 +1,69 @@
+import tracemalloc
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from utils.edit_engine import apply_edit
+from utils.history_manager import ConversationHistory
+
+TEMPLATE = {
+    "name": "diwali_sale", "categoryCode": "MARKETING", "languageCode": "en",
+    "Body": "Diwali sale! 50% off until {{1}}.", "Buttons": [],
+}
+QUESTION = {"Body": "Please provide a valid URL for the button.", "Buttons": []}
+
+
+def history():
+    return ConversationHistory(SystemMessage(content="system"))
+
+
+def test_question_first_reply_is_not_a_template():
+    h = history()
+    h.append(HumanMessage(content="add a link button"))
+    h.append_template({**QUESTION, "tokens": {}, "total_spent": 0.0})
+    assert h.latest_doc is None
+    assert h.latest_template is None
+    # Without a current template, edit requests go to the model
+    assert h.turns[-1][0].content.startswith('{"Body"')
+
+
+def test_question_keeps_the_current_template():
+    h = history()
+    h.append_template(TEMPLATE)
+    h.append(HumanMessage(content="add a url button"))
+    h.append_template(QUESTION)
+    assert h.latest_doc == TEMPLATE
+
+    kind, data, _ = apply_edit("add a quick reply button saying Not now", h.latest_doc)
+    assert kind == "template"
+    assert data["name"] == "diwali_sale"
+    assert data["Body"] == TEMPLATE["Body"]
+
+
+def test_restored_history_ignores_questions():
+    h = history()
+    h.append_template(TEMPLATE)
+    h.append_template(QUESTION)
+    restored = ConversationHistory.from_dict(SystemMessage(content="system"), h.to_dict())
+    assert restored.latest_doc == TEMPLATE
+
+
+
+def test_turn_accounting_stays_constant_size():
+    history = ConversationHistory(SystemMessage(content="system prompt"), budget=200, keep_recent=2)
+    for i in range(50):
+        history.append(HumanMessage(content=f"request {i} " + "x" * 40))
+        history.messages()
+    footprint = history.footprint()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(2000):
+        history.messages()
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    assert history.last_turn_stats()["turn"] == 2050
+    assert history.stats()["turns"] == 2050
+    assert history.stats()["saved_tokens"] > 0
+    # Per-turn stats are not kept, so neither memory nor the footprint grows with turns
+    assert grown < 10_000
+    assert history.footprint() - footprint < 20
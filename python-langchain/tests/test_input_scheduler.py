@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from utils.input_scheduler import InputScheduler
+
+
+class Disconnected(Exception):
+    pass
+
+
+class FakeSocket:
+    """`receive()` returns queued texts in order and raises Disconnected after `disconnect()`."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def receive(self):
+        text = await self.queue.get()
+        if text is None:
+            raise Disconnected()
+        return text
+
+    def send(self, *texts):
+        for text in texts:
+            self.queue.put_nowait(text)
+
+    def disconnect(self):
+        self.queue.put_nowait(None)
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_a_burst_becomes_one_batch():
+    async def scenario():
+        socket = FakeSocket()
+        scheduler = InputScheduler(socket.receive, debounce=0.05)
+        scheduler.start()
+        socket.send("make a diwali template", "for a clothing store")
+        await settle()
+        batch = asyncio.create_task(scheduler.next_batch())
+        # Still inside the debounce window: joins the same batch
+        await asyncio.sleep(0.02)
+        socket.send("with 20% off")
+        batch = await batch
+        await scheduler.stop()
+        return batch, scheduler.stats()
+
+    batch, stats = asyncio.run(scenario())
+    assert batch == ["make a diwali template", "for a clothing store", "with 20% off"]
+    assert stats["coalesced"] == 2
+
+
+def test_a_lone_message_is_not_debounced():
+    async def scenario():
+        socket = FakeSocket()
+        scheduler = InputScheduler(socket.receive, debounce=10)
+        scheduler.start()
+        socket.send("make a diwali template")
+        batch = await asyncio.wait_for(scheduler.next_batch(), 1)
+        await scheduler.stop()
+        return batch
+
+    assert asyncio.run(scenario()) == ["make a diwali template"]
+
+
+def test_input_during_the_llm_call_cancels_the_turn():
+    async def scenario():
+        socket = FakeSocket()
+        seen = []
+        scheduler = InputScheduler(socket.receive, debounce=0.01, on_input=seen.append)
+        scheduler.start()
+        socket.send("first")
+        await scheduler.next_batch()
+
+        async def turn(calling):
+            scheduler.superseded_by_input(calling)
+            await asyncio.sleep(0.05)
+            scheduler.superseded_by_input(False)
+
+        # Outside the cancellable section a new message waits for the next turn
+        kept = asyncio.create_task(scheduler.run_turn(turn(False)))
+        await settle()
+        socket.send("second")
+        assert await kept is True
+
+        superseded = asyncio.create_task(scheduler.run_turn(turn(True)))
+        await settle()
+        socket.send("third")
+        assert await superseded is False
+        batch = await scheduler.next_batch()
+        await scheduler.stop()
+        return batch, seen, scheduler.stats()
+
+    batch, seen, stats = asyncio.run(scenario())
+    assert batch == ["second", "third"]
+    assert seen == ["first", "second", "third"]
+    assert stats["superseded"] == 1
+
+
+def test_reader_stops_receiving_when_the_queue_is_full():
+    async def scenario():
+        socket = FakeSocket()
+        scheduler = InputScheduler(socket.receive, debounce=0.01, max_queue=2)
+        scheduler.start()
+        socket.send("1", "2", "3", "4", "5")
+        await settle()
+        held = (scheduler.received, scheduler.backpressure_waits, socket.queue.qsize())
+        first = await scheduler.next_batch()
+        await settle()
+        await scheduler.stop()
+        return held, first, scheduler.received
+
+    held, first, received = asyncio.run(scenario())
+    # Two buffered, the rest left unread on the socket
+    assert held == (2, 1, 3)
+    assert first == ["1", "2"]
+    assert received == 4
+
+
+def test_disconnect_surfaces_after_queued_messages():
+    async def scenario():
+        socket = FakeSocket()
+        scheduler = InputScheduler(socket.receive, debounce=0.01)
+        scheduler.start()
+        socket.send("last words")
+        await settle()
+        socket.disconnect()
+        batch = await scheduler.next_batch()
+        with pytest.raises(Disconnected):
+            await scheduler.next_batch()
+        await scheduler.stop()
+        return batch
+
+    assert asyncio.run(scenario()) == ["last words"]
@@ -0,0 +1,40 @@
+import json
+
+from utils.fake_llm import DEFAULT_FAKE_RESPONSE
+from utils.json_stream import JSONFieldStream, extract_json_objects
+
+TEMPLATE = json.loads(DEFAULT_FAKE_RESPONSE)
+FOLLOWUP = {"Body": "Shall I add a 'Call Now' button?", "Buttons": []}
+
+
+def test_fenced_objects_and_prose_braces():
+    text = f"Here you go {{name}}:\n```json\n{DEFAULT_FAKE_RESPONSE}\n```\n{json.dumps(FOLLOWUP)}"
+    assert extract_json_objects(text) == [TEMPLATE, FOLLOWUP]
+
+
+def test_truncated_template_yields_no_nested_objects():
+    truncated = DEFAULT_FAKE_RESPONSE[:DEFAULT_FAKE_RESPONSE.index("View Deals")]
+    assert extract_json_objects(truncated) == []
+    assert extract_json_objects(json.dumps(FOLLOWUP) + "\n" + truncated) == [FOLLOWUP]
+
+
+def test_malformed_template_is_skipped_whole():
+    # A missing comma breaks the outer object; its header and buttons are complete objects
+    broken = DEFAULT_FAKE_RESPONSE.replace(', "languageCode"', ' "languageCode"')
+    assert extract_json_objects(broken + json.dumps(FOLLOWUP)) == [FOLLOWUP]
+
+
+def test_braces_and_escapes_inside_strings_do_not_end_the_span():
+    broken = '{"Body": "a } brace and a \\" quote {", "Buttons": [{"text": "x"}] oops}'
+    assert extract_json_objects(broken + json.dumps(FOLLOWUP)) == [FOLLOWUP]
+
+
+def test_stream_scanner_matches_for_nested_input():
+    text = "```json\n" + DEFAULT_FAKE_RESPONSE + "\n```"
+    scanner = JSONFieldStream()
+    fields = []
+    for i in range(0, len(text), 7):
+        fields += [key for key, _ in scanner.feed(text[i:i + 7])]
+    assert scanner.objects == [TEMPLATE]
+    # Only top-level fields are reported, never the buttons' "type" / "text"
+    assert fields == list(TEMPLATE)
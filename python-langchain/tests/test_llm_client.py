@@ -0,0 +1,109 @@
+import asyncio
+
+from utils.llm_client import LLMDispatcher
+
+
+class GatedLLM:
+    """Each call records its name and holds its slot until `finish(name)`."""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+
+    async def ainvoke(self, messages, **kwargs):
+        name = messages[0]
+        self.started.append(name)
+        self.gates[name] = asyncio.Event()
+        await self.gates[name].wait()
+        return name
+
+    def finish(self, name):
+        self.gates[name].set()
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def call(dispatcher, name, priority="generate", connection_id=None):
+    return asyncio.create_task(dispatcher.invoke([name], connection_id=connection_id, priority=priority))
+
+
+def test_interactive_calls_overtake_queued_batch_items():
+    async def scenario():
+        llm = GatedLLM()
+        dispatcher = LLMDispatcher(llm, max_concurrency=1, per_connection=8)
+        tasks = [call(dispatcher, "running")]
+        await settle()
+        for name, priority in (("batch", "batch"), ("followup", "followup"), ("generate", "generate"),
+                               ("intent", "intent")):
+            tasks.append(call(dispatcher, name, priority))
+            await settle()
+        for name in ("running", "intent", "generate", "followup", "batch"):
+            llm.finish(name)
+            await settle()
+        await asyncio.gather(*tasks)
+        return llm.started
+
+    assert asyncio.run(scenario()) == ["running", "intent", "generate", "followup", "batch"]
+
+
+def test_a_long_waiting_batch_item_is_promoted():
+    async def scenario():
+        llm = GatedLLM()
+        # A batch item ranks 3 steps (60 ms) behind its arrival; after 100 ms it beats a new generation
+        dispatcher = LLMDispatcher(llm, max_concurrency=1, priority_step=0.02)
+        tasks = [call(dispatcher, "running")]
+        await settle()
+        tasks.append(call(dispatcher, "batch", "batch"))
+        await asyncio.sleep(0.1)
+        tasks.append(call(dispatcher, "generate", "generate"))
+        await settle()
+        for name in ("running", "batch", "generate"):
+            llm.finish(name)
+            await settle()
+        await asyncio.gather(*tasks)
+        return llm.started
+
+    assert asyncio.run(scenario()) == ["running", "batch", "generate"]
+
+
+def test_a_slot_granted_to_a_cancelled_waiter_goes_to_the_next_one():
+    async def scenario():
+        dispatcher = LLMDispatcher(None, max_concurrency=1)
+        await dispatcher._acquire_global(0)
+        first = asyncio.create_task(dispatcher._acquire_global(1))
+        second = asyncio.create_task(dispatcher._acquire_global(2))
+        await settle()
+        # The slot is handed to `first`, which is cancelled before it resumes
+        dispatcher._release_global()
+        first.cancel()
+        await settle()
+        assert first.cancelled()
+        assert second.done() and dispatcher._free == 0
+        dispatcher._release_global()
+        return dispatcher._free, dispatcher._waiters
+
+    assert asyncio.run(scenario()) == (1, [])
+
+
+def test_per_connection_limit_serializes_one_socket_only():
+    async def scenario():
+        llm = GatedLLM()
+        dispatcher = LLMDispatcher(llm, max_concurrency=4, per_connection=1)
+        tasks = [call(dispatcher, "a1", connection_id="a"), call(dispatcher, "a2", connection_id="a"),
+                 call(dispatcher, "b1", connection_id="b")]
+        await settle()
+        assert llm.started == ["a1", "b1"]
+        llm.finish("a1")
+        await settle()
+        assert llm.started == ["a1", "b1", "a2"]
+        llm.finish("a2")
+        llm.finish("b1")
+        await asyncio.gather(*tasks)
+        dispatcher.release_connection("a")
+        return dispatcher.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert (metrics["completed"], metrics["in_flight"], metrics["connections"]) == (3, 0, 1)
@@ -0,0 +1,19 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from utils.fake_llm import FakeChatModel
+from utils.llm_recorder import LLMRecorder, message_key
+
+
+def test_memory_is_capped_and_evicted_recordings_replay_from_disk(tmp_path):
+    recorder = LLMRecorder(FakeChatModel(latency=0), str(tmp_path), mode="auto", memory_max=2)
+
+    async def turns():
+        for text in ("a", "b", "c", "a"):
+            await recorder.ainvoke([HumanMessage(content=text)])
+
+    asyncio.run(turns())
+    # "a" fell out of memory when "c" was recorded and was read back from disk
+    assert (recorder.recorded, recorder.hits) == (3, 1)
+    assert list(recorder._memory) == [message_key([HumanMessage(content=t)]) for t in ("c", "a")]
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+
+from utils.model_clients import ProviderPool
+
+
+def pool(**kwargs):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, json={"data": []})
+
+    provider = ProviderPool("test", "https://provider.test/v1", "key", keepalive=10, **kwargs)
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler),
+                                        event_hooks={"request": [provider._on_request]})
+    return provider, requests
+
+
+def test_rewarm_loop_is_opt_in():
+    async def scenario():
+        default, _ = pool()
+        enabled, _ = pool(rewarm=True)
+        default.start()
+        enabled.start()
+        started = (default._task is not None, enabled._task is not None)
+        await default.stop()
+        await enabled.stop()
+        return started
+
+    assert asyncio.run(scenario()) == (False, True)
+
+
+def test_only_real_traffic_keeps_the_pool_warm():
+    async def scenario():
+        provider, requests = pool(rewarm=True)
+        # Startup warm-up alone never counts as traffic
+        await provider.warm()
+        idle_after_warm = provider.last_used
+        await provider.client.post("https://provider.test/v1/chat/completions")
+        used = provider.last_used
+        await provider.client.aclose()
+        return requests, idle_after_warm, used, provider
+
+    requests, idle_after_warm, used, provider = asyncio.run(scenario())
+    assert requests == ["/v1/models", "/v1/models", "/v1/chat/completions"]
+    assert idle_after_warm == 0.0
+    assert not provider.should_rewarm(used + 5)       # still busy
+    assert provider.should_rewarm(used + 15)          # a lull after recent traffic
+    assert not provider.should_rewarm(used + 3600)    # idle for an hour: leave it cold
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from utils.fake_llm import FakeChatModel
+from utils.model_router import ModelRouter
+
+
+class SlowStream:
+    """First chunk after `first`, then one more after `rest`; `rest=None` stalls forever."""
+
+    def __init__(self, first=0.0, rest=0.1):
+        self.first = first
+        self.rest = rest
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.first)
+        yield AIMessageChunk(content="{")
+        await asyncio.sleep(self.rest if self.rest is not None else 3600)
+        yield AIMessageChunk(content="}")
+
+
+def collect(router, task="generate"):
+    async def run():
+        return [chunk async for chunk in router.astream(["hi"], task=task)]
+    return asyncio.run(run())
+
+
+def router_for(primary, secondary=None, **kwargs):
+    backends = {"primary": primary}
+    if secondary is not None:
+        backends["secondary"] = secondary
+    return ModelRouter(backends, routes={"generate": list(backends)}, **kwargs)
+
+
+def test_streams_record_first_chunk_and_leave_the_hedge_delay_alone():
+    router = router_for(SlowStream(rest=0.1), FakeChatModel(latency=0), hedge_after=2.0, min_samples=3)
+    for _ in range(3):
+        collect(router)
+    primary = router.backends["primary"]
+    assert primary.latency(0.5, streamed=True) < 0.05
+    # Full stream durations must not become the hedge delay of ainvoke
+    assert primary.latency(0.95) is None
+    assert router._hedge_delay(primary) == 2.0
+
+
+def test_stalled_stream_before_first_chunk_fails_over():
+    router = router_for(SlowStream(first=3600), FakeChatModel(latency=0, responses=["ok"]), timeout=0.05)
+    chunks = collect(router)
+    assert "".join(c.content for c in chunks) == "ok"
+    assert chunks[-1].response_metadata["router_backend"] == "secondary"
+    assert router.backends["primary"].errors == 1
+
+
+def test_stall_after_first_chunk_raises_instead_of_holding_the_slot():
+    router = router_for(SlowStream(rest=None), timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        collect(router)
+    assert router.backends["primary"].errors == 1
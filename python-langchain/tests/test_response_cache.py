@@ -0,0 +1,54 @@
+import asyncio
+import sqlite3
+
+from utils.response_cache import ResponseCache, mentioned_language, normalized_request
+
+TEMPLATE = {"name": "shoe_offer", "Body": "Buy 1 get 2 free on shoes", "Buttons": []}
+
+
+def cached(cache, request, template=TEMPLATE):
+    asyncio.run(cache.put(request, template))
+    return cache
+
+
+def test_normalized_request_keeps_order_numbers_and_repeats():
+    assert normalized_request("Please create a Diwali sale template in Hindi!") == "diwali sale in hindi"
+    assert normalized_request("buy 1 get 2") != normalized_request("buy 2 get 1")
+    assert normalized_request("sale sale") == "sale sale"
+
+
+def test_swapped_offers_do_not_share_a_key():
+    cache = cached(ResponseCache(), "Buy 1 get 2 free on shoes")
+    assert cache.get("buy 2 get 1 free on shoes") is None
+
+    cache = cached(ResponseCache(), "50% off shirts, 10% off shoes")
+    assert cache.get("10% off shirts, 50% off shoes") is None
+
+
+def test_normalized_hit_ignores_case_punctuation_and_filler():
+    cache = cached(ResponseCache(), "Buy 1 get 2 free on shoes")
+    assert cache.get("please create a template: buy 1 get 2 free on shoes!") == TEMPLATE
+
+
+def test_semantic_tier_requires_the_same_numbers():
+    cache = cached(ResponseCache(semantic_threshold=0.5), "buy 1 get 2 free on running shoes")
+    assert cache.get("buy 2 get 1 free on running shoes") is None
+    assert cache.get("buy 1 get 2 free on the running shoes today") == TEMPLATE
+
+
+def test_language_scope_uses_detector_names():
+    assert mentioned_language("chinese new year sale") == "zh_CN"
+    assert mentioned_language("promo in portuguese") == "pt_BR"
+    assert mentioned_language("diwali sale") == "auto"
+    cache = cached(ResponseCache(), "new year sale in chinese")
+    assert cache.get("new year sale in portuguese") is None
+
+
+def test_evicted_entries_are_deleted_from_sqlite(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(max_entries=1, path=path)
+    asyncio.run(cache.put("diwali sale", TEMPLATE))
+    asyncio.run(cache.put("holi sale", TEMPLATE))
+    rows = sqlite3.connect(path).execute("SELECT request FROM responses").fetchall()
+    assert rows == [("holi sale",)]
+    assert ResponseCache(path=path).get("holi sale") == TEMPLATE
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+from utils.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def test_memory_store_drops_least_recently_saved_past_cap():
+    async def run():
+        store = InMemorySessionStore(max_sessions=2)
+        await store.put("a", {"n": 1})
+        await store.put("b", {"n": 2})
+        await store.put("a", {"n": 3})
+        await store.put("c", {"n": 4})
+        return [await store.get(s) for s in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [{"n": 3}, None, {"n": 4}]
+
+
+def test_evict_expired_prunes_both_stores(tmp_path):
+    async def run(store):
+        await store.put("old", {"n": 1})
+        store.ttl = 60
+        await store.put("new", {"n": 2})
+        time.sleep(0.02)
+        await store.evict_expired()
+
+    memory = InMemorySessionStore(ttl=0.01)
+    asyncio.run(run(memory))
+    assert list(memory._sessions) == ["new"]
+
+    sqlite = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=0.01)
+    asyncio.run(run(sqlite))
+    assert sqlite._db.execute("SELECT id FROM sessions").fetchall() == [("new",)]
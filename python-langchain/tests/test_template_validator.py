@@ -0,0 +1,33 @@
+import json
+
+from utils.fake_llm import DEFAULT_FAKE_RESPONSE
+from utils.template_validator import normalize_language_code, repair_template
+
+TEMPLATE = json.loads(DEFAULT_FAKE_RESPONSE)
+
+
+def test_known_codes_and_names_are_normalized():
+    assert normalize_language_code("EN-us") == "en_US"
+    assert normalize_language_code("hindi") == "hi"
+    assert normalize_language_code("NA") is None
+    data, issues = repair_template({**TEMPLATE, "languageCode": "Hindi"})
+    assert data["languageCode"] == "hi"
+    assert issues == ["languageCode 'Hindi' -> 'hi'"]
+
+
+def test_unknown_code_is_reported_and_kept_without_a_fallback():
+    data, issues = repair_template({**TEMPLATE, "languageCode": "NA"})
+    assert data["languageCode"] == "NA"
+    assert issues == ["unknown languageCode 'NA' kept"]
+
+
+def test_unknown_code_falls_back_to_the_conversation_language():
+    data, issues = repair_template({**TEMPLATE, "languageCode": "xx"}, language="mr")
+    assert data["languageCode"] == "mr"
+    assert issues == ["unknown languageCode 'xx' -> 'mr'"]
+
+
+def test_missing_code_gets_the_conversation_language_or_the_default():
+    template = {k: v for k, v in TEMPLATE.items() if k != "languageCode"}
+    assert repair_template(template, language="ta")[0]["languageCode"] == "ta"
+    assert repair_template(template)[0]["languageCode"] == "en"
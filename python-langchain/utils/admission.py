@@ -0,0 +1,140 @@
+# utils/admission.py
+
+import math
+import os
+import time
+from collections import Counter
+
+from langchain_core.messages import SystemMessage
+
+from utils.token_counter import estimate_prompt_tokens, estimate_tokens
+
+# Queue order of LLM calls, lowest first: intent checks are short and block
+# the user's turn; follow-ups and batch items can wait behind interactive turns
+TASK_PRIORITY = {"intent": 0, "generate": 1, "followup": 2, "batch": 3}
+
+
+class AdmissionRejected(Exception):
+    """An LLM call refused before it queued; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"{reason}, retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_seconds(self) -> int:
+        """Whole seconds for Retry-After headers and client messages."""
+        return max(1, math.ceil(self.retry_after))
+
+
+class TokenBucket:
+    """Holds up to `capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float, now: float = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float, now: float = None) -> float:
+        """Takes `amount` and returns 0, or takes nothing and returns the seconds until it is available."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        # A prompt larger than the whole bucket is admitted from a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def prompt_cost(messages) -> int:
+    """Estimated prompt tokens; the shared system prompts hit the memoized estimate."""
+    return sum(
+        (estimate_prompt_tokens(m.content) if isinstance(m, SystemMessage) else estimate_tokens(m.content)) + 4
+        for m in messages
+    )
+
+
+class AdmissionController:
+    """
+    Decides whether an LLM call may queue at all.
+
+    Every client (IP, or connection when the IP is unknown) has a token bucket
+    in estimated prompt tokens: `tokens_per_minute` sustained, up to `burst` at
+    once. A call is also refused when the dispatcher estimates its queue wait
+    at more than `max_wait` seconds, so overload surfaces as an immediate
+    rejection with a retry-after hint instead of ever-growing latency.
+    A limit of 0 disables that check. `clock` is the time source for the buckets.
+    """
+
+    def __init__(self, tokens_per_minute: float = 60000, burst: float = 20000, max_wait: float = 20.0,
+                 max_clients: int = 10000, clock=time.monotonic):
+        self.rate = tokens_per_minute / 60
+        self.burst = burst or tokens_per_minute
+        self.max_wait = max_wait
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = {}
+        self.admitted = 0
+        self.rejected = Counter()
+
+    def check(self, client, cost: float, estimated_wait: float = 0.0):
+        """Charges `cost` to the client's bucket or raises AdmissionRejected."""
+        if self.max_wait and estimated_wait > self.max_wait:
+            self.rejected["overloaded"] += 1
+            raise AdmissionRejected("overloaded", estimated_wait - self.max_wait)
+        if client is not None and self.rate:
+            now = self.clock()
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._prune()
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            wait = bucket.take(cost, now)
+            if wait:
+                self.rejected["rate_limited"] += 1
+                raise AdmissionRejected("rate_limited", wait)
+        self.admitted += 1
+
+    def _prune(self):
+        """Forgets clients whose bucket has refilled; they would start full anyway."""
+        now = self.clock()
+        for client in [c for c, bucket in self._buckets.items() if bucket.full(now)]:
+            del self._buckets[client]
+        # Every client is mid-burst: drop the least recently charged ones
+        if len(self._buckets) >= self.max_clients:
+            oldest = sorted(self._buckets, key=lambda c: self._buckets[c].updated)
+            for client in oldest[:len(self._buckets) - self.max_clients + 1]:
+                del self._buckets[client]
+
+    def stats(self):
+        return {
+            "tokens_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "max_wait": self.max_wait,
+            "clients": len(self._buckets),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def build_admission_controller():
+    """
+    Reads ADMISSION_TOKENS_PER_MINUTE, ADMISSION_BURST_TOKENS and
+    ADMISSION_MAX_WAIT_SECONDS from the environment.
+    """
+    return AdmissionController(
+        tokens_per_minute=float(os.environ.get("ADMISSION_TOKENS_PER_MINUTE", 60000)),
+        burst=float(os.environ.get("ADMISSION_BURST_TOKENS", 20000)),
+        max_wait=float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", 20)),
+    )
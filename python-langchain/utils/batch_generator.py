@@ -0,0 +1,128 @@
+# utils/batch_generator.py
+
+import asyncio
+import time
+
+from constants.language_constants import LANGUAGE_LIST
+
+LANGUAGE_NAMES = {lang["code"]: lang["name"] for lang in LANGUAGE_LIST if lang["code"] != "NA"}
+
+
+class BatchError(ValueError):
+    """Raised for a batch request that can't be scheduled (unknown language, too many items)."""
+
+
+class BatchItemError(Exception):
+    """An item that failed after the model was called; `tokens` is what that call used."""
+
+    def __init__(self, message: str, tokens: dict):
+        super().__init__(message)
+        self.tokens = tokens
+
+
+def batch_prompt(brief: str, language: str = None) -> str:
+    """
+    User message for one batch item. The brief comes first and the language
+    instruction last, so items fanned out over languages share the longest
+    possible prompt prefix (system message + brief) for provider-side caching.
+    """
+    brief = " ".join(brief.split())
+    if not language:
+        return brief
+    return f"{brief}\nWrite the template in {LANGUAGE_NAMES[language]}."
+
+
+def expand_briefs(briefs, languages=None, max_items: int = 500):
+    """
+    Jobs for a batch: every brief (a string or {"id", "brief", "language"})
+    times every language in `languages` ("all" for the whole LANGUAGE_LIST).
+    A brief's own "language" overrides the fan-out.
+    """
+    if languages == "all":
+        languages = list(LANGUAGE_NAMES)
+    for code in languages or ():
+        if code not in LANGUAGE_NAMES:
+            raise BatchError(f"Unknown language code: {code}")
+
+    jobs = []
+    for i, brief in enumerate(briefs):
+        if isinstance(brief, str):
+            brief = {"brief": brief}
+        base_id = str(brief.get("id") or i)
+        own = brief.get("language")
+        if own and own not in LANGUAGE_NAMES:
+            raise BatchError(f"Unknown language code: {own}")
+        for code in [own] if own else (languages or [None]):
+            jobs.append({
+                "id": f"{base_id}:{code}" if code and not own else base_id,
+                "brief": brief["brief"],
+                "language": code,
+                "prompt": batch_prompt(brief["brief"], code),
+            })
+    if len(jobs) > max_items:
+        raise BatchError(f"Batch has {len(jobs)} items, the limit is {max_items}")
+    return jobs
+
+
+class BatchRunner:
+    """
+    Runs independent generations with at most `concurrency` in flight and
+    yields each result as soon as it completes, followed by one summary.
+
+    `generate(job)` returns a dict (optionally with "tokens": {"input",
+    "output", "total_cost"}); an exception marks only that item as failed,
+    and a BatchItemError still counts its tokens in the summary.
+    Identical prompts within a batch are generated once.
+    """
+
+    def __init__(self, generate, concurrency: int = 4):
+        self.generate = generate
+        self.concurrency = concurrency
+
+    async def run(self, jobs):
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        shared = {}  # prompt -> task, so duplicates reuse one generation
+        done = asyncio.Queue()
+
+        async def generate_once(job):
+            async with semaphore:
+                return await self.generate(job)
+
+        async def one(job):
+            item_start = time.perf_counter()
+            task = shared.get(job["prompt"])
+            duplicate = task is not None
+            if not duplicate:
+                task = shared[job["prompt"]] = asyncio.ensure_future(generate_once(job))
+            try:
+                result = dict(await asyncio.shield(task))
+                item = {"id": job["id"], "ok": True, **result}
+                if duplicate:
+                    item["tokens"] = {"input": 0, "output": 0, "total_cost": 0.0}
+                    item["duplicate"] = True
+            except Exception as e:
+                item = {"id": job["id"], "ok": False, "error": str(e) or type(e).__name__}
+                if isinstance(e, BatchItemError) and not duplicate:
+                    item["tokens"] = e.tokens
+            item["language"] = job["language"]
+            item["latency_ms"] = round((time.perf_counter() - item_start) * 1000, 1)
+            await done.put(item)
+
+        workers = [asyncio.create_task(one(job)) for job in jobs]
+        summary = {"frame": "summary", "total": len(jobs), "succeeded": 0, "failed": 0,
+                   "tokens": {"input": 0, "output": 0, "total_cost": 0.0}}
+        try:
+            for _ in jobs:
+                item = await done.get()
+                summary["succeeded" if item["ok"] else "failed"] += 1
+                for key, value in (item.get("tokens") or {}).items():
+                    if key in summary["tokens"]:
+                        summary["tokens"][key] += value
+                yield item
+        finally:
+            # The client went away: stop generating what nobody will receive
+            for task in workers + list(shared.values()):
+                task.cancel()
+        summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        yield summary
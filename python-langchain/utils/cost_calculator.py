@@ -1,24 +1,23 @@
 # utils/cost_calculator.py
 
-from constants.rates import INPUT_COST_GPT_4O_MINI, OUPUT_COST_GPT_4O_MINI
-import requests
-def calculate_cost(input_tokens: int, output_tokens: int):
+from constants.rates import INPUT_COST_GPT_4O_MINI, OUPUT_COST_GPT_4O_MINI, MODEL_PRICES
+from utils.fx_rates import rate_provider
+
+
+def calculate_cost(input_tokens: int, output_tokens: int, rate: float = None, model: str = None):
     """
-    Calculates cost separately for input & output tokens based on GPT-4o-mini pricing.
+    Calculates cost separately for input & output tokens based on `model`'s pricing
+    (GPT-4o-mini when unknown or not given).
+    Pure function: the USD → INR rate comes from the cached `rate_provider`, no I/O.
     """
-    rate=88.0
-    try:
-        response = requests.get("https://api.frankfurter.dev/v1/latest?base=USD&symbols=INR")
-        data = response.json()
-        rate = data["rates"]["INR"]
-    except Exception as e:
-        print("Error fetching USD to INR conversion rate:", e)
+    if rate is None:
+        rate = rate_provider.get_rate()
+    input_price, output_price = MODEL_PRICES.get(model, (INPUT_COST_GPT_4O_MINI, OUPUT_COST_GPT_4O_MINI))
 
-    input_cost = (input_tokens / 1_000_000) * INPUT_COST_GPT_4O_MINI*rate
-    output_cost = (output_tokens / 1_000_000) * OUPUT_COST_GPT_4O_MINI*rate
+    input_cost = (input_tokens / 1_000_000) * input_price*rate
+    output_cost = (output_tokens / 1_000_000) * output_price*rate
     total_cost = input_cost + output_cost
 
-          # fallback (optional)
     return {
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
@@ -0,0 +1,188 @@
+# utils/cost_ledger.py
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from utils.logger import get_logger
+
+logger = get_logger("cost_ledger")
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class CostLedger:
+    """
+    Spend ledger fed from the request path without blocking it.
+
+    `record()` only bumps in-memory counters and enqueues the usage event; a
+    background task drains the queue in batches of up to `batch_size` (or every
+    `flush_interval` seconds) and appends them to a local SQLite table in a
+    worker thread. Rows are only ever inserted, never updated.
+
+    Budgets are checked against the in-memory counters: `session_budget` caps
+    one conversation, `tenant_budget` caps a tenant per UTC day (today's spend
+    is reloaded from the store on start). A budget of 0 means unlimited.
+    Tenants are resolved by `tenant_for` from `tenant_keys` (API key -> tenant).
+    """
+
+    def __init__(self, path: str = None, session_budget: float = 0.0, tenant_budget: float = 0.0,
+                 batch_size: int = 100, flush_interval: float = 1.0, tenant_keys: dict = None):
+        self.path = path
+        self.session_budget = session_budget
+        self.tenant_budget = tenant_budget
+        self.tenant_keys = tenant_keys or {}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.tenant_spent = {}
+        self.events = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self._day = _today()
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS usage_events ("
+                "ts REAL, day TEXT, session_id TEXT, tenant TEXT, call TEXT, model TEXT, "
+                "input_tokens INTEGER, output_tokens INTEGER, cost REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS usage_events_day ON usage_events (day, tenant)")
+            self._db.commit()
+
+    def _roll_day(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self.tenant_spent.clear()
+
+    def record(self, session_id, tenant, call, model, input_tokens, output_tokens, cost):
+        """Non-blocking: updates the tenant counter and queues the event for the writer."""
+        self._roll_day()
+        self.tenant_spent[tenant] = self.tenant_spent.get(tenant, 0.0) + cost
+        self.events += 1
+        self._queue.put_nowait(
+            (time.time(), self._day, session_id, tenant, call, model, input_tokens, output_tokens, cost)
+        )
+
+    def tenant_for(self, api_key, client) -> str:
+        """
+        The tenant spend is charged to: the owner of a configured API key,
+        otherwise the client address. Never a label the client chooses, since
+        a new label would start with a fresh budget.
+        """
+        tenant = self.tenant_keys.get(api_key) if api_key else None
+        if tenant:
+            return tenant
+        return f"client:{client}" if client else "default"
+
+    def budget_exceeded(self, tenant, session_spent: float):
+        """"session" or "tenant" when that budget is used up, else None."""
+        self._roll_day()
+        if self.session_budget and session_spent >= self.session_budget:
+            return "session"
+        if self.tenant_budget and self.tenant_spent.get(tenant, 0.0) >= self.tenant_budget:
+            return "tenant"
+        return None
+
+    def _load_today(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT tenant, SUM(cost) FROM usage_events WHERE day = ? GROUP BY tenant", (self._day,)
+            ).fetchall()
+        return dict(rows)
+
+    def _write(self, batch):
+        with self._lock:
+            self._db.executemany("INSERT INTO usage_events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            self._db.commit()
+
+    async def _flush(self, batch):
+        if self._db is not None:
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error("Could not write %d usage events: %s", len(batch), e)
+                return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _drain(self, batch):
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Let a burst accumulate so one commit covers many events
+            deadline = time.monotonic() + self.flush_interval
+            self._drain(batch)
+            while len(batch) < self.batch_size and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.05, self.flush_interval))
+                self._drain(batch)
+            await self._flush(batch)
+
+    async def start(self):
+        if self._db is not None:
+            for tenant, spent in (await asyncio.to_thread(self._load_today)).items():
+                self.tenant_spent[tenant] = self.tenant_spent.get(tenant, 0.0) + spent
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Stops the writer and flushes whatever is still queued."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        batch = []
+        while not self._queue.empty():
+            self._drain(batch)
+            await self._flush(batch)
+            batch = []
+
+    def stats(self):
+        return {
+            "events": self.events,
+            "written": self.written,
+            "batches": self.batches,
+            "queued": self._queue.qsize(),
+            "write_errors": self.write_errors,
+            "day": self._day,
+            "tenant_spent": dict(self.tenant_spent),
+            "session_budget": self.session_budget,
+            "tenant_budget": self.tenant_budget,
+        }
+
+
+def parse_tenant_keys(spec: str) -> dict:
+    """"key1=tenant_a,key2=tenant_b" -> {"key1": "tenant_a", "key2": "tenant_b"}; malformed pairs are skipped."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {key.strip(): tenant.strip() for key, tenant in pairs if key.strip() and tenant.strip()}
+
+
+def build_cost_ledger():
+    """COST_LEDGER_PATH ("" = memory only), SESSION_BUDGET_INR / TENANT_BUDGET_INR (0 = unlimited),
+    COST_LEDGER_BATCH_SIZE / COST_LEDGER_FLUSH_SECONDS and TENANT_API_KEYS from the environment."""
+    return CostLedger(
+        path=os.environ.get("COST_LEDGER_PATH", ".cost_ledger.db") or None,
+        session_budget=float(os.environ.get("SESSION_BUDGET_INR", 0)),
+        tenant_budget=float(os.environ.get("TENANT_BUDGET_INR", 0)),
+        batch_size=int(os.environ.get("COST_LEDGER_BATCH_SIZE", 100)),
+        flush_interval=float(os.environ.get("COST_LEDGER_FLUSH_SECONDS", 1.0)),
+        tenant_keys=parse_tenant_keys(os.environ.get("TENANT_API_KEYS", "")),
+    )
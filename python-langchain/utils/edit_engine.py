@@ -0,0 +1,255 @@
+# utils/edit_engine.py
+
+import copy
+import re
+
+from constants.language_constants import LANGUAGE_LIST
+from constants.template_rules import BUTTON_TYPE_LIMITS, MAX_BUTTONS
+from utils.language_detector import LanguageDetector
+
+INVALID_URL_REPLY = "Please type a valid URL (e.g. https://www.google.com)"
+
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "last": -1,
+}
+_TYPE_WORDS = (
+    (re.compile(r"\b(?:url|link|website|web)\b"), "URL"),
+    (re.compile(r"\b(?:call|phone)\b"), "PHONE_NUMBER"),
+    (re.compile(r"\b(?:copy\s*code|coupon)\b"), "COPY_CODE"),
+    (re.compile(r"\bquick\s*repl(?:y|ies)\b"), "QUICK_REPLY"),
+)
+_DEFAULT_TEXT = {"URL": "Visit Now", "PHONE_NUMBER": "Call Now", "COPY_CODE": "Copy Code"}
+_LANGUAGE_CODES = {lang["code"].lower(): lang["code"] for lang in LANGUAGE_LIST if lang["code"] != "NA"}
+_detector = LanguageDetector()
+
+_POLITE = re.compile(r"^(?:(?:please|pls|kindly|can you|could you|now)\s+)+|\s+(?:please|pls|thanks|thank you)$")
+_QUOTED = re.compile(r"[\"“”'‘’]([^\"“”'‘’]+)[\"“”'‘’]")
+
+_CHANGE = r"(?:change|set|update|replace|make)"
+_URL_EDIT = re.compile(
+    rf"{_CHANGE}\s+(?:the\s+)?(?:(?P<ref>.*?)\s*(?:url|link|website)"
+    rf"|(?:url|link|website)\s+(?:of|on|for)\s+(?:the\s+)?(?P<ref_after>.+?))\s+(?:to|as|with)\s+(?P<value>\S+)"
+)
+_PHONE_EDIT = re.compile(
+    rf"{_CHANGE}\s+(?:the\s+)?(?:call\s+button\s+|phone\s+button\s+)?(?:phone\s+)?number\s+(?:to|as|with)\s+(?P<value>\+?[\d\s\-()]{{6,}})"
+)
+_REMOVE = re.compile(r"(?:remove|delete|drop)\s+(?P<ref>.+)")
+_RENAME = re.compile(
+    rf"(?:rename|{_CHANGE})\s+(?:the\s+)?(?:text\s+(?:of|on)\s+|label\s+(?:of|on)\s+)?(?P<ref>.+?)(?:\s+(?:text|label))?\s+(?:to|as)\s+(?P<value>.+)"
+)
+_ADD = re.compile(
+    r"add\s+(?:a|an|one|another)?\s*(?P<kind>quick\s*reply|url|link|website|call|phone(?:\s+number)?|copy\s*code|coupon(?:\s+code)?)"
+    r"\s+button(?:\s+(?:saying|called|named|labell?ed|that\s+says|with\s+(?:the\s+)?text))?\s*(?P<rest>.*)"
+)
+_ADD_VALUE = re.compile(
+    r"(?P<text>.*?)\s*(?:(?:linking|pointing)\s+to|to|for|at|with\s+(?:the\s+)?(?:url|link|number|code))\s+(?P<value>\+?\d[\d\s\-()]{5,}|\S+)$"
+)
+_LANGUAGE_CODE_EDIT = re.compile(rf"{_CHANGE}\s+(?:the\s+)?language\s*code\s+(?:to|as)\s+(?P<value>[\w\-]+)")
+
+
+def normalize_url(value: str):
+    """Applies the prompt's URL rules: adds https:// to almost-valid URLs, None when invalid."""
+    value = value.strip().strip("\"'“”‘’").rstrip(".!")
+    if not value or re.search(r"[\s,]", value) or "." not in value.split("//")[-1]:
+        return None
+    if not re.match(r"https?://", value, re.IGNORECASE):
+        value = "https://" + value
+    return value
+
+
+def _base_language(code) -> str:
+    return str(code or "").split("_")[0].lower()
+
+
+def _metadata_only(template, code) -> bool:
+    """
+    True when switching to `code` only corrects the label: the current code is
+    the same language ("en" -> "en_US") or the Body is already written in it.
+    A real language change needs the Body translated, which is the model's job.
+    """
+    base = _base_language(code)
+    if _base_language(template.get("languageCode")) == base:
+        return True
+    detection = _detector.detect(str(template.get("Body") or ""))
+    return detection.confidence >= _detector.threshold and _base_language(detection.code) == base
+
+
+def _clean(text: str) -> str:
+    text = " ".join(text.strip().split()).rstrip(".!")
+    return _POLITE.sub("", text.lower()).strip()
+
+
+def _original(text: str, value: str) -> str:
+    """`value` as the user typed it (case preserved), quotes stripped."""
+    match = re.search(re.escape(value), " ".join(text.split()), re.IGNORECASE)
+    value = match.group() if match else value
+    quoted = _QUOTED.fullmatch(value.strip())
+    return (quoted.group(1) if quoted else value).strip()
+
+
+def resolve_buttons(ref: str, buttons, kind: str = None):
+    """
+    Indices of the buttons `ref` points at ("the second button", "the url",
+    "'Shop Now'", "all buttons"); with `kind`, only buttons of that type count.
+    Returns None when the reference is missing, ambiguous or of the wrong type.
+    """
+    ref = ref.strip()
+    candidates = list(range(len(buttons)))
+
+    def of_kind(indices):
+        indices = [i for i in indices if kind is None or buttons[i].get("type") == kind]
+        return indices or None
+
+    if re.fullmatch(r"(?:all\s+)?(?:the\s+)?(?:buttons|all\s+(?:of\s+)?the\s+buttons)", ref):
+        return of_kind(candidates)
+
+    quoted = _QUOTED.search(ref)
+    label = quoted.group(1) if quoted else re.sub(r"^(?:the\s+)|\s*(?:'s|’s)$|\s*\bbutton\b\s*", " ", ref).strip()
+    by_text = [i for i in candidates if str(buttons[i].get("text", "")).strip().lower() == label.lower()]
+    if by_text:
+        return of_kind(by_text[:1])
+    if quoted:
+        return None
+
+    typed = False
+    for pattern, button_type in _TYPE_WORDS:
+        if pattern.search(ref):
+            candidates = [i for i in candidates if buttons[i].get("type") == button_type]
+            typed = True
+            break
+
+    number = re.search(r"\b(" + "|".join(_ORDINALS) + r")\b|\b(\d+)(?:st|nd|rd|th)?\b|#(\d+)", ref)
+    if number:
+        # "the second button" counts every button, "the second quick reply" only quick replies
+        position = _ORDINALS.get(number.group(1)) if number.group(1) else int(number.group(2) or number.group(3))
+        index = position - 1 if position > 0 else position
+        return of_kind([candidates[index]]) if -len(candidates) <= index < len(candidates) else None
+
+    if not ref or typed or re.search(r"\bbutton\b", ref):
+        # "the url" / "the quick reply button": fine only when exactly one button fits
+        candidates = of_kind(candidates)
+        return candidates if candidates and len(candidates) == 1 else None
+    return None
+
+
+def _limit_reply(button_type):
+    if button_type is None:
+        return f"A template can have at most {MAX_BUTTONS} buttons, so I kept the current ones."
+    limit = BUTTON_TYPE_LIMITS[button_type]
+    label = button_type.replace("_", " ")
+    return f"A template can have at most {limit} {label} button{'s' if limit > 1 else ''}, so I kept the current ones."
+
+
+def _over_limit(buttons):
+    if len(buttons) > MAX_BUTTONS:
+        return None, True
+    for button_type, limit in BUTTON_TYPE_LIMITS.items():
+        if sum(1 for b in buttons if b.get("type") == button_type) > limit:
+            return button_type, True
+    return None, False
+
+
+def apply_edit(text: str, template: dict):
+    """
+    Applies a simple, unambiguous edit request to `template` without the LLM.
+
+    Returns ("template", edited_template, command), ("reply", message, command)
+    when the request is understood but can't be applied (invalid URL, button
+    limit), or None when the request needs the model (creative rewrites,
+    translations, compound or ambiguous requests).
+    """
+    if not template or not text:
+        return None
+    request = _clean(text)
+    buttons = template.get("Buttons") or []
+
+    def edited(new_buttons=None, **fields):
+        data = copy.deepcopy(template)
+        if new_buttons is not None:
+            data["Buttons"] = new_buttons
+        data.update(fields)
+        return data
+
+    def reply(body):
+        return {"Body": body, "Buttons": []}
+
+    # Compound requests ("... and make it funnier") go to the model
+    if re.search(r"\b(?:and|also|then)\b", request) and not _QUOTED.search(request):
+        return None
+
+    match = _LANGUAGE_CODE_EDIT.fullmatch(request)
+    if match:
+        code = _LANGUAGE_CODES.get(match.group("value").replace("-", "_"))
+        if not code or not _metadata_only(template, code):
+            return None
+        return "template", edited(languageCode=code), "language_code"
+
+    match = _PHONE_EDIT.fullmatch(request)
+    if match:
+        targets = resolve_buttons("", buttons, kind="PHONE_NUMBER")
+        if not targets:
+            return None
+        number = re.sub(r"[\s\-()]", "", match.group("value"))
+        new_buttons = copy.deepcopy(buttons)
+        new_buttons[targets[0]]["phone_number"] = number
+        return "template", edited(new_buttons), "phone_number"
+
+    match = _URL_EDIT.fullmatch(request)
+    if match:
+        targets = resolve_buttons(match.group("ref") or match.group("ref_after") or "", buttons, kind="URL")
+        if not targets:
+            return None
+        url = normalize_url(_original(text, match.group("value")))
+        if url is None:
+            return "reply", reply(INVALID_URL_REPLY), "url"
+        new_buttons = copy.deepcopy(buttons)
+        new_buttons[targets[0]]["url"] = url
+        return "template", edited(new_buttons), "url"
+
+    match = _ADD.fullmatch(request)
+    if match:
+        kind = next(t for p, t in _TYPE_WORDS if p.search(match.group("kind")))
+        rest = match.group("rest").strip()
+        value_match = _ADD_VALUE.fullmatch(rest) if kind != "QUICK_REPLY" else None
+        label = _original(text, value_match.group("text")) if value_match and value_match.group("text") else \
+            (_original(text, rest) if rest and kind == "QUICK_REPLY" else _DEFAULT_TEXT.get(kind))
+        if not label:
+            return None
+        button = {"type": kind, "text": label}
+        if kind == "URL":
+            if not value_match:
+                return None
+            url = normalize_url(_original(text, value_match.group("value")))
+            if url is None:
+                return "reply", reply(INVALID_URL_REPLY), "add_button"
+            button.update({"url": url, "urlType": "static"})
+        elif kind == "PHONE_NUMBER":
+            if not value_match:
+                return None
+            button["phone_number"] = re.sub(r"[\s\-()]", "", value_match.group("value"))
+        elif kind == "COPY_CODE":
+            button["example"] = [_original(text, value_match.group("value"))] if value_match else []
+        new_buttons = copy.deepcopy(buttons) + [button]
+        button_type, over = _over_limit(new_buttons)
+        if over:
+            return "reply", reply(_limit_reply(button_type)), "add_button"
+        return "template", edited(new_buttons), "add_button"
+
+    match = _REMOVE.fullmatch(request)
+    if match and (re.search(r"\bbuttons?\b|\bquick\s*repl", match.group("ref")) or _QUOTED.search(match.group("ref"))):
+        targets = resolve_buttons(match.group("ref"), buttons)
+        if not targets:
+            return None
+        return "template", edited([b for i, b in enumerate(buttons) if i not in targets]), "remove_button"
+
+    match = _RENAME.fullmatch(request)
+    if match and (re.search(r"\bbutton\b", match.group("ref")) or _QUOTED.search(match.group("ref"))):
+        targets = resolve_buttons(match.group("ref"), buttons)
+        if not targets or len(targets) != 1:
+            return None
+        new_buttons = copy.deepcopy(buttons)
+        new_buttons[targets[0]]["text"] = _original(text, match.group("value"))
+        return "template", edited(new_buttons), "rename_button"
+
+    return None
@@ -0,0 +1,92 @@
+# utils/fake_llm.py
+
+import asyncio
+import json
+import random
+import time
+from itertools import cycle
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+DEFAULT_FAKE_RESPONSE = json.dumps({
+    "name": "diwali_flash_sale",
+    "categoryCode": "MARKETING",
+    "languageCode": "en",
+    "header": {"type": "IMAGE", "body": "Celebrate Diwali with Amazing Deals!"},
+    "Body": "🎉 Diwali Weekend Flash Sale! Enjoy great discounts. Sale ends {{1}}.",
+    "bodyText": [["10th Nov"]],
+    "Buttons": [
+        {"type": "URL", "text": "Shop Now", "url": "", "urlType": "static"},
+        {"type": "QUICK_REPLY", "text": "View Deals"},
+    ],
+})
+
+
+class FakeChatModel:
+    """
+    Offline stand-in for ChatOpenAI used by benchmarks.
+
+    Sleeps `latency` seconds (non-blocking in `ainvoke`) and returns the next
+    canned response with fixed `usage_metadata`. `responses` may also be a
+    callable taking the message list and returning the text, to script replies
+    per prompt. `astream` spreads the same latency over `chunk_size`-character
+    chunks, like a token stream.
+
+    To exercise failover and hedging, a `tail_rate` share of calls take
+    `tail_latency` instead and an `error_rate` share raise after the latency;
+    `seed` makes both deterministic. Extra keyword arguments are ignored.
+    """
+
+    def __init__(self, responses=None, latency: float = 0.05, input_tokens: int = 1500, output_tokens: int = 200,
+                 chunk_size: int = 8, error_rate: float = 0.0, tail_rate: float = 0.0, tail_latency: float = None,
+                 seed: int = None):
+        self._respond = responses if callable(responses) else None
+        self._responses = cycle(responses or [DEFAULT_FAKE_RESPONSE]) if self._respond is None else None
+        self.latency = latency
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self._random = random.Random(seed)
+
+    def _delay(self):
+        if self.tail_rate and self._random.random() < self.tail_rate:
+            return self.tail_latency if self.tail_latency is not None else self.latency * 10
+        return self.latency
+
+    def _maybe_fail(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise RuntimeError("fake backend error")
+
+    def _message(self, messages):
+        return AIMessage(
+            content=self._respond(messages) if self._respond else next(self._responses),
+            usage_metadata={
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.input_tokens + self.output_tokens,
+            },
+        )
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(self._delay())
+        self._maybe_fail()
+        return self._message(messages)
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self._delay())
+        self._maybe_fail()
+        return self._message(messages)
+
+    async def astream(self, messages, **kwargs):
+        self._maybe_fail()
+        message = self._message(messages)
+        text = message.content
+        pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+        delay = self._delay() / len(pieces)
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content="", usage_metadata=message.usage_metadata)
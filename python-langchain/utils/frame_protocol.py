@@ -0,0 +1,119 @@
+# utils/frame_protocol.py
+
+import asyncio
+import json
+import zlib
+from collections import OrderedDict
+
+from utils.history_manager import ACCOUNTING_KEYS
+from utils.json_patch import json_diff
+
+try:
+    import orjson
+except ImportError:  # plain json works, just slower
+    orjson = None
+
+PROTOCOL_VERSION = 2
+
+
+def dumps(obj) -> str:
+    """Compact JSON text (non-ASCII kept as UTF-8); uses orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+class FrameWriter:
+    """
+    Serializes and sends frames for one WebSocket.
+
+    Version 1 (default) sends every template as its full JSON, exactly as before.
+    Version 2 (/ws?proto=2) splits accounting fields into "acct" and sends the
+    template either as a snapshot or, when smaller, as a delta against one of
+    the last `keep_bases` frames (so an edited template diffs against the
+    template, not the follow-up suggestion sent in between):
+
+        {"v": 2, "t": "snap",  "seq": 3, "doc": {...}, "acct": {...}}
+        {"v": 2, "t": "delta", "seq": 5, "base": 3, "ops": [...], "acct": {...}}
+
+    Clients must keep at least `keep_bases` recent docs. A snapshot is forced
+    every `snapshot_every` frames. With `compress`, frames
+    of at least `compress_min_bytes` go out as binary zlib data. Control frames
+    ("session", "partial") are always plain JSON text.
+    """
+
+    def __init__(self, websocket, version: int = 1, compress: bool = False, snapshot_every: int = 20,
+                 compress_min_bytes: int = 512, keep_bases: int = 4):
+        self.websocket = websocket
+        self.version = version
+        self.compress = compress
+        self.snapshot_every = snapshot_every
+        self.compress_min_bytes = compress_min_bytes
+        self.keep_bases = keep_bases
+        self.seq = 0
+        self._bases = OrderedDict()  # seq -> doc
+        self._since_snapshot = 0
+        self._lock = asyncio.Lock()
+        self.bytes_sent = 0
+        self.bytes_full = 0
+
+    def encode(self, data: dict) -> str:
+        """Frame text for `data`; advances the delta base, so frames must be sent in order."""
+        if self.version < PROTOCOL_VERSION:
+            text = dumps(data)
+            self.bytes_full += len(text)
+            return text
+        doc = {k: v for k, v in data.items() if k not in ACCOUNTING_KEYS}
+        acct = {k: data[k] for k in ACCOUNTING_KEYS if k in data}
+        self.seq += 1
+        snapshot = {"v": PROTOCOL_VERSION, "t": "snap", "seq": self.seq, "doc": doc, "acct": acct}
+        text = dumps(snapshot)
+        self.bytes_full += len(text)
+        best = None
+        if self._since_snapshot < self.snapshot_every:
+            for base, base_doc in self._bases.items():
+                delta = dumps({"v": PROTOCOL_VERSION, "t": "delta", "seq": self.seq, "base": base,
+                               "ops": json_diff(base_doc, doc), "acct": acct})
+                if len(delta) < len(best or text):
+                    best = delta
+        self._bases[self.seq] = doc
+        while len(self._bases) > self.keep_bases:
+            self._bases.popitem(last=False)
+        if best is not None:
+            self._since_snapshot += 1
+            return best
+        self._since_snapshot = 0
+        return text
+
+    async def _send_text(self, text: str):
+        if self.compress and len(text) >= self.compress_min_bytes:
+            payload = zlib.compress(text.encode("utf-8"))
+            self.bytes_sent += len(payload)
+            await self.websocket.send_bytes(payload)
+        else:
+            self.bytes_sent += len(text)
+            await self.websocket.send_text(text)
+
+    async def send(self, data: dict):
+        """Sends a template / message frame (anything with Body and Buttons)."""
+        async with self._lock:
+            await self._send_text(self.encode(data))
+
+    async def send_control(self, frame: dict):
+        async with self._lock:
+            text = dumps(frame)
+            self.bytes_sent += len(text)
+            self.bytes_full += len(text)
+            await self.websocket.send_text(text)
+
+    def footprint(self) -> int:
+        """Approximate size of the delta bases kept for this connection."""
+        return sum(len(dumps(doc)) for doc in self._bases.values())
+
+    def stats(self):
+        return {"version": self.version, "frames": self.seq, "bytes_sent": self.bytes_sent,
+                "bytes_full": self.bytes_full}
@@ -0,0 +1,134 @@
+# utils/fx_rates.py
+
+import asyncio
+import json
+import os
+import time
+
+import requests
+
+from constants.rates import DEFAULT_USD_INR_RATE, FX_RATE_TTL_SECONDS, FX_RATE_RETRY_SECONDS, FX_RATE_CACHE_FILE
+from utils.logger import get_logger
+
+logger = get_logger("fx_rates")
+
+FRANKFURTER_URL = "https://api.frankfurter.dev/v1/latest?base=USD&symbols=INR"
+
+
+class FrankfurterRateSource:
+    """Fetches the live USD → INR rate from the Frankfurter API."""
+    name = "frankfurter"
+
+    def __init__(self, url: str = FRANKFURTER_URL, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self) -> float:
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return float(response.json()["rates"]["INR"])
+
+
+class LocalRateSource:
+    """Offline source: a fixed rate, taken from USD_INR_RATE if set."""
+    name = "local"
+
+    def __init__(self, rate: float = None):
+        self.rate = float(rate if rate is not None else os.environ.get("USD_INR_RATE", DEFAULT_USD_INR_RATE))
+
+    def fetch(self) -> float:
+        return self.rate
+
+
+class FxRateProvider:
+    """
+    In-process TTL cache for the USD → INR rate.
+
+    Reads (`get_rate`) never do I/O; they return the cached value. The cache is
+    refreshed by `refresh()` / the background `run()` loop, and the last known
+    good rate is persisted to disk so a restart without network still has a rate.
+    """
+
+    def __init__(self, source=None, ttl: float = FX_RATE_TTL_SECONDS, cache_file: str = FX_RATE_CACHE_FILE):
+        self.source = source
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.rate = DEFAULT_USD_INR_RATE
+        self.fetched_at = 0.0
+        self._task = None
+        self._load_last_known_good()
+
+    def _load_last_known_good(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+            self.rate = float(data["rate"])
+            self.fetched_at = float(data.get("fetched_at", 0.0))
+        except Exception as e:
+            logger.warning("Could not read cached FX rate: %s", e)
+
+    def _persist(self):
+        if not self.cache_file:
+            return
+        tmp_path = self.cache_file + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"rate": self.rate, "fetched_at": self.fetched_at}, f)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.warning("Could not persist FX rate: %s", e)
+
+    def get_rate(self) -> float:
+        return self.rate
+
+    def is_stale(self) -> bool:
+        return (time.time() - self.fetched_at) >= self.ttl
+
+    async def refresh(self) -> float:
+        """Fetch a fresh rate off the event loop; keep the last good one on failure."""
+        if self.source is None:
+            self.source = build_rate_source()
+        try:
+            rate = await asyncio.to_thread(self.source.fetch)
+        except Exception as e:
+            logger.error("Error fetching USD to INR conversion rate: %s", e)
+            return self.rate
+        self.rate = rate
+        self.fetched_at = time.time()
+        await asyncio.to_thread(self._persist)
+        return self.rate
+
+    async def run(self):
+        while True:
+            if self.is_stale():
+                await self.refresh()
+            # A failed refresh leaves the rate stale; retry sooner than the TTL.
+            wait = self.ttl - (time.time() - self.fetched_at)
+            await asyncio.sleep(wait if wait > 0 else FX_RATE_RETRY_SECONDS)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_rate_source():
+    """Picks the rate source from FX_RATE_SOURCE ("frankfurter" or "local")."""
+    if os.environ.get("FX_RATE_SOURCE", "frankfurter").lower() == "local":
+        return LocalRateSource()
+    return FrankfurterRateSource()
+
+
+# Source is resolved on first refresh so FX_RATE_SOURCE from .env is honoured.
+rate_provider = FxRateProvider()
@@ -0,0 +1,209 @@
+# utils/history_manager.py
+
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from utils.json_patch import json_diff
+from utils.token_counter import estimate_prompt_tokens, estimate_tokens
+
+SUMMARY_MAX_LINES = 12
+SUMMARY_LINE_CHARS = 120
+
+# Per-turn accounting fields sent to the client; never needed by the model
+ACCOUNTING_KEYS = ("tokens", "total_spent")
+
+# Older template turns are stored as a patch against the template before them
+TEMPLATE_EDIT_PREFIX = "Edited the template (JSON patch): "
+
+_ROLES = {HumanMessage: "h", AIMessage: "a", SystemMessage: "s"}
+_MESSAGE_TYPES = {role: cls for cls, role in _ROLES.items()}
+
+
+def is_template_doc(data) -> bool:
+    """A template has a name or buttons; clarifying questions and suggestions are `{"Body", "Buttons": []}`."""
+    return isinstance(data, dict) and bool(data.get("Buttons") or data.get("name"))
+
+
+def _is_template(message) -> bool:
+    if not isinstance(message, AIMessage):
+        return False
+    if message.content.startswith(TEMPLATE_EDIT_PREFIX):
+        return True
+    try:
+        data = json.loads(message.content)
+    except (TypeError, ValueError):
+        return False
+    return is_template_doc(data)
+
+
+def _summary_line(message) -> str:
+    line = " ".join(f"User: {message.content}".split())
+    return line if len(line) <= SUMMARY_LINE_CHARS else line[:SUMMARY_LINE_CHARS - 1] + "…"
+
+
+class ConversationHistory:
+    """
+    Conversation history with a token budget.
+
+    The system prompt is always sent. Recent turns are kept verbatim while they
+    fit in `budget` tokens (at least `keep_recent` messages); older turns are
+    folded into a rolling summary of the user's requests, and the latest template
+    is pinned so the model can still edit it after its original message was compacted.
+
+    Templates added with `append_template` after the first are stored as a JSON
+    patch against the previous one; only the latest is expanded to full JSON
+    when the messages are built.
+    """
+
+    def __init__(self, system_message, budget: int = 3000, keep_recent: int = 4):
+        self.system_message = system_message
+        self.system_tokens = estimate_prompt_tokens(system_message.content)
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.turns = []  # [(message, tokens)]
+        self.summary_lines = []
+        self.latest_template = None
+        self.latest_doc = None
+        self._latest_full = None
+        self.uncompacted_tokens = self.system_tokens
+        # Only the latest turn's accounting and running totals; a long session must not grow them
+        self._last_stats = None
+        self._totals = {"turns": 0, "sent_tokens": 0, "saved_tokens": 0}
+
+    def append(self, message):
+        tokens = estimate_tokens(message.content)
+        self.turns.append((message, tokens))
+        self.uncompacted_tokens += tokens
+        if _is_template(message):
+            self.latest_template = message
+            if not message.content.startswith(TEMPLATE_EDIT_PREFIX):
+                self.latest_doc = json.loads(message.content)
+                self._latest_full = message
+        self._compact()
+
+    def discard_last(self):
+        """Drops the newest user message again, e.g. when the model call for it was refused."""
+        if self.turns and isinstance(self.turns[-1][0], HumanMessage):
+            _, tokens = self.turns.pop()
+            self.uncompacted_tokens -= tokens
+
+    def append_template(self, data: dict):
+        """Appends an assistant template, stored as a diff when that is shorter."""
+        doc = {k: v for k, v in data.items() if k not in ACCOUNTING_KEYS}
+        full = json.dumps(doc, ensure_ascii=False)
+        if not is_template_doc(doc):
+            # A question is a plain reply; the template being edited stays as it was
+            self.append(AIMessage(content=full))
+            return
+        content = full
+        if self.latest_doc is not None:
+            edit = TEMPLATE_EDIT_PREFIX + json.dumps(json_diff(self.latest_doc, doc), ensure_ascii=False)
+            if len(edit) < len(full):
+                content = edit
+        self.latest_doc = doc
+        self._latest_full = AIMessage(content=full)
+        self.append(AIMessage(content=content))
+
+    def _latest_full_message(self):
+        if self._latest_full is None:
+            self._latest_full = AIMessage(content=json.dumps(self.latest_doc, ensure_ascii=False))
+        return self._latest_full
+
+    def _compact(self):
+        turn_tokens = sum(t for _, t in self.turns)
+        while turn_tokens > self.budget and len(self.turns) > self.keep_recent:
+            message, tokens = self.turns.pop(0)
+            turn_tokens -= tokens
+            # Assistant turns are covered by the pinned latest template
+            if isinstance(message, HumanMessage):
+                self.summary_lines.append(_summary_line(message))
+        del self.summary_lines[:-SUMMARY_MAX_LINES]
+
+    def messages(self, system_message=None):
+        """
+        The message list to send to the LLM; records per-turn token accounting.
+        `system_message` replaces the default one for this call (phase prompts).
+        """
+        if system_message is None or system_message is self.system_message:
+            result, sent = [self.system_message], self.system_tokens
+        else:
+            result, sent = [system_message], estimate_prompt_tokens(system_message.content)
+        extra = []
+        if self.summary_lines:
+            extra.append(SystemMessage(content="Summary of earlier conversation:\n" + "\n".join(self.summary_lines)))
+        recent = [m for m, _ in self.turns]
+        latest_full = self._latest_full_message() if self.latest_doc is not None else self.latest_template
+        if self.latest_template is not None and all(m is not self.latest_template for m in recent):
+            extra.append(SystemMessage(content="Current template state: " + latest_full.content))
+        elif latest_full is not self.latest_template:
+            # The model always sees the current template in full, never just its last diff
+            recent = [latest_full if m is self.latest_template else m for m in recent]
+            sent += estimate_tokens(latest_full.content) - estimate_tokens(self.latest_template.content)
+        result.extend(extra)
+        result.extend(recent)
+
+        sent += sum(estimate_tokens(m.content) for m in extra) + sum(t for _, t in self.turns)
+        saved = max(0, self.uncompacted_tokens - sent)
+        self._totals["turns"] += 1
+        self._totals["sent_tokens"] += sent
+        self._totals["saved_tokens"] += saved
+        self._last_stats = {
+            "turn": self._totals["turns"],
+            "sent_tokens": sent,
+            "uncompacted_tokens": self.uncompacted_tokens,
+            "saved_tokens": saved,
+        }
+        return result
+
+    def footprint(self) -> int:
+        """Approximate size of the retained history in characters (the shared system prompt excluded)."""
+        size = sum(len(m.content) for m, _ in self.turns) + sum(len(line) for line in self.summary_lines)
+        if self._latest_full is not None:
+            size += len(self._latest_full.content)
+        if self._last_stats is not None:
+            size += len(json.dumps(self._last_stats)) + len(json.dumps(self._totals))
+        return size
+
+    def recap(self):
+        """What a client needs to show a resumed conversation: the folded summary and the recent user messages."""
+        return {
+            "summary": list(self.summary_lines),
+            "requests": [m.content for m, _ in self.turns if isinstance(m, HumanMessage)],
+        }
+
+    def last_turn_stats(self):
+        return self._last_stats
+
+    def stats(self):
+        return {
+            "turns": self._totals["turns"],
+            "summarized_messages": len(self.summary_lines),
+            "sent_tokens": self._totals["sent_tokens"],
+            "saved_tokens": self._totals["saved_tokens"],
+        }
+
+    def to_dict(self):
+        """Compact, JSON-safe form for the session store (the shared system prompt is not stored)."""
+        return {
+            "turns": [[_ROLES.get(type(m), "h"), m.content] for m, _ in self.turns],
+            "summary": self.summary_lines,
+            "template": self._latest_full_message().content if self.latest_doc is not None else None,
+            "uncompacted": self.uncompacted_tokens,
+        }
+
+    @classmethod
+    def from_dict(cls, system_message, data, **kwargs):
+        history = cls(system_message, **kwargs)
+        history.turns = [(_MESSAGE_TYPES[role](content=content), estimate_tokens(content))
+                         for role, content in data.get("turns", [])]
+        history.summary_lines = list(data.get("summary", []))
+        history.uncompacted_tokens = data.get("uncompacted", history.uncompacted_tokens)
+        template = data.get("template")
+        if template is not None:
+            history.latest_doc = json.loads(template)
+            history.latest_template = next(
+                (m for m, _ in reversed(history.turns) if _is_template(m)),
+                AIMessage(content=template),
+            )
+        return history
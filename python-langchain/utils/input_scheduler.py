@@ -0,0 +1,133 @@
+# utils/input_scheduler.py
+
+import asyncio
+import time
+from collections import deque
+
+
+class InputScheduler:
+    """
+    Per-connection input scheduler for rapid-fire messages.
+
+    A reader task receives messages as they arrive instead of between turns.
+    `next_batch()` returns everything queued so one turn answers a burst; when
+    the messages are part of a burst (less than `debounce` seconds apart) it
+    first keeps collecting until the client has been quiet for `debounce`
+    seconds. A lone message after a pause starts its turn immediately. A message arriving while a turn is inside its
+    `superseded_by_input()` section (the LLM call) cancels that turn, so no
+    tokens are spent finishing an answer nobody will read. At most `max_queue`
+    messages are buffered; beyond that the reader stops receiving and the
+    socket's own flow control pushes back on the client.
+    """
+
+    def __init__(self, receive, debounce: float = 0.1, max_queue: int = 8, on_input=None):
+        self._receive = receive
+        self.debounce = debounce
+        self.max_queue = max_queue
+        self.on_input = on_input
+        self._pending = deque()
+        self._arrived = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._reader = None
+        self._turn = None
+        self._cancellable = False
+        self._closed = None
+        self._last_arrival = float("-inf")
+        self.received = 0
+        self.coalesced = 0
+        self.superseded = 0
+        self.backpressure_waits = 0
+
+    def start(self):
+        self._reader = asyncio.create_task(self._read())
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+
+    def close(self, error: Exception):
+        """Ends input (e.g. the session was evicted): queued messages are dropped and next_batch() raises `error`."""
+        self._pending.clear()
+        if self._closed is None:
+            self._closed = error
+        self._arrived.set()
+
+    async def _read(self):
+        try:
+            while True:
+                while len(self._pending) >= self.max_queue:
+                    self.backpressure_waits += 1
+                    self._drained.clear()
+                    await self._drained.wait()
+                text = await self._receive()
+                now = time.monotonic()
+                gap, self._last_arrival = now - self._last_arrival, now
+                self.received += 1
+                if self.on_input:
+                    self.on_input(text)
+                if self._cancellable and self._turn and not self._turn.done():
+                    self._turn.cancel()
+                    self.superseded += 1
+                self._pending.append((text, gap))
+                self._arrived.set()
+        except Exception as e:
+            # Disconnects surface to the caller once the queued messages are handled
+            self._closed = e
+            self._arrived.set()
+
+    async def _wait(self):
+        while not self._pending and self._closed is None:
+            self._arrived.clear()
+            await self._arrived.wait()
+
+    async def next_batch(self):
+        """The next burst of messages, oldest first; raises the reader's error once closed."""
+        await self._wait()
+        if not self._pending:
+            raise self._closed
+        in_burst = len(self._pending) > 1 or self._pending[0][1] < self.debounce
+        batch = []
+        while True:
+            batch.extend(text for text, _ in self._pending)
+            self._pending.clear()
+            self._drained.set()
+            if not in_burst or self._closed is not None or len(batch) >= self.max_queue:
+                break
+            try:
+                await asyncio.wait_for(self._wait(), self.debounce)
+            except asyncio.TimeoutError:
+                break
+        self.coalesced += len(batch) - 1
+        return batch
+
+    async def run_turn(self, coro):
+        """Runs one turn; returns False if a newer message superseded it."""
+        self._turn = asyncio.create_task(coro)
+        try:
+            await asyncio.wait({self._turn})
+        finally:
+            if not self._turn.done():
+                self._turn.cancel()
+        turn, self._turn = self._turn, None
+        self._cancellable = False
+        if turn.cancelled():
+            return False
+        turn.result()
+        return True
+
+    def superseded_by_input(self, enabled: bool = True):
+        """Marks whether the running turn may be cancelled by a newer message."""
+        self._cancellable = enabled
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "superseded": self.superseded,
+            "backpressure_waits": self.backpressure_waits,
+        }
@@ -0,0 +1,135 @@
+# utils/intent_engine.py
+
+import unicodedata
+from collections import OrderedDict
+
+from constants.intent_lexicon import INTENT_LEXICON, NEGATION_WORDS
+
+MAX_PHRASE_WORDS = 3
+
+
+def normalize_text(text: str) -> str:
+    """NFKC + casefold, punctuation (except apostrophes) dropped, whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", text or "").casefold().replace("’", "'")
+    text = "".join(
+        " " if unicodedata.category(ch).startswith("P") and ch != "'" else ch
+        for ch in text
+    )
+    return " ".join(text.split())
+
+
+def _build_phrase_index():
+    index = {}
+    for entry in INTENT_LEXICON.values():
+        for intent in ("positive", "negative"):
+            for phrase in entry[intent]:
+                index.setdefault(normalize_text(phrase), set()).add(intent)
+    return index
+
+
+PHRASE_INDEX = _build_phrase_index()
+
+
+def classify(text: str):
+    """
+    Rule-based intent for short replies. Returns (intent, confidence).
+
+    A reply made up entirely of lexicon phrases scores high; unknown words lower
+    the confidence, and phrases that mean yes in one language and no in another
+    ("jo", "tak") or mixed polarity fall back to neutral with low confidence.
+    """
+    norm = normalize_text(text)
+    if not norm:
+        return "neutral", 0.0
+
+    exact = PHRASE_INDEX.get(norm)
+    if exact:
+        if len(exact) == 1:
+            return next(iter(exact)), 0.95
+        return "neutral", 0.3
+
+    words = norm.split()
+    hits = {"positive": 0, "negative": 0}
+    unknown = 0
+    negate = False
+    i = 0
+    while i < len(words):
+        for size in range(min(MAX_PHRASE_WORDS, len(words) - i), 0, -1):
+            intents = PHRASE_INDEX.get(" ".join(words[i:i + size]))
+            if intents and len(intents) == 1:
+                intent = next(iter(intents))
+                if negate and intent == "positive":
+                    # "not ok" / "don't add": the negation word is part of the match
+                    intent = "negative"
+                    unknown -= 1
+                    size_matched = size + 1
+                else:
+                    size_matched = size
+                hits[intent] += size_matched
+                negate = False
+                i += size
+                break
+        else:
+            negate = words[i] in NEGATION_WORDS
+            unknown += 1
+            i += 1
+
+    matched = hits["positive"] + hits["negative"]
+    if not matched or (hits["positive"] and hits["negative"]):
+        return "neutral", 0.3 if matched else 0.0
+
+    intent = "positive" if hits["positive"] else "negative"
+    return intent, 0.9 * matched / (matched + unknown)
+
+
+class IntentEngine:
+    """
+    Local intent detection with an LLM fallback.
+
+    Replies whose rule confidence reaches `threshold` never hit the LLM.
+    Every result (rule or LLM) is kept in an LRU cache keyed on the
+    normalized text, and counters record how many LLM calls were avoided.
+    """
+
+    def __init__(self, threshold: float = 0.75, cache_size: int = 2048):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.requests = 0
+        self.cache_hits = 0
+        self.rule_hits = 0
+        self.llm_calls = 0
+
+    def _remember(self, key, intent):
+        self._cache[key] = intent
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def detect(self, user_input: str, llm_fallback):
+        """`llm_fallback` is an async callable taking the raw text and returning an intent."""
+        self.requests += 1
+        key = normalize_text(user_input)
+        if key in self._cache:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        intent, confidence = classify(user_input)
+        if confidence >= self.threshold:
+            self.rule_hits += 1
+        else:
+            self.llm_calls += 1
+            intent = await llm_fallback(user_input)
+        self._remember(key, intent)
+        return intent
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "rule_hits": self.rule_hits,
+            "llm_calls": self.llm_calls,
+            "llm_avoided_rate": (1 - self.llm_calls / self.requests) if self.requests else 0.0,
+            "cache_size": len(self._cache),
+        }
@@ -0,0 +1,67 @@
+# utils/json_patch.py
+
+import copy
+
+
+def _escape(key) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def json_diff(old, new, path: str = ""):
+    """
+    RFC 6902 style ops (add / remove / replace) turning `old` into `new`.
+
+    Objects are diffed key by key and lists index by index (appends become
+    "add", a shorter list "remove"s from the end), so editing one button
+    produces one small op instead of a new template.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{"op": "remove", "path": f"{path}/{_escape(key)}"} for key in old if key not in new]
+        for key, value in new.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key in old:
+                ops.extend(json_diff(old[key], value, key_path))
+            else:
+                ops.append({"op": "add", "path": key_path, "value": value})
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        ops = []
+        for i in range(common):
+            ops.extend(json_diff(old[i], new[i], f"{path}/{i}"))
+        ops += [{"op": "add", "path": f"{path}/{i}", "value": new[i]} for i in range(common, len(new))]
+        ops += [{"op": "remove", "path": f"{path}/{i}"} for i in range(len(old) - 1, common - 1, -1)]
+        return ops
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(doc, ops):
+    """Returns a patched copy of `doc`; the inverse of `json_diff`."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        if op["path"] == "":
+            doc = copy.deepcopy(op["value"])
+            continue
+        *parents, last = [_unescape(t) for t in op["path"].split("/")[1:]]
+        target = doc
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if isinstance(target, list):
+            index = int(last)
+            if op["op"] == "add":
+                target.insert(index, copy.deepcopy(op["value"]))
+            elif op["op"] == "remove":
+                del target[index]
+            else:
+                target[index] = copy.deepcopy(op["value"])
+        elif op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = copy.deepcopy(op["value"])
+    return doc
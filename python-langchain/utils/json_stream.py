@@ -0,0 +1,194 @@
+# utils/json_stream.py
+
+import json
+import re
+
+# Characters the scanner has to look at in each state; everything else is skipped at C speed
+_OUTSIDE = re.compile(r"\{")
+_STRUCTURE = re.compile(r'[{}\[\]",:]')
+_IN_STRING = re.compile(r'["\\]')
+
+
+class JSONFieldStream:
+    """
+    Incremental, single-pass scanner for JSON objects in model output.
+
+    Feed it raw text chunks as they arrive. `feed()` returns the top-level
+    (key, value) pairs whose values became complete in that chunk, so fields
+    like "Body" can be shown before the rest of the template is generated;
+    every complete top-level object is appended to `objects`. Text outside
+    objects (markdown fences, prose) is ignored, string contents such as
+    "}{" inside a Body never split an object, and nothing is re-parsed from
+    scratch: each character is scanned once.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.objects = []
+        self.fields = {}
+        self.errors = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._expect_key = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._object_start = None
+
+    def _emit_field(self, end):
+        raw = self.buffer[self._value_start:end].strip()
+        self._value_start = None
+        if self._key is None or not raw:
+            return None
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        self.fields[self._key] = value
+        return self._key, value
+
+    def _emit_object(self, end):
+        try:
+            obj = json.loads(self.buffer[self._object_start:end])
+        except json.JSONDecodeError:
+            self.errors += 1
+        else:
+            if isinstance(obj, dict):
+                self.objects.append(obj)
+        # Drop everything consumed so far so long streams don't grow the buffer
+        self.buffer = self.buffer[end:]
+        self._pos = 0
+        self._object_start = None
+        self._key = None
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        completed = []
+        while True:
+            buf = self.buffer
+            if self._in_string:
+                match = _IN_STRING.search(buf, self._pos)
+                if not match:
+                    break
+                i = match.end()
+                if match.group() == "\\":
+                    if i >= len(buf):
+                        # Escape split across chunks: resume at the backslash
+                        self._pos = match.start()
+                        break
+                    self._pos = i + 1
+                    continue
+                self._in_string = False
+                self._pos = i
+                if self._depth == 1 and self._expect_key:
+                    try:
+                        self._key = json.loads(buf[self._key_start:i])
+                    except json.JSONDecodeError:
+                        self._key = None
+                    self._expect_key = False
+                continue
+
+            if self._depth == 0:
+                match = _OUTSIDE.search(buf, self._pos)
+                if not match:
+                    # Only prose so far; nothing worth keeping
+                    self.buffer = ""
+                    self._pos = 0
+                    break
+                self.buffer = buf[match.start():]
+                self._depth = 1
+                self._expect_key = True
+                self.fields = {}
+                self._object_start = 0
+                self._pos = 1
+                continue
+
+            match = _STRUCTURE.search(buf, self._pos)
+            if not match:
+                self._pos = len(buf)
+                break
+            ch = match.group()
+            i = match.start()
+            self._pos = i + 1
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1 and self._value_start is not None:
+                    field = self._emit_field(i)
+                    if field:
+                        completed.append(field)
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit_object(i + 1)
+            elif self._depth == 1:
+                if ch == ":":
+                    self._value_start = i + 1
+                elif ch == ",":
+                    if self._value_start is not None:
+                        field = self._emit_field(i)
+                        if field:
+                            completed.append(field)
+                    self._expect_key = True
+        return completed
+
+
+_decoder = json.JSONDecoder()
+_BRACES = re.compile(r'[{}"]')
+
+
+def _span_end(text: str, start: int) -> int:
+    """Index just past the brace closing the one at `start` (braces in strings don't count); -1 if it never closes."""
+    depth, pos, in_string = 0, start, False
+    while True:
+        match = (_IN_STRING if in_string else _BRACES).search(text, pos)
+        if not match:
+            return -1
+        ch, pos = match.group(), match.end()
+        if in_string:
+            if ch == "\\":
+                pos += 1
+            else:
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def extract_json_objects(text: str):
+    """
+    All complete top-level JSON objects in `text`, in order (fences/prose ignored).
+
+    For a complete output the C decoder is much faster than the char scanner:
+    each object is decoded straight from its opening brace. A brace that does
+    not start valid JSON (e.g. "{name}" in prose) is skipped together with
+    everything up to its closing brace, so the buttons of a malformed template
+    are never returned as objects of their own; an object that never closes
+    (a truncated output) ends the scan.
+    """
+    objects = []
+    text = text or ""
+    pos = text.find("{")
+    while pos != -1:
+        try:
+            obj, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            end = _span_end(text, pos)
+            if end == -1:
+                break
+            pos = text.find("{", end)
+            continue
+        if isinstance(obj, dict):
+            objects.append(obj)
+        pos = text.find("{", end)
+    return objects
@@ -0,0 +1,219 @@
+# utils/language_detector.py
+
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+from constants.language_constants import LANGUAGE_LIST
+
+LanguageDetection = namedtuple("LanguageDetection", "code confidence source")
+
+LANGUAGE_NAMES = {lang["code"]: lang["name"] for lang in LANGUAGE_LIST if lang["code"] != "NA"}
+
+# Names people actually type, beyond the LANGUAGE_LIST names themselves
+LANGUAGE_ALIASES = {
+    "chinese": "zh_CN", "mandarin": "zh_CN", "simplified chinese": "zh_CN", "cantonese": "zh_HK",
+    "traditional chinese": "zh_TW", "taiwanese": "zh_TW", "portuguese": "pt_BR", "brazilian portuguese": "pt_BR",
+    "brazilian": "pt_BR", "european portuguese": "pt_PT", "mexican spanish": "es_MX", "argentinian spanish": "es_AR",
+    "argentine spanish": "es_AR", "castilian": "es_ES", "british english": "en_GB", "uk english": "en_GB",
+    "american english": "en_US", "us english": "en_US", "farsi": "fa", "bangla": "bn", "tagalog": "fil",
+    "norwegian bokmal": "nb", "bahasa indonesia": "id", "bahasa melayu": "ms", "kiswahili": "sw", "isizulu": "zu",
+    # Native names
+    "हिंदी": "hi", "हिन्दी": "hi", "मराठी": "mr", "বাংলা": "bn", "ਪੰਜਾਬੀ": "pa", "ગુજરાતી": "gu", "தமிழ்": "ta",
+    "తెలుగు": "te", "ಕನ್ನಡ": "kn", "മലയാളം": "ml", "اردو": "ur", "العربية": "ar", "فارسی": "fa", "עברית": "he",
+    "ไทย": "th", "русский": "ru", "українська": "uk", "ελληνικά": "el", "日本語": "ja", "한국어": "ko", "中文": "zh_CN",
+    "español": "es", "français": "fr", "deutsch": "de", "português": "pt_BR", "italiano": "it", "nederlands": "nl",
+    "türkçe": "tr", "polski": "pl", "tiếng việt": "vi", "svenska": "sv",
+}
+
+# Unicode script (first word of the character name) -> language; ambiguous
+# scripts are refined by _SCRIPT_MARKERS
+_SCRIPT_LANGUAGES = {
+    "DEVANAGARI": "hi", "BENGALI": "bn", "GURMUKHI": "pa", "GUJARATI": "gu", "TAMIL": "ta", "TELUGU": "te",
+    "KANNADA": "kn", "MALAYALAM": "ml", "THAI": "th", "LAO": "lo", "HEBREW": "he", "GREEK": "el",
+    "HANGUL": "ko", "HIRAGANA": "ja", "KATAKANA": "ja", "CJK": "zh_CN", "ARABIC": "ar", "CYRILLIC": "ru",
+}
+_SCRIPT_MARKERS = {
+    "DEVANAGARI": (("mr", "आहे आणि च्या नाही मध्ये करा आपल्या"),),
+    "ARABIC": (("ur", "ےٹڈڑںۓ"), ("fa", "پچژگکی")),
+    "CYRILLIC": (("kk", "әғқңөұүһ"), ("uk", "іїєґ"), ("sr", "ћђ"), ("mk", "ѓќѕ"), ("bg", "ъщ")),
+    "CJK": (("zh_TW", "們這個說會來時為國與學買賣優惠還"),),
+}
+
+# Frequent function words (and a few greetings) per Latin-script language
+_LATIN_WORDS = {
+    "en": "the and for with our your this that you are is to of on a an we my please create make template sale offer new",
+    "es": "el la los las de del que y para con por una un es en su nuestra nuestro hola oferta descuento",
+    "fr": "le la les des du de et pour avec une un est dans sur nous vous votre notre bonjour offre",
+    "de": "der die das und für mit ein eine ist nicht wir sie ihr unser unsere zu den dem angebot",
+    "pt_BR": "o os as um uma para com não são está nosso nossa você olá oferta promoção",
+    "it": "il lo gli della delle che per con una sono è nostro nostra ciao offerta",
+    "nl": "de het een en voor met van niet wij onze jouw aanbieding",
+    "id": "dan yang untuk dengan ini itu kami kamu anda tidak di ke dari promo",
+    "ms": "dan yang untuk dengan ini itu kami anda tidak di ke dari",
+    "tr": "ve bir bu için ile çok değil biz siz indirim",
+    "pl": "i w z na do nie się jest dla że oferta",
+    "sv": "och att det som för med är på en ett vi inte",
+    "nb": "og at det som for med er på en et vi ikke",
+    "da": "og at det som for med er på en et vi ikke",
+    "vi": "và của cho với không là các những chúng tôi bạn",
+    "sw": "na ya kwa wa ni katika hii sisi",
+    "ro": "și în pentru cu este nu o un al ofertă",
+    "fil": "ang mga ng sa para at ito kami",
+    "hi": "hai hain ka ki ke kya aap mein karo banao liye nahi",  # romanized Hindi
+}
+_LATIN_WORDS = {code: set(words.split()) for code, words in _LATIN_WORDS.items()}
+_LATIN_MARKERS = {
+    "es": "ñ¿¡", "pt_BR": "ãõ", "de": "ß", "pl": "łąęśźżń", "hu": "őű", "cs": "řůě", "tr": "ğşı",
+    "ro": "ășț", "vi": "đơưạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ", "fr": "çœèêëîï",
+    "sv": "å", "da": "æø",
+}
+# Romanized Hindi is common but the user may want Latin-script Hinglish; leave it to the model
+_LOW_CONFIDENCE = {"hi"}
+
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _build_name_index():
+    index = dict(LANGUAGE_ALIASES)
+    for code, name in LANGUAGE_NAMES.items():
+        base = name.lower()
+        index.setdefault(base, code)
+        # "Chinese (CHN)" is typed "chinese"; "Spanish (MEX)" as "spanish mex"
+        plain = re.sub(r"\s*\(.*\)", "", base)
+        qualifier = re.search(r"\((.*)\)", base)
+        index.setdefault(plain, code)
+        if qualifier:
+            index.setdefault(f"{plain} {qualifier.group(1)}", code)
+    index["spanish"] = "es"
+    index["english"] = "en"
+    return index
+
+
+_NAME_INDEX = _build_name_index()
+_NAME_PATTERN = "|".join(re.escape(name) for name in sorted(_NAME_INDEX, key=len, reverse=True))
+# "in hindi", "into tamil", "to french", "hindi version", "a spanish template"
+_MENTION_IN_CONTEXT = re.compile(
+    rf"(?:\b(?:in|into|to)\s+(?:the\s+)?({_NAME_PATTERN})(?![\w])"
+    rf"|(?<![\w])({_NAME_PATTERN})\s+(?:language|version|translation|template|message|text)\b"
+    rf"|\btranslate\b.*?(?<![\w])({_NAME_PATTERN})(?![\w]))"
+)
+_MENTION = re.compile(rf"(?<![\w])({_NAME_PATTERN})(?![\w])")
+
+
+def named_language(text: str):
+    """Code of the last language named anywhere in the text ("hindi diwali sale" -> "hi"), else None."""
+    names = _MENTION.findall(_normalize(text or ""))
+    return _NAME_INDEX[names[-1]] if names else None
+
+
+def _script(char):
+    try:
+        return unicodedata.name(char).split(" ", 1)[0]
+    except ValueError:
+        return None
+
+
+class LanguageDetector:
+    """
+    Resolves the template language locally, before the LLM call.
+
+    In order: an explicit mention in context ("in Hindi", "Tamil version",
+    matched against LANGUAGE_LIST names, aliases and native names); the
+    writing system of the text (with marker characters to split scripts
+    shared by several languages); function-word and diacritic profiles for
+    Latin-script text. Plain ASCII with no signal is English. A bare name
+    ("chinese new year sale") is reported with low confidence, since it
+    usually isn't a language request.
+    """
+
+    def __init__(self, threshold: float = 0.6):
+        self.threshold = threshold
+        self.sources = Counter()
+        self.resolved = 0
+        self.requests = 0
+
+    def detect(self, text: str) -> LanguageDetection:
+        detection = self._detect(text or "")
+        self.requests += 1
+        self.sources[detection.source] += 1
+        if detection.confidence >= self.threshold:
+            self.resolved += 1
+        return detection
+
+    def resolve(self, text: str):
+        """Language code if detected confidently, else None (the model decides)."""
+        detection = self.detect(text)
+        return detection.code if detection.confidence >= self.threshold else None
+
+    def mentioned(self, text: str):
+        """Code of a language explicitly requested in context, else None."""
+        matches = _MENTION_IN_CONTEXT.findall(_normalize(text or ""))
+        if not matches:
+            return None
+        return _NAME_INDEX[next(name for name in matches[-1] if name)]
+
+    def _detect(self, text):
+        normalized = _normalize(text)
+        mentioned = self.mentioned(normalized)
+        if mentioned:
+            return LanguageDetection(mentioned, 0.95, "mention")
+
+        letters = [c for c in text if c.isalpha()]
+        if not letters:
+            return LanguageDetection("en", 0.3, "default")
+        scripts = Counter(_script(c) for c in letters)
+        latin = scripts.pop("LATIN", 0)
+        if scripts:
+            script, count = scripts.most_common(1)[0]
+            if count >= 0.2 * len(letters) and script in _SCRIPT_LANGUAGES:
+                if script == "CJK" and (scripts.get("HIRAGANA") or scripts.get("KATAKANA")):
+                    script = "HIRAGANA"
+                code = _SCRIPT_LANGUAGES[script]
+                for marker_code, markers in _SCRIPT_MARKERS.get(script, ()):
+                    if " " in markers:
+                        found = any(word in markers.split() for word in normalized.split())
+                    else:
+                        found = any(c in markers for c in text)
+                    if found:
+                        code = marker_code
+                        break
+                return LanguageDetection(code, 0.9, "script")
+
+        bare = _MENTION.findall(normalized)
+        words = _WORD.findall(normalized)
+        scores = Counter()
+        for code, vocabulary in _LATIN_WORDS.items():
+            scores[code] = sum(1 for w in words if w in vocabulary)
+        for code, markers in _LATIN_MARKERS.items():
+            scores[code] += 2 * sum(1 for c in normalized if c in markers)
+        ranked = scores.most_common(2)
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+
+        if bare and not (best_score and best != "en"):
+            # A language name without "in ..." is more often a topic than a request
+            return LanguageDetection(_NAME_INDEX[bare[-1]], 0.4, "mention")
+        if best_score == 0:
+            confident = latin == len(letters) and text.isascii()
+            return LanguageDetection("en", 0.6 if confident else 0.4, "default")
+        tied = {code for code, score in scores.items() if score == best_score}
+        if len(tied) > 1 and "en" in tied and not tied & _LOW_CONFIDENCE and text.isascii():
+            # "for", "on" etc. are shared with other profiles; plain ASCII breaks the tie
+            return LanguageDetection("en", 0.6, "words")
+        confidence = 0.85 if best_score >= 2 and best_score >= 2 * runner_up else 0.65 if best_score > runner_up else 0.45
+        if best in _LOW_CONFIDENCE:
+            confidence = min(confidence, 0.5)
+        return LanguageDetection(best, confidence, "words")
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "resolved": self.resolved,
+            "resolved_rate": self.resolved / self.requests if self.requests else 0.0,
+            "sources": dict(self.sources),
+        }
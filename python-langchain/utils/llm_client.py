@@ -0,0 +1,181 @@
+# utils/llm_client.py
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from utils.admission import TASK_PRIORITY, AdmissionRejected, build_admission_controller, prompt_cost
+
+
+class LLMDispatcher:
+    """
+    Runs `llm.ainvoke` / `llm.astream` with a global concurrency limit.
+
+    Each connection first takes one of its own `per_connection` slots, then a
+    global slot, so a single busy socket can never hold more than its share of
+    the global pool.
+
+    Global slots go out in priority order with aging: a call waiting since t
+    ranks at t + TASK_PRIORITY[priority] * `priority_step`, so intent checks
+    overtake queued generations, but nothing waits behind newer work forever.
+    With an `admission` controller, calls are first charged to their client's
+    token bucket and refused early (AdmissionRejected) when over quota or when
+    the estimated queue wait is too long.
+    """
+
+    def __init__(self, llm, max_concurrency: int = 16, per_connection: int = 2, admission=None,
+                 priority_step: float = 2.0):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.per_connection = per_connection
+        self.admission = admission
+        self.priority_step = priority_step
+        self._free = max_concurrency
+        self._waiters = []  # heap of (rank, seq, future)
+        self._seq = itertools.count()
+        self._connections = defaultdict(lambda: asyncio.Semaphore(self.per_connection))
+        self.service_time = 0.0  # moving average of call duration, for wait estimates
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+
+    def _rank(self, priority):
+        return time.monotonic() + TASK_PRIORITY.get(priority, TASK_PRIORITY["generate"]) * self.priority_step
+
+    def estimated_wait(self, rank) -> float:
+        """Seconds until a call ranked `rank` would get a global slot, from the average call duration."""
+        if self._free:
+            return 0.0
+        ahead = sum(1 for r, _, future in self._waiters if r <= rank and not future.done())
+        return (ahead + 1) / self.max_concurrency * self.service_time
+
+    async def _acquire_global(self, rank):
+        if self._free and not self._waiters:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted just before the cancellation: pass the slot on
+            if future.done() and not future.cancelled():
+                self._release_global()
+            raise
+
+    def _release_global(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # the slot moves straight to the next waiter
+                return
+        self._free += 1
+
+    async def _admit(self, messages, client, rank, block):
+        while True:
+            try:
+                self.admission.check(client, prompt_cost(messages), self.estimated_wait(rank))
+                return
+            except AdmissionRejected as e:
+                if not block:
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    @asynccontextmanager
+    async def _slot(self, connection_id, messages=(), client=None, priority="generate", block=False):
+        rank = self._rank(priority)
+        if self.admission:
+            await self._admit(messages, client if client is not None else connection_id, rank, block)
+        conn_slot = self._connections[connection_id] if connection_id is not None else None
+        enqueued_at = time.perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            if conn_slot:
+                await conn_slot.acquire()
+            try:
+                await self._acquire_global(rank)
+            except BaseException:
+                if conn_slot:
+                    conn_slot.release()
+                raise
+        finally:
+            self.queue_depth -= 1
+
+        started = time.perf_counter()
+        self.total_wait += started - enqueued_at
+        self.in_flight += 1
+        try:
+            yield
+            self.completed += 1
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            self.service_time = elapsed if not self.service_time else 0.9 * self.service_time + 0.1 * elapsed
+            self._release_global()
+            if conn_slot:
+                conn_slot.release()
+
+    async def invoke(self, messages, connection_id=None, client=None, priority=None, block=False, **kwargs):
+        """
+        Extra keyword arguments (e.g. `task` for a ModelRouter) are passed to the model.
+        `client` keys the admission quota (defaults to the connection), `priority`
+        is a TASK_PRIORITY name (defaults to the task) and `block` waits out a
+        rejection instead of raising AdmissionRejected.
+        """
+        priority = priority or kwargs.get("task", "generate")
+        async with self._slot(connection_id, messages, client, priority, block):
+            return await self.llm.ainvoke(messages, **kwargs)
+
+    async def stream(self, messages, connection_id=None, client=None, priority=None, block=False, **kwargs):
+        """Yields message chunks; the slot is held until the stream is exhausted."""
+        priority = priority or kwargs.get("task", "generate")
+        async with self._slot(connection_id, messages, client, priority, block):
+            async for chunk in self.llm.astream(messages, **kwargs):
+                yield chunk
+
+    def release_connection(self, connection_id):
+        """Drop the per-connection slot once a socket closes."""
+        self._connections.pop(connection_id, None)
+
+    def metrics(self):
+        finished = self.completed + self.failed
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": (self.total_wait / finished * 1000) if finished else 0.0,
+            "avg_call_ms": self.service_time * 1000,
+            "connections": len(self._connections),
+            "admission": self.admission.stats() if self.admission else None,
+        }
+
+
+def build_dispatcher(llm):
+    """
+    Reads LLM_MAX_CONCURRENCY / LLM_PER_CONNECTION_LIMIT / LLM_PRIORITY_STEP_SECONDS
+    from the environment; ADMISSION_ENABLED=0 turns admission control off.
+    """
+    admission = None
+    if os.environ.get("ADMISSION_ENABLED", "1") not in ("0", "false"):
+        admission = build_admission_controller()
+    return LLMDispatcher(
+        llm,
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 16)),
+        per_connection=int(os.environ.get("LLM_PER_CONNECTION_LIMIT", 2)),
+        admission=admission,
+        priority_step=float(os.environ.get("LLM_PRIORITY_STEP_SECONDS", 2.0)),
+    )
@@ -0,0 +1,170 @@
+# utils/llm_recorder.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from utils.logger import get_logger
+
+logger = get_logger("llm_recorder")
+
+MODES = ("off", "record", "replay", "auto")
+
+
+class ReplayMissError(LookupError):
+    """Strict replay found no recording for a message list."""
+
+
+def message_key(messages) -> str:
+    """Content address of a prompt: sha256 over the (role, content) list."""
+    payload = json.dumps([[m.type, m.content] for m in messages], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMRecorder:
+    """
+    Record/replay wrapper with the same `ainvoke` / `astream` interface as a
+    model, so it sits between LLMDispatcher and the ModelRouter.
+
+    Modes:
+      record  every live response is written to the store
+      replay  responses come from the store only; a miss raises ReplayMissError
+      auto    replay when recorded, otherwise call live and record
+
+    Recordings are one JSON file per prompt under `path/<key[:2]>/<key>.json`
+    holding the messages, content, usage_metadata and response_metadata, so
+    cost accounting and the served model work the same on replay. The
+    `memory_max` most recently used recordings are also kept in memory
+    (0 = none); older ones are read from disk again.
+    """
+
+    def __init__(self, llm, path: str, mode: str = "auto", memory_max: int = 1000):
+        if mode not in MODES:
+            raise ValueError(f"Unknown record mode: {mode}")
+        self.llm = llm
+        self.path = path
+        self.mode = mode
+        self.memory_max = memory_max
+        self._memory = OrderedDict()  # key -> recording, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def _read(self, key):
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, recording):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _remember(self, key, recording):
+        if not self.memory_max:
+            return
+        self._memory[key] = recording
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max:
+            self._memory.popitem(last=False)
+
+    async def lookup(self, messages):
+        key = message_key(messages)
+        recording = self._memory.get(key)
+        if recording is None:
+            recording = await asyncio.to_thread(self._read, key)
+        if recording is not None:
+            self._remember(key, recording)
+        return key, recording
+
+    async def save(self, key, messages, message, task=None):
+        recording = {
+            "messages": [{"type": m.type, "content": m.content} for m in messages],
+            "task": task,
+            "content": message.content,
+            "usage_metadata": dict(message.usage_metadata or {}),
+            "response_metadata": dict(message.response_metadata or {}),
+            "recorded_at": time.time(),
+        }
+        self._remember(key, recording)
+        self.recorded += 1
+        try:
+            await asyncio.to_thread(self._write, key, recording)
+        except OSError as e:
+            logger.warning("Could not write LLM recording %s: %s", key, e)
+
+    async def _replayed(self, messages):
+        """(key, recording) to replay, or (key, None) to call the model live."""
+        if self.mode == "record":
+            return message_key(messages), None
+        key, recording = await self.lookup(messages)
+        if recording is not None:
+            self.hits += 1
+            return key, recording
+        self.misses += 1
+        if self.mode == "replay":
+            raise ReplayMissError(f"No recording for prompt {key}")
+        return key, None
+
+    async def ainvoke(self, messages, **kwargs):
+        """Keyword arguments (e.g. the router's `task`) go to the wrapped model when called live."""
+        key, recording = await self._replayed(messages)
+        if recording is not None:
+            return AIMessage(content=recording["content"], usage_metadata=recording["usage_metadata"] or None,
+                             response_metadata=recording["response_metadata"])
+        response = await self.llm.ainvoke(messages, **kwargs)
+        await self.save(key, messages, response, kwargs.get("task"))
+        return response
+
+    async def astream(self, messages, **kwargs):
+        key, recording = await self._replayed(messages)
+        if recording is not None:
+            yield AIMessageChunk(content=recording["content"], usage_metadata=recording["usage_metadata"] or None,
+                                 response_metadata=recording["response_metadata"])
+            return
+        response = None
+        async for chunk in self.llm.astream(messages, **kwargs):
+            response = chunk if response is None else response + chunk
+            yield chunk
+        if response is not None:
+            await self.save(key, messages, response, kwargs.get("task"))
+
+    def recordings(self):
+        """Every stored recording (reads the whole store; for offline tooling and cache warming)."""
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".json"):
+                    recording = self._read(name[:-len(".json")])
+                    if recording is not None:
+                        yield recording
+
+    def stats(self):
+        return {"mode": self.mode, "path": self.path, "hits": self.hits, "misses": self.misses,
+                "recorded": self.recorded, "in_memory": len(self._memory)}
+
+
+def build_recorder(llm):
+    """
+    Wraps `llm` according to LLM_RECORD_MODE (off, record, replay, auto;
+    default off), LLM_RECORDINGS_PATH (default .llm_recordings) and
+    LLM_RECORDINGS_MEMORY_MAX (recordings kept in memory, default 1000).
+    Returns None when recording is off.
+    """
+    mode = os.environ.get("LLM_RECORD_MODE", "off").lower()
+    if mode == "off":
+        return None
+    return LLMRecorder(llm, os.environ.get("LLM_RECORDINGS_PATH", ".llm_recordings"), mode=mode,
+                       memory_max=int(os.environ.get("LLM_RECORDINGS_MEMORY_MAX", 1000)))
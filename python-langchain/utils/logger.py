@@ -0,0 +1,43 @@
+# utils/logger.py
+
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+_listener = None
+
+
+def setup_logging(level: str = None):
+    """
+    Routes all "copilot.*" loggers through a queue drained by a background thread,
+    so a log call on the event loop is just a queue put, never a stdout write.
+    Level comes from LOG_LEVEL (default INFO).
+    """
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger("copilot")
+    root.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+    root.propagate = False
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flushes queued records; call on application shutdown."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"copilot.{name}")
@@ -0,0 +1,161 @@
+# utils/metrics.py
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(k)} {v}" for k, v in self.values.items()]
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; p50/p99 are estimated from bucket bounds."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def quantile(self, q, **labels):
+        series = self.series.get(_label_key(labels))
+        if not series:
+            return None
+        counts = series[:-1]
+        target = q * sum(counts)
+        running = 0
+        for i, count in enumerate(counts):
+            running += count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Value read at scrape time from `fn`, which returns a number or {labels_tuple: number}."""
+
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.fn()
+        if isinstance(value, dict):
+            lines += [f"{self.name}{_format_labels(k)} {v}" for k, v in value.items()]
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, fn):
+        metric = Gauge(name, help_text, fn)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_LATENCY = registry.histogram("copilot_stage_latency_seconds", "Latency of each pipeline stage")
+LLM_TOKENS = registry.counter("copilot_llm_tokens_total", "Tokens billed by the LLM provider")
+LLM_COST = registry.counter("copilot_llm_cost_inr_total", "Estimated LLM spend in INR")
+TEMPLATES_SENT = registry.counter("copilot_templates_sent_total", "Template frames sent to clients")
+ERRORS = registry.counter("copilot_errors_total", "Handled errors by kind")
+INPUT_MESSAGES = registry.counter("copilot_input_messages_total", "Client messages coalesced or superseded")
+PROMPT_PHASES = registry.counter("copilot_prompt_phase_total", "Generations by system prompt phase")
+LOCAL_EDITS = registry.counter("copilot_local_edits_total", "Template edit requests answered without the LLM")
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Observes the wall time of the wrapped block in copilot_stage_latency_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_usage(model: str, call: str, input_tokens: int, output_tokens: int, cost: float):
+    LLM_TOKENS.inc(input_tokens, model=model, call=call, kind="input")
+    LLM_TOKENS.inc(output_tokens, model=model, call=call, kind="output")
+    LLM_COST.inc(cost, model=model, call=call)
+
+
+def latency_summary():
+    """p50/p99 per stage, for quick JSON views."""
+    return {
+        dict(key).get("stage", ""): {
+            "p50": STAGE_LATENCY.quantile(0.5, **dict(key)),
+            "p99": STAGE_LATENCY.quantile(0.99, **dict(key)),
+        }
+        for key in STAGE_LATENCY.series
+    }
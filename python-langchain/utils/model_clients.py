@@ -0,0 +1,167 @@
+# utils/model_clients.py
+
+import asyncio
+import os
+import time
+
+import httpx
+
+from utils.logger import get_logger
+
+logger = get_logger("model_clients")
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+GEMINI_MODELS = ("gemini-2.0-flash", "gemini-2.0-flash-lite")
+# Re-warming only bridges lulls in traffic: after this many keepalive periods
+# without a real request the pool is left to expire
+REWARM_WINDOW = 4
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ProviderPool:
+    """
+    Shared keep-alive HTTP client for one model provider.
+
+    `warm()` opens `warm_connections` connections (TCP + TLS) with a cheap
+    authenticated GET /models, so the first user request doesn't pay for the
+    handshake. Idle connections are kept for `keepalive` * 4 seconds. With
+    `rewarm`, a background task also warms again when real traffic paused for
+    `keepalive` seconds, but only while some arrived in the last
+    REWARM_WINDOW periods, so an idle process sends nothing. With the `h2`
+    package installed the client speaks HTTP/2 and one multiplexed connection
+    serves every concurrent call.
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: str, max_connections: int = 64,
+                 warm_connections: int = 2, keepalive: float = 30.0, timeout: float = 60.0,
+                 rewarm: bool = False):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.warm_connections = warm_connections
+        self.keepalive = keepalive
+        self.rewarm = rewarm
+        self.http2 = _http2_available()
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                keepalive_expiry=keepalive * 4),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            event_hooks={"request": [self._on_request]},
+        )
+        self.last_used = 0.0
+        self.warmed = 0
+        self.warm_failures = 0
+        self.last_warm_ms = None
+        self._task = None
+
+    async def _on_request(self, request):
+        # Warm-up requests are not traffic; counting them would keep the pool warm forever
+        if not request.url.path.endswith("/models"):
+            self.last_used = time.monotonic()
+
+    async def warm(self) -> bool:
+        """Opens the pool's connections; False if the provider was unreachable (the first call then connects)."""
+        if not self.warm_connections:
+            return False
+        count = 1 if self.http2 else self.warm_connections
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        start = time.perf_counter()
+        # Concurrent requests each get their own HTTP/1.1 connection
+        results = await asyncio.gather(
+            *(self.client.get(f"{self.base_url}/models", headers=headers) for _ in range(count)),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.last_warm_ms = (time.perf_counter() - start) * 1000
+        if errors:
+            self.warm_failures += 1
+            logger.warning("Warming %s connections failed: %s", self.name, errors[0])
+            return False
+        self.warmed += 1
+        logger.info("Warmed %d %s connection(s) in %.0f ms", count, self.name, self.last_warm_ms)
+        return True
+
+    def should_rewarm(self, now: float) -> bool:
+        idle = now - self.last_used
+        return self.keepalive <= idle < self.keepalive * REWARM_WINDOW
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.keepalive)
+            if self.should_rewarm(time.monotonic()):
+                await self.warm()
+
+    def start(self):
+        if self.rewarm and self.warm_connections and self.keepalive:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.client.aclose()
+
+    def stats(self):
+        return {
+            "http2": self.http2,
+            "warm_connections": self.warm_connections,
+            "rewarm": self.rewarm,
+            "warmed": self.warmed,
+            "warm_failures": self.warm_failures,
+            "last_warm_ms": self.last_warm_ms,
+        }
+
+
+def build_openai_pool(api_key: str):
+    """
+    Reads OPENAI_BASE_URL, LLM_MAX_CONNECTIONS, LLM_WARM_CONNECTIONS
+    (0 = no warm-up), LLM_KEEPALIVE_SECONDS and LLM_KEEPALIVE_REWARM
+    (1 = re-warm between bursts of traffic; off by default) from the environment.
+    """
+    return ProviderPool(
+        "openai",
+        os.environ.get("OPENAI_BASE_URL") or OPENAI_BASE_URL,
+        api_key,
+        max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 64)),
+        warm_connections=int(os.environ.get("LLM_WARM_CONNECTIONS", 2)),
+        keepalive=float(os.environ.get("LLM_KEEPALIVE_SECONDS", 30)),
+        rewarm=os.environ.get("LLM_KEEPALIVE_REWARM", "0") in ("1", "true"),
+    )
+
+
+def build_backends(model_name: str, openai_api_key: str, google_api_key: str = None, openai_pool=None):
+    """
+    Chat models for the router. Provider SDKs are imported here, and Gemini's
+    only when a Google key is configured, so an OpenAI-only deployment never
+    loads langchain_google_genai (about as slow to import as the rest of the app).
+    """
+    from langchain_openai import ChatOpenAI
+
+    backends = {
+        model_name: ChatOpenAI(
+            model=model_name,
+            openai_api_key=openai_api_key,
+            openai_api_base=openai_pool.base_url if openai_pool else None,
+            http_async_client=openai_pool.client if openai_pool else None,
+            stream_usage=True,
+        )
+    }
+    # Gemini backends are only routed to when a Google key is configured
+    if google_api_key:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        for gemini_model in GEMINI_MODELS:
+            backends[gemini_model] = ChatGoogleGenerativeAI(model=gemini_model, google_api_key=google_api_key)
+    return backends
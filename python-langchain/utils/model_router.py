@@ -0,0 +1,231 @@
+# utils/model_router.py
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from langchain_core.messages import AIMessageChunk
+
+from utils.logger import get_logger
+
+logger = get_logger("model_router")
+
+# Task -> backends in order of preference. Cheap tasks prefer the cheaper model;
+# backends that aren't configured (e.g. no GOOGLE_API_KEY) are skipped.
+DEFAULT_ROUTES = {
+    "generate": ["gpt-4o-mini", "gemini-2.0-flash"],
+    "followup": ["gemini-2.0-flash-lite", "gpt-4o-mini"],
+    "intent": ["gemini-2.0-flash-lite", "gpt-4o-mini"],
+}
+
+
+class Backend:
+    """
+    One chat model plus rolling latency / error stats over its last `window`
+    calls. Streams are recorded by time to first chunk and kept apart from
+    whole-response latencies, which the hedge delay is computed from.
+    """
+
+    def __init__(self, name, llm, window: int = 50):
+        self.name = name
+        self.llm = llm
+        self.calls = deque(maxlen=window)  # (latency seconds, ok, streamed)
+        self.open_until = 0.0
+        self.total = 0
+        self.errors = 0
+
+    def record(self, latency, ok, streamed=False):
+        self.calls.append((latency, ok, streamed))
+        self.total += 1
+        if not ok:
+            self.errors += 1
+
+    def error_rate(self):
+        return sum(1 for _, ok, _ in self.calls if not ok) / len(self.calls) if self.calls else 0.0
+
+    def latency(self, q, streamed=False):
+        ordered = sorted(latency for latency, ok, s in self.calls if ok and s == streamed)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def samples(self, streamed=False):
+        return sum(1 for _, ok, s in self.calls if ok and s == streamed)
+
+    def stats(self):
+        p50, p95, first_chunk = self.latency(0.5), self.latency(0.95), self.latency(0.5, streamed=True)
+        return {
+            "calls": self.total,
+            "errors": self.errors,
+            "error_rate": self.error_rate(),
+            "p50_ms": p50 * 1000 if p50 is not None else None,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+            "first_chunk_p50_ms": first_chunk * 1000 if first_chunk is not None else None,
+            "circuit_open": self.open_until > time.monotonic(),
+        }
+
+
+class ModelRouter:
+    """
+    Picks a chat model per task ("generate", "followup", "intent").
+
+    Candidates are tried in route order, skipping backends whose circuit is
+    open (error rate over `max_error_rate` in the rolling window; they get
+    another chance after `cooldown` seconds). A call that errors fails over to
+    the next candidate. With `hedge`, a call still running after the primary's
+    rolling p95 latency (`hedge_after` until enough samples) also starts on the
+    next candidate and the first answer wins. Streams fail over only before
+    their first chunk; a stream that sends nothing for `timeout` seconds fails.
+
+    Responses carry the serving backend in `response_metadata["router_backend"]`.
+    Exposes `ainvoke` / `astream` so it can sit behind LLMDispatcher like a model.
+    """
+
+    def __init__(self, backends, routes=None, hedge: bool = True, hedge_after: float = 10.0,
+                 hedge_min: float = 0.05, max_error_rate: float = 0.5, min_samples: int = 5,
+                 cooldown: float = 30.0, timeout: float = 60.0):
+        self.backends = {name: backend if isinstance(backend, Backend) else Backend(name, backend)
+                         for name, backend in backends.items()}
+        routes = routes or DEFAULT_ROUTES
+        self.routes = {task: [name for name in names if name in self.backends] for task, names in routes.items()}
+        self.default_route = self.routes.get("generate") or list(self.backends)
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.hedge_min = hedge_min
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def candidates(self, task):
+        names = self.routes.get(task) or self.default_route
+        now = time.monotonic()
+        ready = [self.backends[n] for n in names if self.backends[n].open_until <= now]
+        # Every circuit open: still try them all rather than fail outright
+        return ready or [self.backends[n] for n in names]
+
+    def _hedge_delay(self, backend):
+        if backend.samples() < self.min_samples:
+            return self.hedge_after
+        return max(self.hedge_min, backend.latency(0.95) or self.hedge_after)
+
+    def _record(self, backend, latency, ok, streamed=False):
+        backend.record(latency, ok, streamed)
+        if (not ok and len(backend.calls) >= self.min_samples
+                and backend.error_rate() >= self.max_error_rate):
+            backend.open_until = time.monotonic() + self.cooldown
+            backend.calls.clear()
+            logger.warning("Backend %s tripped (error rate over %.0f%%)", backend.name, self.max_error_rate * 100)
+
+    async def _call(self, backend, messages):
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(backend.llm.ainvoke(messages), self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record(backend, time.perf_counter() - start, False)
+            raise
+        self._record(backend, time.perf_counter() - start, True)
+        response.response_metadata["router_backend"] = backend.name
+        return response
+
+    async def ainvoke(self, messages, task: str = "generate"):
+        queue = self.candidates(task)
+        primary = queue.pop(0)
+        pending = {asyncio.create_task(self._call(primary, messages)): primary}
+        hedge_after = self._hedge_delay(primary) if self.hedge and queue else None
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than usual: race it against the next backend
+                    backend = queue.pop(0)
+                    pending[asyncio.create_task(self._call(backend, messages))] = backend
+                    self.hedges += 1
+                    hedge_after = None
+                    continue
+                for task_done in done:
+                    backend = pending.pop(task_done)
+                    if task_done.exception() is None:
+                        if backend is not primary:
+                            self.hedge_wins += 1
+                        return task_done.result()
+                    error = task_done.exception()
+                    logger.warning("Backend %s failed: %s", backend.name, error)
+                if not pending and queue:
+                    backend = queue.pop(0)
+                    pending[asyncio.create_task(self._call(backend, messages))] = backend
+                    self.failovers += 1
+                    hedge_after = None
+        finally:
+            for task_pending in pending:
+                task_pending.cancel()
+        raise error
+
+    async def astream(self, messages, task: str = "generate"):
+        error = None
+        for i, backend in enumerate(self.candidates(task)):
+            if i:
+                self.failovers += 1
+            start = time.perf_counter()
+            first_chunk = None
+            stream = backend.llm.astream(messages)
+            try:
+                while True:
+                    # A stalled stream must not hold its dispatcher slot forever
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                    yield chunk
+            except Exception as e:
+                elapsed = time.perf_counter() - start if first_chunk is None else first_chunk
+                self._record(backend, elapsed, False, streamed=True)
+                if first_chunk is not None:
+                    raise
+                error = e
+                logger.warning("Backend %s failed before streaming: %s", backend.name, e)
+                continue
+            finally:
+                await stream.aclose()
+            elapsed = time.perf_counter() - start if first_chunk is None else first_chunk
+            self._record(backend, elapsed, True, streamed=True)
+            yield AIMessageChunk(content="", response_metadata={"router_backend": backend.name})
+            return
+        raise error
+
+    def stats(self):
+        return {
+            "routes": self.routes,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "backends": {name: backend.stats() for name, backend in self.backends.items()},
+        }
+
+
+def build_router(backends):
+    """
+    Routes from LLM_ROUTE_<TASK> (comma-separated backend names), hedging from
+    LLM_HEDGE (1/0) and LLM_HEDGE_AFTER, per-call (and per-chunk for streams)
+    timeout from LLM_BACKEND_TIMEOUT.
+    """
+    routes = {
+        task: [n.strip() for n in os.environ.get(f"LLM_ROUTE_{task.upper()}", ",".join(names)).split(",") if n.strip()]
+        for task, names in DEFAULT_ROUTES.items()
+    }
+    return ModelRouter(
+        backends,
+        routes=routes,
+        hedge=os.environ.get("LLM_HEDGE", "1") not in ("0", "false"),
+        hedge_after=float(os.environ.get("LLM_HEDGE_AFTER", 10.0)),
+        timeout=float(os.environ.get("LLM_BACKEND_TIMEOUT", 60.0)),
+    )
@@ -0,0 +1,217 @@
+# utils/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from utils.intent_engine import normalize_text
+from utils.language_detector import named_language
+
+# Words that don't change which template gets generated
+FILLER_WORDS = {
+    "a", "an", "the", "please", "pls", "plz", "create", "make", "generate", "write", "draft", "give", "me",
+    "i", "want", "need", "can", "you", "for", "my", "our", "template", "message", "whatsapp", "some", "to",
+}
+
+_NUMBER = re.compile(r"\d+")
+
+
+def mentioned_language(text: str) -> str:
+    """Language code named in the request ("... in hindi", "chinese"), else "auto"."""
+    return named_language(text) or "auto"
+
+
+def normalized_request(text: str) -> str:
+    """
+    Content words in order, numbers and repeats kept: "Please create a Diwali
+    sale template in Hindi!" -> "diwali sale in hindi". Order matters: "buy 1
+    get 2" and "buy 2 get 1" are different offers.
+    """
+    return " ".join(w for w in normalize_text(text).split() if w not in FILLER_WORDS)
+
+
+def hashed_ngrams(text: str, n: int = 3):
+    """Tiny local embedding: L2-normalized character n-gram counts (sparse dict)."""
+    padded = f" {text} "
+    counts = Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {gram: v / norm for gram, v in counts.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of first-turn template generations.
+
+    Lookups try, in order: the exact request text, the normalized request
+    (case/punctuation/filler words ignored) and, when `semantic_threshold` is
+    set, the most similar cached request with the same numbers by n-gram
+    cosine similarity. All tiers are scoped to the language named in the
+    request, so "diwali sale in hindi" never returns the Tamil template.
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted past `max_entries`. With `path`, entries are also written through
+    to a local SQLite file (off the event loop) and reloaded on start; evicted
+    entries are deleted from it with the next write.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 24 * 60 * 60, path: str = None,
+                 semantic_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.semantic_threshold = semantic_threshold
+        self._entries = OrderedDict()  # normalized key -> entry
+        self._exact = {}  # exact digest -> normalized key
+        self.hits = {"exact": 0, "normalized": 0, "semantic": 0}
+        self.misses = 0
+        self.evictions = 0
+        self._evicted = []  # keys still to delete from SQLite
+        self._db = None
+        self._lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, exact TEXT, language TEXT, request TEXT, template TEXT, created REAL)"
+            )
+            self._load()
+
+    def _keys(self, request: str):
+        language = mentioned_language(request)
+        normalized = normalized_request(request)
+        return language, f"{language}|{normalized}", _digest(f"{language}|{request.strip().lower()}")
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        self._db.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, exact, language, request, template, created FROM responses WHERE created >= ? ORDER BY created",
+            (cutoff,),
+        ).fetchall()
+        for key, exact, language, request, template, created in rows:
+            self._store(key, exact, language, request, json.loads(template), created)
+
+    def _store(self, key, exact, language, request, template, created):
+        self._entries[key] = {
+            "exact": exact,
+            "language": language,
+            "request": request,
+            "embedding": hashed_ngrams(normalized_request(request)) if self.semantic_threshold else None,
+            "numbers": _NUMBER.findall(request),
+            "template": template,
+            "created": created,
+        }
+        self._entries.move_to_end(key)
+        self._exact[exact] = key
+        while len(self._entries) > self.max_entries:
+            old_key, old = self._entries.popitem(last=False)
+            self._exact.pop(old["exact"], None)
+            self._evict(old_key)
+
+    def _evict(self, key):
+        self.evictions += 1
+        if self._db is not None:
+            self._evicted.append(key)
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            self._entries.pop(key)
+            self._exact.pop(entry["exact"], None)
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, request: str):
+        """Returns a copy of the cached template for this request, or None."""
+        language, key, exact = self._keys(request)
+
+        entry = self._live(self._exact.get(exact))
+        if entry is not None:
+            self.hits["exact"] += 1
+            return dict(entry["template"])
+
+        entry = self._live(key)
+        if entry is not None:
+            self.hits["normalized"] += 1
+            return dict(entry["template"])
+
+        if self.semantic_threshold:
+            query = hashed_ngrams(normalized_request(request))
+            numbers = _NUMBER.findall(request)
+            best_key, best_score = None, self.semantic_threshold
+            for candidate_key, candidate in self._entries.items():
+                # Similar wording with other amounts ("50% off" vs "10% off") is another offer
+                if candidate["language"] != language or candidate["numbers"] != numbers:
+                    continue
+                score = cosine(query, candidate["embedding"])
+                if score >= best_score:
+                    best_key, best_score = candidate_key, score
+            entry = self._live(best_key) if best_key else None
+            if entry is not None:
+                self.hits["semantic"] += 1
+                return dict(entry["template"])
+
+        self.misses += 1
+        return None
+
+    async def put(self, request: str, template: dict):
+        language, key, exact = self._keys(request)
+        created = time.time()
+        self._store(key, exact, language, request, template, created)
+        if self._db is not None:
+            row = (key, exact, language, request, json.dumps(template, ensure_ascii=False), created)
+            evicted, self._evicted = self._evicted, []
+            await asyncio.to_thread(self._write, row, evicted)
+
+    def _write(self, row, evicted):
+        with self._lock:
+            # A key evicted and then stored again must keep its new row
+            evicted = [(key,) for key in evicted if key not in self._entries]
+            if evicted:
+                self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, exact, language, request, template, created) VALUES (?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            self._db.commit()
+
+    def stats(self):
+        lookups = sum(self.hits.values()) + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (sum(self.hits.values()) / lookups) if lookups else 0.0,
+        }
+
+
+def build_response_cache():
+    """RESPONSE_CACHE_SIZE / _TTL / _PATH / _SEMANTIC (similarity threshold, 0 = off) from the environment."""
+    return ResponseCache(
+        max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", 1000)),
+        ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 24 * 60 * 60)),
+        path=os.environ.get("RESPONSE_CACHE_PATH") or None,
+        semantic_threshold=float(os.environ.get("RESPONSE_CACHE_SEMANTIC", 0)),
+    )
@@ -0,0 +1,182 @@
+# utils/session_governor.py
+
+import asyncio
+import os
+import time
+from collections import Counter
+
+from utils.logger import get_logger
+
+logger = get_logger("session_governor")
+
+# WebSocket close codes sent to evicted or rejected clients
+CLOSE_GOING_AWAY = 1001      # server shutting down; resumable sessions can reconnect
+CLOSE_TOO_BIG = 1009         # message or session over its size cap
+CLOSE_TRY_AGAIN = 1013       # too many sessions / memory pressure; retry later
+CLOSE_IDLE = 4408            # idle timeout (application code, mirrors HTTP 408)
+
+
+class SessionEvicted(Exception):
+    """Raised into a session's input loop when the governor closes it."""
+
+
+class GovernedSession:
+    def __init__(self, key, footprint, close, heartbeat=None):
+        self.key = key
+        self.footprint = footprint   # () -> approximate bytes held
+        self.close = close           # async (code, reason) -> None
+        self.heartbeat = heartbeat   # async () -> None, or None if not opted in
+        self.last_active = time.monotonic()
+        self.last_heartbeat = self.last_active
+        self.size = 0
+        self.evicting = False
+
+
+class SessionGovernor:
+    """
+    Tracks live /ws sessions and bounds what they hold.
+
+    A background sweep every `sweep_interval` seconds measures each session's
+    footprint, sends heartbeats to sessions that opted in, and evicts:
+    sessions idle for `idle_timeout` (CLOSE_IDLE), sessions over
+    `max_session_bytes` (CLOSE_TOO_BIG) and, while the total is over
+    `max_total_bytes`, the least recently active ones (CLOSE_TRY_AGAIN).
+    New connections beyond `max_sessions` are refused with CLOSE_TRY_AGAIN.
+    Eviction only closes the socket; the endpoint's own cleanup saves
+    resumable sessions, so evicted clients can reconnect and resume.
+    A limit of 0 disables that check.
+    """
+
+    def __init__(self, max_sessions: int = 0, idle_timeout: float = 0.0, heartbeat_interval: float = 0.0,
+                 max_session_bytes: int = 0, max_total_bytes: int = 0, max_message_chars: int = 0,
+                 sweep_interval: float = 5.0):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_message_chars = max_message_chars
+        self.sweep_interval = sweep_interval
+        self.sessions = {}
+        self.total_bytes = 0
+        self.peak_sessions = 0
+        self.rejected = 0
+        self.heartbeats = 0
+        self.evictions = Counter()
+        self._task = None
+
+    def admit(self) -> bool:
+        """False when a new connection would exceed `max_sessions`."""
+        if self.max_sessions and len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            return False
+        return True
+
+    def register(self, key, footprint, close, heartbeat=None):
+        self.sessions[key] = GovernedSession(key, footprint, close, heartbeat)
+        self.peak_sessions = max(self.peak_sessions, len(self.sessions))
+
+    def unregister(self, key):
+        self.sessions.pop(key, None)
+
+    def touch(self, key):
+        """Marks activity (a client message or a finished turn)."""
+        session = self.sessions.get(key)
+        if session:
+            session.last_active = time.monotonic()
+
+    def message_allowed(self, text: str) -> bool:
+        return not self.max_message_chars or len(text) <= self.max_message_chars
+
+    async def evict(self, session, code, reason):
+        if session.evicting:
+            return
+        session.evicting = True
+        self.evictions[reason] += 1
+        logger.info("Evicting session %s: %s", session.key, reason)
+        try:
+            await session.close(code, reason)
+        except Exception as e:
+            logger.debug("Close failed for %s: %s", session.key, e)
+
+    async def sweep(self):
+        now = time.monotonic()
+        total = 0
+        for session in list(self.sessions.values()):
+            if session.evicting:
+                continue
+            session.size = session.footprint()
+            total += session.size
+            if self.idle_timeout and now - session.last_active >= self.idle_timeout:
+                await self.evict(session, CLOSE_IDLE, "idle timeout")
+            elif self.max_session_bytes and session.size > self.max_session_bytes:
+                await self.evict(session, CLOSE_TOO_BIG, "session too large")
+            elif (session.heartbeat and self.heartbeat_interval
+                  and now - max(session.last_heartbeat, session.last_active) >= self.heartbeat_interval):
+                session.last_heartbeat = now
+                try:
+                    await session.heartbeat()
+                    self.heartbeats += 1
+                except Exception:
+                    # Writes to a dead peer fail; don't wait for the idle timeout
+                    await self.evict(session, CLOSE_GOING_AWAY, "heartbeat failed")
+
+        if self.max_total_bytes and total > self.max_total_bytes:
+            for session in sorted(self.sessions.values(), key=lambda s: s.last_active):
+                if total <= self.max_total_bytes:
+                    break
+                if not session.evicting:
+                    total -= session.size
+                    await self.evict(session, CLOSE_TRY_AGAIN, "memory pressure")
+        self.total_bytes = total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning("Session sweep failed: %s", e)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops sweeping and closes every session with CLOSE_GOING_AWAY."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for session in list(self.sessions.values()):
+            await self.evict(session, CLOSE_GOING_AWAY, "server shutdown")
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "peak_sessions": self.peak_sessions,
+            "total_bytes": self.total_bytes,
+            "largest_session_bytes": max((s.size for s in self.sessions.values()), default=0),
+            "rejected": self.rejected,
+            "heartbeats": self.heartbeats,
+            "evictions": dict(self.evictions),
+        }
+
+
+def build_session_governor():
+    """
+    Reads WS_MAX_SESSIONS, WS_IDLE_TIMEOUT_SECONDS, WS_HEARTBEAT_SECONDS,
+    WS_MAX_SESSION_BYTES, WS_MAX_TOTAL_BYTES, WS_MAX_MESSAGE_CHARS and
+    WS_SWEEP_SECONDS from the environment.
+    """
+    return SessionGovernor(
+        max_sessions=int(os.environ.get("WS_MAX_SESSIONS", 2000)),
+        idle_timeout=float(os.environ.get("WS_IDLE_TIMEOUT_SECONDS", 15 * 60)),
+        heartbeat_interval=float(os.environ.get("WS_HEARTBEAT_SECONDS", 25)),
+        max_session_bytes=int(os.environ.get("WS_MAX_SESSION_BYTES", 1024 * 1024)),
+        max_total_bytes=int(os.environ.get("WS_MAX_TOTAL_BYTES", 512 * 1024 * 1024)),
+        max_message_chars=int(os.environ.get("WS_MAX_MESSAGE_CHARS", 8000)),
+        sweep_interval=float(os.environ.get("WS_SWEEP_SECONDS", 5)),
+    )
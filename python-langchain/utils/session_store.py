@@ -0,0 +1,122 @@
+# utils/session_store.py
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+def encode_session(data: dict) -> bytes:
+    """Compact wire/disk form of a session: compressed, separator-free JSON."""
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_session(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class InMemorySessionStore:
+    """
+    Process-local store; sessions survive reconnects but not restarts. Beyond
+    `max_sessions` the least recently saved session is dropped (0 = no cap).
+    """
+
+    def __init__(self, ttl: float = 24 * 60 * 60, max_sessions: int = 0):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}  # session_id -> (expires_at, blob), oldest save first
+
+    async def get(self, session_id: str):
+        item = self._sessions.get(session_id)
+        if item is None:
+            return None
+        expires_at, blob = item
+        if expires_at < time.time():
+            self._sessions.pop(session_id, None)
+            return None
+        return decode_session(blob)
+
+    async def put(self, session_id: str, data: dict):
+        self._sessions.pop(session_id, None)
+        self._sessions[session_id] = (time.time() + self.ttl, encode_session(data))
+        while self.max_sessions and len(self._sessions) > self.max_sessions:
+            self._sessions.pop(next(iter(self._sessions)))
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def evict_expired(self):
+        now = time.time()
+        for session_id in [s for s, (expires_at, _) in self._sessions.items() if expires_at < now]:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """
+    File-backed store shared by every uvicorn worker on the host.
+
+    Uses WAL mode so readers in one worker don't block writes from another;
+    all queries run in a thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, expires_at REAL, data BLOB)"
+        )
+        self._db.commit()
+
+    def _get(self, session_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE id = ? AND expires_at >= ?", (session_id, time.time())
+            ).fetchone()
+        return decode_session(row[0]) if row else None
+
+    def _put(self, session_id, blob):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, expires_at, data) VALUES (?, ?, ?)",
+                (session_id, time.time() + self.ttl, blob),
+            )
+            self._db.commit()
+
+    def _delete(self, session_id):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def _evict_expired(self):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    async def get(self, session_id: str):
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def put(self, session_id: str, data: dict):
+        await asyncio.to_thread(self._put, session_id, encode_session(data))
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._delete, session_id)
+
+    async def evict_expired(self):
+        await asyncio.to_thread(self._evict_expired)
+
+
+def build_session_store():
+    """
+    SESSION_STORE ("memory" or "sqlite"), SESSION_STORE_PATH, SESSION_TTL and
+    SESSION_STORE_MAX (in-memory cap) from the environment.
+    """
+    ttl = float(os.environ.get("SESSION_TTL", 24 * 60 * 60))
+    if os.environ.get("SESSION_STORE", "memory").lower() == "sqlite":
+        return SQLiteSessionStore(os.environ.get("SESSION_STORE_PATH", ".sessions.db"), ttl=ttl)
+    return InMemorySessionStore(ttl=ttl, max_sessions=int(os.environ.get("SESSION_STORE_MAX", 10000)))
@@ -0,0 +1,147 @@
+# utils/template_validator.py
+
+import re
+
+from constants.language_constants import LANGUAGE_LIST
+from constants.template_rules import (
+    BUTTON_TYPE_LIMITS, BUTTON_TYPES, CATEGORY_CODES, DEFAULT_LANGUAGE_CODE,
+    MARKETING_HEADER_TYPES, MAX_BUTTONS,
+)
+
+VALID_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+_CODES = {lang["code"].lower(): lang["code"] for lang in LANGUAGE_LIST if lang["code"] != "NA"}
+_NAMES = {lang["name"].lower(): lang["code"] for lang in LANGUAGE_LIST if lang["code"] != "NA"}
+_TYPE_ALIASES = {t.replace("_", ""): t for t in BUTTON_TYPES}
+_TYPE_ALIASES.update({"PHONE": "PHONE_NUMBER", "CALL": "PHONE_NUMBER", "COPY": "COPY_CODE", "REPLY": "QUICK_REPLY"})
+
+
+class TemplateValidationError(ValueError):
+    """Model output that cannot be repaired locally (e.g. no Body at all)."""
+
+
+def normalize_language_code(value):
+    """Maps a code in any case ("EN_us") or a language name ("hindi") to a LANGUAGE_LIST code; None if unknown."""
+    key = str(value or "").strip().lower().replace("-", "_")
+    return _CODES.get(key) or _NAMES.get(key)
+
+
+def normalize_name(name: str) -> str:
+    """Keeps valid snake/camel/Pascal names; anything else becomes lowercase_with_underscores."""
+    name = str(name or "").strip()
+    if VALID_NAME.match(name):
+        return name
+    slug = re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+    if slug and not slug[0].isalpha():
+        slug = "template_" + slug
+    return slug or "template"
+
+
+def _button_type(button):
+    raw = str(button.get("type", "")).upper()
+    key = re.sub(r"[\s_\-]+", "", raw)
+    return _TYPE_ALIASES.get(key, raw)
+
+
+def _repair_buttons(buttons, issues):
+    if not isinstance(buttons, list):
+        issues.append("Buttons was not a list")
+        return []
+
+    kept = []
+    counts = {}
+    for button in buttons:
+        if not isinstance(button, dict):
+            issues.append("dropped non-object button")
+            continue
+        btn_type = _button_type(button)
+        if btn_type in BUTTON_TYPES and button.get("type") != btn_type:
+            button = {**button, "type": btn_type}
+        limit = BUTTON_TYPE_LIMITS.get(btn_type)
+        if len(kept) >= MAX_BUTTONS or (limit is not None and counts.get(btn_type, 0) >= limit):
+            issues.append(f"dropped overflow {btn_type} button")
+            continue
+        counts[btn_type] = counts.get(btn_type, 0) + 1
+
+        if btn_type == "URL":
+            url_type = str(button.get("urlType", "static")).lower()
+            button = {**button, "urlType": url_type if url_type in ("static", "dynamic") else "static"}
+            if button["urlType"] == "static" and "example" in button:
+                button = {k: v for k, v in button.items() if k != "example"}
+            elif button["urlType"] == "dynamic" and not button.get("example"):
+                button["example"] = [""]
+        elif btn_type == "COPY_CODE" and "example" not in button:
+            button = {**button, "example": []}
+        kept.append(button)
+    return kept
+
+
+def repair_template(data: dict, previous: dict = None, language: str = None):
+    """
+    Deterministically validates and repairs one model output.
+
+    Returns (repaired_data, issues). Button limits and shapes are enforced on
+    every output; full templates (those with a "name") additionally get their
+    name, categoryCode, languageCode, header and bodyText normalized, with name
+    and categoryCode pinned to `previous` so they never change mid-conversation.
+    A languageCode outside LANGUAGE_LIST is reported and replaced by `language`
+    (the conversation's language) when given, otherwise kept as it is.
+    Raises TemplateValidationError when there is no usable Body.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("Body"), str):
+        raise TemplateValidationError("JSON missing 'Body'")
+
+    issues = []
+    data = dict(data)
+    if "Buttons" not in data:
+        issues.append("Buttons missing")
+    data["Buttons"] = _repair_buttons(data.get("Buttons", []), issues)
+
+    if "name" not in data:
+        return data, issues
+
+    previous = previous or {}
+    name = previous.get("name") or normalize_name(data["name"])
+    if name != data["name"]:
+        issues.append(f"name {data['name']!r} -> {name!r}")
+        data["name"] = name
+
+    category = previous.get("categoryCode") or str(data.get("categoryCode", "")).upper()
+    if category not in CATEGORY_CODES:
+        category = "MARKETING" if data["Buttons"] else "UTILITY"
+    if category != data.get("categoryCode"):
+        issues.append(f"categoryCode {data.get('categoryCode')!r} -> {category!r}")
+        data["categoryCode"] = category
+
+    code = data.get("languageCode")
+    normalized = normalize_language_code(code)
+    if normalized is None:
+        fallback = normalize_language_code(language)
+        if fallback is None and not code:
+            fallback = DEFAULT_LANGUAGE_CODE
+        if fallback is None:
+            issues.append(f"unknown languageCode {code!r} kept")
+        else:
+            issues.append(f"unknown languageCode {code!r} -> {fallback!r}")
+            data["languageCode"] = fallback
+    elif normalized != code:
+        issues.append(f"languageCode {code!r} -> {normalized!r}")
+        data["languageCode"] = normalized
+
+    header = dict(data.get("header") or {})
+    header_type = str(header.get("type", "")).upper()
+    if category == "UTILITY":
+        header_type = "TEXT"
+    elif header_type not in MARKETING_HEADER_TYPES:
+        header_type = "IMAGE"
+    if header.get("type") != header_type or "body" not in header:
+        issues.append("header repaired")
+    header["type"] = header_type
+    header.setdefault("body", "")
+    data["header"] = header
+
+    if "bodyText" not in data:
+        issues.append("bodyText missing")
+        data["bodyText"] = []
+
+    return data, issues
@@ -0,0 +1,22 @@
+# utils/token_counter.py
+
+from functools import lru_cache
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for budgeting (no tokenizer download, no I/O).
+
+    English-like text averages ~4 characters per token; non-Latin scripts
+    tokenize much denser, so non-ASCII characters are weighted higher.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return int((len(text) - non_ascii) / 4 + non_ascii * 0.7) + 1
+
+
+@lru_cache(maxsize=64)
+def estimate_prompt_tokens(text: str) -> int:
+    """Memoized estimate for long, shared prompt strings (e.g. the system message)."""
+    return estimate_tokens(text)